@@ -0,0 +1,1007 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import random
+import threading
+from typing import Any, Awaitable, Callable, Iterable, Optional, TypeVar
+
+from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright
+
+from app.captcha_state import (
+    CAPTCHA_CHECKING,
+    CAPTCHA_PARKED,
+    CAPTCHA_RUNNING,
+    CAPTCHA_STOPPED,
+    CaptchaBoard,
+)
+from app.captcha_utils import CaptchaProbe, is_captcha_async
+from app.pacser_maps import (
+    CARD_SNAPSHOT_JS as MAPS_CARD_SNAPSHOT_JS,
+    CLICK_LIST_ITEM_JS,
+    SCROLL_LIST_JS,
+    VISIBLE_IDS_JS,
+    ListEndTracker,
+    Organization,
+    YandexMapsScraper,
+)
+from app.parser_search import (
+    CARD_SNAPSHOT_JS as SERP_CARD_SNAPSHOT_JS,
+    CAROUSEL_ARROW_SELECTOR,
+    CAROUSEL_SHADOW_SELECTOR,
+    EXTRA_BUTTON_SELECTOR,
+    EXTRA_POPUP_JS,
+    LIMIT_CARD_MARGIN,
+    SERP_CARD_SELECTORS,
+    CarouselProgress,
+    _build_serp_row,
+    _count_passing,
+    _extra_popup_fields,
+    _needs_extra_popup,
+    _serp_dedupe_key,
+    _snapshot_fields,
+    build_serp_url,
+)
+from app.page_archive import archive_page_async
+from app.playwright_utils import (
+    PLAYWRIGHT_LAUNCH_ARGS,
+    AsyncContextPool,
+    launch_chrome_async,
+)
+from app.reviews_parser import (
+    EXPAND_REVIEWS_JS,
+    REVIEWS_SNAPSHOT_JS,
+    SCROLL_CONTAINER_JS,
+    Review,
+    YandexReviewsParser,
+)
+from app.request_budget import acquire_request_async
+from app.selector_registry import get_selector_registry
+from app.serp_http import NeedsBrowser, NoSerpCards, close_http_pool, fetch_serp_rows, harvest_cookies
+from app.utils import extract_org_id, extract_phones
+
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# HTTP SERP fetches that needed the browser before the engine stops trying HTTP for the run.
+HTTP_FALLBACK_LIMIT = 3
+
+AsyncCaptchaHook = Callable[[str, Page], None]
+
+
+class AsyncScrapeEngine:
+    """Maps, SERP and reviews flows as coroutines on a single event loop.
+
+    One Chrome instance is shared; every flow gets its own isolated context and
+    the number of simultaneously open pages is capped by a semaphore. Stop and
+    pause use the same threading events as the sync scrapers, so the engine can
+    be driven from the GUI worker thread via the ``run_*`` wrappers below.
+    Snapshot extraction, row building, the carousel and list end rules and the
+    sampled captcha probe are shared with the sync scrapers.
+    """
+
+    def __init__(
+        self,
+        *,
+        headless: bool = False,
+        concurrency: int = 4,
+        stop_event=None,
+        pause_event=None,
+        captcha_hook: Optional[AsyncCaptchaHook] = None,
+        log: Optional[Callable[[str], None]] = None,
+        delay_min_s: float = 0.0,
+        delay_max_s: float = 0.0,
+        captcha_poll_s: float = 1.0,
+        captcha_board: Optional[CaptchaBoard] = None,
+        captcha_resume_event=None,
+        serp_http: bool = False,
+        serp_pages: int = 1,
+        captcha_check_interval_s: float = 2.0,
+        warm_browser: bool = False,
+    ) -> None:
+        self.headless = headless
+        self.warm_browser = warm_browser
+        self.concurrency = max(1, int(concurrency))
+        self.stop_event = stop_event or threading.Event()
+        self.pause_event = pause_event or threading.Event()
+        self.captcha_hook = captcha_hook
+        self.delay_min_s = delay_min_s
+        self.delay_max_s = delay_max_s
+        self.captcha_poll_s = captcha_poll_s
+        self.captcha_check_interval_s = captcha_check_interval_s
+        self._captcha_probes: dict[int, CaptchaProbe] = {}
+        self.captcha_board = captcha_board or CaptchaBoard()
+        # "Check now": the owner sets the event and clears it after a grace period
+        # (ShardedRunner does); every set bumps the generation, waking all parked pages.
+        self.captcha_resume_event = captcha_resume_event
+        self._resume_generation = 0
+        self._resume_was_set = False
+        # With serp_http Chrome starts only when a query first needs it.
+        self.serp_http = serp_http
+        self.serp_pages = max(1, int(serp_pages))
+        self._http_hits = 0
+        self._http_misses = 0
+        self._browser_lock: Optional[asyncio.Lock] = None
+        # Captcha board worker ids: the label plus a sequence number, so duplicate queries do not collide.
+        self._page_workers: dict[int, str] = {}
+        self._worker_ids = itertools.count(1)
+        self._log_cb = log
+        self._playwright = None
+        self._browser = None
+        self._pool: Optional[AsyncContextPool] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncScrapeEngine":
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._browser_lock = asyncio.Lock()
+        if not self.serp_http:
+            await self._start_browser()
+        return self
+
+    async def _start_browser(self) -> None:
+        assert self._browser_lock is not None
+        async with self._browser_lock:
+            if self._pool is not None:
+                return
+            self._playwright = await async_playwright().start()
+            try:
+                self._browser = await launch_chrome_async(
+                    self._playwright,
+                    headless=self.headless,
+                    args=PLAYWRIGHT_LAUNCH_ARGS,
+                    use_daemon=self.warm_browser,
+                )
+            except Exception:
+                await self._playwright.stop()
+                self._playwright = None
+                raise
+            self._pool = AsyncContextPool(self._browser, size=self.concurrency)
+            await self._pool.start()
+
+    async def __aexit__(self, *_exc) -> None:
+        if self._pool is not None:
+            LOGGER.debug(
+                "Пул контекстов: создано %s, пересоздано %s", self._pool.created, self._pool.recycled
+            )
+            await self._pool.close()
+            self._pool = None
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                LOGGER.debug("Failed to close browser", exc_info=True)
+            LOGGER.info("Браузер закрыт")
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                LOGGER.debug("Failed to stop playwright", exc_info=True)
+        self._browser = None
+        self._playwright = None
+        if self.serp_http:
+            close_http_pool()
+            LOGGER.info("SERP без браузера: %s, с браузером: %s", self._http_hits, self._http_misses)
+
+    def _log(self, message: str, *args) -> None:
+        if self._log_cb:
+            try:
+                self._log_cb(message % args if args else message)
+                return
+            except Exception:
+                pass
+        LOGGER.info(message, *args)
+
+    def _call_hook(self, stage: str, page: Page) -> None:
+        if not self.captcha_hook:
+            return
+        try:
+            self.captcha_hook(stage, page)
+        except Exception:
+            LOGGER.debug("Captcha hook error (%s)", stage, exc_info=True)
+
+    async def _open_page(self, worker: str):
+        if self._semaphore is None:
+            raise RuntimeError("AsyncScrapeEngine is not started")
+        if self._pool is None:
+            await self._start_browser()
+        assert self._pool is not None
+        context = await self._pool.acquire()
+        page = await context.new_page()
+        self._register_page(page, worker)
+        page.set_default_timeout(20000)
+        return context, page
+
+    def _register_page(self, page: Page, label: str) -> None:
+        self._page_workers[id(page)] = f"{label} #{next(self._worker_ids)}"
+
+    def _forget_page(self, page: Page) -> None:
+        worker = self._page_workers.pop(id(page), None)
+        if worker is not None:
+            self.captcha_board.forget(worker)
+        self._captcha_probes.pop(id(page), None)
+
+    async def _close_context(self, context) -> None:
+        for page in list(context.pages):
+            self._forget_page(page)
+        if self._pool is None:
+            return
+        try:
+            await self._pool.release(context)
+        except Exception:
+            LOGGER.debug("Failed to return browser context to the pool", exc_info=True)
+
+    async def _acquire(self, url: str) -> None:
+        await acquire_request_async(url, self.stop_event, self.pause_event)
+
+    async def _delay(self) -> None:
+        delay = 0.0
+        if self.delay_max_s > 0:
+            delay = random.uniform(max(0.0, self.delay_min_s), max(0.0, self.delay_max_s))
+        elif self.delay_min_s > 0:
+            delay = self.delay_min_s
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _is_captcha(self, page: Page) -> bool:
+        return await is_captcha_async(page)
+
+    def _resume_generation_now(self) -> int:
+        # The event is never cleared here: other pages and other shard processes watch it too.
+        if self.captcha_resume_event is not None:
+            is_set = self.captcha_resume_event.is_set()
+            if is_set and not self._resume_was_set:
+                self._resume_generation += 1
+            self._resume_was_set = is_set
+        return self._resume_generation
+
+    async def _captcha_poll(self, generation: int) -> int:
+        """Sleep ``captcha_poll_s`` or until "check now" starts a newer generation; returns it."""
+        deadline = asyncio.get_running_loop().time() + max(0.05, self.captcha_poll_s)
+        while asyncio.get_running_loop().time() < deadline and not self.stop_event.is_set():
+            current = self._resume_generation_now()
+            if current != generation:
+                return current
+            await asyncio.sleep(0.05)
+        return self._resume_generation_now()
+
+    async def _wait_captcha(self, page: Page) -> bool:
+        # Only the coroutine that hit the captcha is parked here; other pages keep running.
+        worker = self._page_workers.get(id(page), "?")
+        board = self.captcha_board
+        board.set_state(worker, CAPTCHA_PARKED, page.url)
+        self._log(f"🧩 Капча ({worker}). Реши её в браузере — остальные потоки продолжают работу.")
+        self._call_hook("detected", page)
+        generation = self._resume_generation_now()
+        while not self.stop_event.is_set():
+            generation = await self._captcha_poll(generation)
+            board.set_state(worker, CAPTCHA_CHECKING)
+            if not await self._is_captcha(page):
+                board.set_state(worker, CAPTCHA_RUNNING)
+                self._log(f"✅ Капча снята ({worker}). Продолжаю.")
+                self._call_hook("cleared", page)
+                return True
+            board.set_state(worker, CAPTCHA_PARKED)
+        board.set_state(worker, CAPTCHA_STOPPED)
+        return False
+
+    async def _checkpoint(self, page: Page) -> bool:
+        """Honour pause/stop and wait out a captcha; False means stop.
+
+        The captcha check is sampled like in the sync scrapers: after a page
+        load or once ``captcha_check_interval_s`` has passed.
+        """
+        while self.pause_event.is_set() and not self.stop_event.is_set():
+            await asyncio.sleep(0.1)
+        if self.stop_event.is_set():
+            return False
+        probe = self._captcha_probes.get(id(page))
+        if probe is None:
+            probe = self._captcha_probes[id(page)] = CaptchaProbe(self.captcha_check_interval_s)
+        if await probe.check_async(page):
+            return await self._wait_captcha(page)
+        return True
+
+    async def _first_matching_selector(
+        self, page: Page, page_type: str, selectors: Iterable[str]
+    ) -> Optional[str]:
+        registry = get_selector_registry()
+        for probes, selector in enumerate(registry.ordered(page_type, selectors), start=1):
+            try:
+                if await page.locator(selector).count() > 0:
+                    registry.record(page_type, selector, probes)
+                    return selector
+            except Exception:
+                LOGGER.debug("Locator failed for %s", selector, exc_info=True)
+        return None
+
+    async def serp(
+        self,
+        query: str,
+        *,
+        lr: str = "120590",
+        limit: Optional[int] = None,
+        max_clicks: int = 800,
+        row_cb: Optional[Callable[[dict], None]] = None,
+        pages: Optional[int] = None,
+        row_filter: Optional[Callable[[dict], bool]] = None,
+    ) -> list[dict]:
+        """Rows from the first ``pages`` SERP result pages (``serp_pages`` by default).
+
+        Page N+1 is only opened once page N is fully loaded and could not fill
+        ``limit`` on its own. It is prefetched on an extra tab while page N's
+        rows are parsed when a semaphore slot is free (the tab holds that slot
+        until it is closed), otherwise it loads on the main tab afterwards.
+        Rows are deduped across pages. As in ``parse_serp_cards``, ``limit``
+        counts rows that pass ``row_filter`` and the carousel is paged further
+        while short.
+        """
+        rows: list[dict] = []
+        pages = max(1, pages or self.serp_pages)
+        assert self._semaphore is not None
+        async with self._semaphore:
+            if self.serp_http and (self._http_hits or self._http_misses < HTTP_FALLBACK_LIMIT):
+                http_rows = await self._serp_over_http(
+                    query, lr=lr, limit=limit, pages=pages, row_cb=row_cb, row_filter=row_filter
+                )
+                if http_rows is not None:
+                    return http_rows
+            context, page = await self._open_page(query)
+            prefetch: Optional[asyncio.Task] = None
+            extra_tab: Optional[Page] = None
+            try:
+                self._log(f"быстрый: открываю поиск → {build_serp_url(query, lr)}")
+                result = await self._load_serp_page(
+                    query, lr=lr, page_no=0, limit=limit, max_clicks=max_clicks, page=page
+                )
+                seen_keys: set[str] = set()
+                passed = 0
+                for page_no in range(pages):
+                    if result is None:
+                        # Past the first page an empty one means the results ended.
+                        break
+                    tab, selector, snapshots, clicks_used = result
+                    has_next = page_no + 1 < pages and not (limit and passed + len(snapshots) >= limit)
+                    if has_next and not self._semaphore.locked():
+                        await self._semaphore.acquire()
+                        extra_tab = await self._open_extra_tab(context, query, page_no + 1)
+                        prefetch = asyncio.create_task(
+                            self._load_serp_page(
+                                query, lr=lr, page_no=page_no + 1, limit=limit, max_clicks=0, page=extra_tab
+                            )
+                        )
+                    before = len(rows)
+                    added = await self._serp_tab_rows(
+                        tab,
+                        selector,
+                        snapshots,
+                        seen_keys=seen_keys,
+                        rows=rows,
+                        limit=limit - passed if limit else None,
+                        max_clicks=max_clicks if page_no == 0 else 0,
+                        clicks_used=clicks_used,
+                        row_cb=row_cb,
+                        row_filter=row_filter,
+                    )
+                    if len(rows) > before:
+                        await archive_page_async("serp", tab.content, url=tab.url, query=query)
+                    if tab is not page:
+                        await self._close_extra_tab(tab)
+                    if added is None:
+                        break
+                    passed += added
+                    if page_no + 1 >= pages or (limit and passed >= limit):
+                        break
+                    if prefetch is not None:
+                        task, prefetch = prefetch, None
+                        try:
+                            result = await task
+                        except Exception:
+                            LOGGER.debug("SERP: page %s failed for %s", page_no + 2, query, exc_info=True)
+                            result = None
+                        if result is None:
+                            await self._close_extra_tab(extra_tab)
+                    else:
+                        result = await self._load_serp_page(
+                            query, lr=lr, page_no=page_no + 1, limit=limit, max_clicks=0, page=page
+                        )
+                self._log(f"SERP: {query}: строк {len(rows)}")
+                if self.serp_http:
+                    harvest_cookies(await context.cookies())
+            finally:
+                if prefetch is not None:
+                    prefetch.cancel()
+                    await asyncio.gather(prefetch, return_exceptions=True)
+                await self._close_extra_tab(extra_tab)
+                await self._close_context(context)
+        return rows
+
+    async def _open_extra_tab(self, context, query: str, page_no: int) -> Page:
+        """Tab for a prefetched results page; the caller has taken a semaphore slot for it."""
+        try:
+            tab = await context.new_page()
+        except BaseException:
+            assert self._semaphore is not None
+            self._semaphore.release()
+            raise
+        tab.set_default_timeout(20000)
+        self._register_page(tab, f"{query} · стр. {page_no + 1}")
+        return tab
+
+    async def _close_extra_tab(self, tab: Optional[Page]) -> None:
+        """Close a prefetch tab once and give its semaphore slot back."""
+        if tab is None or id(tab) not in self._page_workers:
+            return
+        self._forget_page(tab)
+        assert self._semaphore is not None
+        self._semaphore.release()
+        try:
+            await tab.close()
+        except Exception:
+            LOGGER.debug("Failed to close SERP tab", exc_info=True)
+
+    async def _load_serp_page(
+        self,
+        query: str,
+        *,
+        lr: str,
+        page_no: int,
+        limit: Optional[int],
+        max_clicks: int,
+        page: Page,
+    ) -> Optional[tuple[Page, str, list, int]]:
+        """Open results page ``page_no`` on ``page`` and snapshot its cards; None when it has none or the run stops."""
+        url = build_serp_url(query, lr, page_no)
+        await self._acquire(url)
+        await page.goto(url, wait_until="domcontentloaded")
+        if not await self._checkpoint(page):
+            return None
+        selector = await self._first_matching_selector(page, "serp_cards", SERP_CARD_SELECTORS)
+        if selector is None:
+            if page_no == 0:
+                self._log("SERP: карточки не найдены.")
+            return None
+        clicks_used = 0
+        if max_clicks:
+            clicks_used = await self._load_carousel(
+                page, selector, max_cards=limit + LIMIT_CARD_MARGIN if limit else 0, max_clicks=max_clicks
+            )
+            if not await self._checkpoint(page):
+                return None
+        return page, selector, await self._snapshot_serp_cards(page, selector), clicks_used
+
+    async def _snapshot_serp_cards(self, page: Page, selector: str) -> list:
+        snapshots = await page.eval_on_selector_all(
+            selector, f"(nodes) => nodes.map({SERP_CARD_SNAPSHOT_JS})"
+        )
+        return snapshots or []
+
+    async def _serp_tab_rows(
+        self,
+        page: Page,
+        selector: str,
+        snapshots: list,
+        *,
+        seen_keys: set[str],
+        rows: list[dict],
+        limit: Optional[int],
+        max_clicks: int,
+        clicks_used: int,
+        row_cb: Optional[Callable[[dict], None]],
+        row_filter: Optional[Callable[[dict], bool]],
+    ) -> Optional[int]:
+        """Rows of one results tab, paging its carousel while short of ``limit`` passing rows.
+
+        Returns how many appended rows passed ``row_filter``; None means stop.
+        """
+        passed = 0
+        start = 0
+        while True:
+            added = await self._serp_rows(
+                page,
+                selector,
+                snapshots[start:],
+                offset=start,
+                seen_keys=seen_keys,
+                rows=rows,
+                limit=limit - passed if limit else None,
+                row_cb=row_cb,
+                row_filter=row_filter,
+            )
+            if added is None:
+                return None
+            passed += added
+            if not (limit and passed < limit and clicks_used < max_clicks):
+                return passed
+            start = len(snapshots)
+            clicks_used = await self._load_carousel(
+                page,
+                selector,
+                max_cards=start + (limit - passed) + LIMIT_CARD_MARGIN,
+                max_clicks=max_clicks,
+                clicks_used=clicks_used,
+            )
+            if not await self._checkpoint(page):
+                return None
+            snapshots = await self._snapshot_serp_cards(page, selector)
+            if len(snapshots) <= start:
+                return passed
+
+    async def _serp_rows(
+        self,
+        page: Page,
+        selector: str,
+        snapshots: list,
+        *,
+        offset: int = 0,
+        seen_keys: set[str],
+        rows: list[dict],
+        limit: Optional[int],
+        row_cb: Optional[Callable[[dict], None]],
+        row_filter: Optional[Callable[[dict], bool]] = None,
+    ) -> Optional[int]:
+        """Append new rows from card snapshots; returns how many passed ``row_filter``, None means stop."""
+        cards = page.locator(selector)
+        passed = 0
+        for idx, snapshot in enumerate(snapshots, start=offset):
+            if limit and passed >= limit:
+                break
+            if not await self._checkpoint(page):
+                return None
+            fields = _snapshot_fields(snapshot)
+            phones = str(fields["phones"])
+            dedupe_key = _serp_dedupe_key(
+                str(fields["card_url"]), str(fields["name"]), str(fields["reviews"])
+            )
+            if dedupe_key in seen_keys:
+                continue
+            card = cards.nth(idx)
+            website = str(fields["website"])
+            card_url = str(fields["card_url"])
+            if not phones:
+                phones = await self._click_show_phone(page, card)
+            if _needs_extra_popup(phones, card_url, website):
+                popup_phone, popup_profile, popup_site = await self._extract_from_extra_popup(page, card)
+                phones = phones or popup_phone
+                website = website or popup_site
+                card_url = popup_profile or card_url
+            seen_keys.add(dedupe_key)
+            row = _build_serp_row(
+                name=str(fields["name"]),
+                rating=str(fields["rating"]),
+                reviews=str(fields["reviews"]),
+                verified=bool(fields["verified"]),
+                phones=phones,
+                website=website,
+                card_url=card_url,
+            )
+            rows.append(row)
+            passed += _count_passing(row_filter, row)
+            if row_cb:
+                row_cb(row)
+            await self._delay()
+        return passed
+
+    async def _serp_over_http(
+        self,
+        query: str,
+        *,
+        lr: str,
+        limit: Optional[int],
+        pages: int,
+        row_cb: Optional[Callable[[dict], None]],
+        row_filter: Optional[Callable[[dict], bool]] = None,
+    ) -> Optional[list[dict]]:
+        rows: list[dict] = []
+        seen_keys: set[str] = set()
+        passed = 0
+        # Pages are fetched one by one: the next one only when the limit is still short.
+        for page_no in range(pages):
+            if limit and passed >= limit:
+                break
+            try:
+                result = await asyncio.to_thread(
+                    fetch_serp_rows,
+                    query,
+                    lr,
+                    limit=None if row_filter else limit,
+                    page=page_no,
+                    stop_event=self.stop_event,
+                    pause_event=self.pause_event,
+                )
+            except NoSerpCards:
+                if page_no > 0:
+                    break
+                raise
+            except NeedsBrowser as exc:
+                self._http_misses += 1
+                self._log(f"SERP: {query}: без браузера не получилось ({exc}) — открываю Chrome")
+                return None
+            for row in result:
+                if limit and passed >= limit:
+                    break
+                dedupe_key = _serp_dedupe_key(row["url"], row["name"], row["reviews"])
+                if dedupe_key not in seen_keys:
+                    seen_keys.add(dedupe_key)
+                    rows.append(row)
+                    passed += _count_passing(row_filter, row)
+        self._http_hits += 1
+        for row in rows:
+            if row_cb:
+                row_cb(row)
+        self._log(f"SERP: {query}: строк {len(rows)} без браузера")
+        return rows
+
+    async def _load_carousel(
+        self,
+        page: Page,
+        selector: str,
+        *,
+        max_cards: int,
+        max_clicks: int,
+        clicks_used: int = 0,
+    ) -> int:
+        """Page the carousel like ``_load_all_cards``; returns the arrow clicks used so far."""
+        cards = page.locator(selector)
+        progress = CarouselProgress(await cards.count())
+        while clicks_used < max_clicks:
+            if not await self._checkpoint(page):
+                break
+            if max_cards and progress.last_count >= max_cards:
+                break
+            arrow = page.locator(CAROUSEL_ARROW_SELECTOR).first
+            try:
+                arrow_visible = await arrow.count() > 0 and await arrow.is_visible()
+            except Exception:
+                arrow_visible = False
+            try:
+                shadow_visible = await page.locator(CAROUSEL_SHADOW_SELECTOR).count() > 0
+            except Exception:
+                shadow_visible = False
+            if progress.ended_before_click(arrow_visible, shadow_visible):
+                break
+            if arrow_visible:
+                await self._acquire(page.url)
+                clicks_used += 1
+                try:
+                    await arrow.click(timeout=800)
+                except Exception:
+                    LOGGER.debug("SERP: arrow click failed", exc_info=True)
+            await asyncio.sleep(0.2)
+            try:
+                progress.update(await cards.count())
+            except Exception:
+                progress.update(progress.last_count)
+            await asyncio.sleep(0.2)
+            if progress.ended_after_click(shadow_visible):
+                break
+        self._log(f"SERP: карточек найдено {progress.last_count}.")
+        return clicks_used
+
+    async def _click_show_phone(self, page: Page, card) -> str:
+        try:
+            btn = card.locator(".OrgsListActions-FirstMainButton").first
+            if await btn.count() == 0:
+                return ""
+            text_before = (await btn.text_content()) or ""
+            if "Показать телефон" not in text_before:
+                return ""
+            await self._acquire(page.url)
+            await btn.click(timeout=800, force=True)
+            await asyncio.sleep(0.2)
+            text_after = (await btn.text_content()) or ""
+            return ", ".join(extract_phones(text_after))
+        except Exception:
+            LOGGER.debug("SERP: show phone failed", exc_info=True)
+            return ""
+
+    async def _extract_from_extra_popup(self, page: Page, card) -> tuple[str, str, str]:
+        """Phones, profile link and site from the card's "Ещё" popup, as the sync parser reads them."""
+        try:
+            btn = card.locator(EXTRA_BUTTON_SELECTOR).first
+            if await btn.count() == 0:
+                return "", "", ""
+            snapshot = None
+            for _ in range(2):
+                try:
+                    await card.scroll_into_view_if_needed(timeout=500)
+                except Exception:
+                    pass
+                await self._acquire(page.url)
+                try:
+                    await btn.click(timeout=800, force=True)
+                except Exception:
+                    await btn.evaluate("el => el.click()")
+                await asyncio.sleep(0.2)
+                snapshot = await page.evaluate(EXTRA_POPUP_JS)
+                if snapshot:
+                    break
+            if not snapshot:
+                return "", "", ""
+            try:
+                await page.keyboard.press("Escape")
+            except Exception:
+                pass
+            return _extra_popup_fields(snapshot)
+        except Exception:
+            LOGGER.debug("SERP: extra popup failed", exc_info=True)
+            return "", "", ""
+
+    async def maps(
+        self,
+        query: str,
+        *,
+        limit: Optional[int] = None,
+        org_cb: Optional[Callable[[Organization], None]] = None,
+    ) -> list[Organization]:
+        organizations: list[Organization] = []
+        assert self._semaphore is not None
+        async with self._semaphore:
+            context, page = await self._open_page(query)
+            try:
+                url = YandexMapsScraper.search_url(query)
+                self._log("Открываю страницу: %s", url)
+                await self._acquire(url)
+                await page.goto(url, wait_until="domcontentloaded")
+                if not await self._checkpoint(page):
+                    return organizations
+                try:
+                    await page.wait_for_selector(YandexMapsScraper.list_item_selector, timeout=30000)
+                except PlaywrightTimeoutError:
+                    self._log("Результаты не найдены: %s", query)
+                    return organizations
+
+                loop = asyncio.get_running_loop()
+                visible_ids: set[str] = set(await self._visible_ids(page))
+                tried_ids: set[str] = set()
+                end_tracker = ListEndTracker(YandexMapsScraper.max_scroll_idle_time)
+                while not (limit and len(organizations) >= limit):
+                    if not await self._checkpoint(page):
+                        break
+                    parsed_this_round = 0
+                    for org_id in await self._visible_ids(page):
+                        if org_id in tried_ids:
+                            continue
+                        if limit and len(organizations) >= limit:
+                            break
+                        if not await self._checkpoint(page):
+                            return organizations
+                        tried_ids.add(org_id)
+                        org = await self._open_maps_card(page, org_id, query)
+                        if org is None:
+                            continue
+                        organizations.append(org)
+                        parsed_this_round += 1
+                        if org_cb:
+                            org_cb(org)
+                        await self._delay()
+                    try:
+                        result = await page.evaluate(
+                            SCROLL_LIST_JS,
+                            {
+                                "selector": YandexMapsScraper.scroll_container_selector,
+                                "scrollStep": 1200,
+                            },
+                        )
+                    except Exception:
+                        LOGGER.debug("Maps: list scroll failed", exc_info=True)
+                        result = None
+                    await asyncio.sleep(random.uniform(0.15, 0.25))
+                    before = len(visible_ids)
+                    visible_ids.update(await self._visible_ids(page))
+                    verdict = end_tracker.step(
+                        moved=bool(result and result.get("moved")),
+                        added=len(visible_ids) - before,
+                        parsed=parsed_this_round,
+                        scroll_top=result.get("scrollTop") if result else None,
+                    )
+                    if verdict == "more":
+                        await asyncio.sleep(random.uniform(0.2, 0.4))
+                        continue
+                    if verdict == "end":
+                        break
+                    # At the bottom: give lazy loading a chance before calling it the end.
+                    idle_start_size = len(visible_ids)
+                    deadline = loop.time() + ListEndTracker.LAZY_LOAD_WAIT_S
+                    while loop.time() < deadline and not self.stop_event.is_set():
+                        await asyncio.sleep(random.uniform(0.3, 0.5))
+                        visible_ids.update(await self._visible_ids(page))
+                        if len(visible_ids) > idle_start_size:
+                            break
+                    if self.stop_event.is_set() or not end_tracker.waited(len(visible_ids) - idle_start_size):
+                        break
+                self._log("Карты: %s: организаций %s", query, len(organizations))
+            finally:
+                await self._close_context(context)
+        return organizations
+
+    async def _visible_ids(self, page: Page) -> list[str]:
+        try:
+            return await page.evaluate(VISIBLE_IDS_JS, YandexMapsScraper.list_item_selector) or []
+        except Exception:
+            return []
+
+    async def _open_maps_card(self, page: Page, org_id: str, query: str = "") -> Optional[Organization]:
+        await self._acquire(page.url)
+        registry = get_selector_registry()
+        wrapper_selectors = registry.ordered(
+            "maps_card_wrapper", YandexMapsScraper.list_item_wrapper_selectors
+        )
+        clicked = await page.evaluate(
+            CLICK_LIST_ITEM_JS,
+            {
+                "itemSelector": YandexMapsScraper.list_item_selector,
+                "wrapperSelectors": wrapper_selectors,
+                "orgId": org_id,
+            },
+        )
+        if not clicked:
+            return None
+        registry.record("maps_card_wrapper", clicked, wrapper_selectors.index(clicked) + 1)
+        card_selector = f"aside.sidebar-view._shown div.business-card-view[data-id='{org_id}']"
+        try:
+            await page.wait_for_selector(card_selector, timeout=4000)
+        except PlaywrightTimeoutError:
+            LOGGER.info("Карточка не загрузилась (id=%s)", org_id)
+            return None
+        snapshot = await page.eval_on_selector(card_selector, MAPS_CARD_SNAPSHOT_JS)
+        await archive_page_async(
+            "maps_card",
+            lambda: page.eval_on_selector(card_selector, "el => el.outerHTML"),
+            url=page.url,
+            query=query,
+            org_id=org_id,
+        )
+        return YandexMapsScraper.organization_from_snapshot(snapshot or {}, org_id)
+
+    async def reviews(
+        self,
+        url: str,
+        *,
+        review_cb: Optional[Callable[[Review], None]] = None,
+        idle_s: float = YandexReviewsParser.max_scroll_idle_time,
+    ) -> list[Review]:
+        reviews: list[Review] = []
+        target = YandexReviewsParser._normalize_url(url)
+        if not target:
+            return reviews
+        org_id = extract_org_id(target)
+        assert self._semaphore is not None
+        async with self._semaphore:
+            context, page = await self._open_page(target)
+            try:
+                self._log("Открываю карточку организации: %s", target)
+                await self._acquire(target)
+                await page.goto(target, wait_until="domcontentloaded")
+                if not await self._checkpoint(page):
+                    return reviews
+                loop = asyncio.get_running_loop()
+                last_count = 0
+                last_new = loop.time()
+                while loop.time() - last_new < idle_s:
+                    if not await self._checkpoint(page):
+                        return reviews
+                    count = await page.locator(YandexReviewsParser.review_selector).count()
+                    if count > last_count:
+                        last_count = count
+                        last_new = loop.time()
+                    await page.evaluate(
+                        SCROLL_CONTAINER_JS,
+                        {
+                            "selector": YandexReviewsParser.scroll_container_selector,
+                            "scrollStep": 1200,
+                        },
+                    )
+                    await asyncio.sleep(0.25)
+                await page.evaluate(
+                    EXPAND_REVIEWS_JS,
+                    [YandexReviewsParser.expand_selector, YandexReviewsParser.comment_expand_selector],
+                )
+                await asyncio.sleep(0.2)
+                snapshots = await page.evaluate(REVIEWS_SNAPSHOT_JS, YandexReviewsParser.snapshot_args())
+                await archive_page_async("reviews", page.content, url=target, org_id=org_id)
+                for snapshot in snapshots or []:
+                    review = YandexReviewsParser.review_from_snapshot(snapshot, org_id)
+                    reviews.append(review)
+                    if review_cb:
+                        review_cb(review)
+                self._log("Найдено отзывов: %s", len(reviews))
+            finally:
+                await self._close_context(context)
+        return reviews
+
+
+async def _guarded(
+    engine: AsyncScrapeEngine, label: str, coro: Awaitable[list[T]]
+) -> tuple[list[T], str]:
+    """Run one flow; a failure is logged and returned as its message instead of raised."""
+    try:
+        return await coro, ""
+    except Exception as exc:
+        engine._log(f"❌ Ошибка ({label}): {exc}")
+        LOGGER.debug("Async flow failed for %s", label, exc_info=True)
+        return [], str(exc) or exc.__class__.__name__
+
+
+def _run_batch(
+    items: list[str],
+    engine_kwargs: dict[str, Any],
+    flow: Callable[[AsyncScrapeEngine, str], Awaitable[list[T]]],
+    errors: Optional[dict[str, str]] = None,
+) -> dict[str, list[T]]:
+    """Run ``flow`` for every item; items whose flow raised are reported in ``errors``."""
+
+    # Duplicate items would share one result slot; run each once.
+    items = list(dict.fromkeys(items))
+
+    async def _main() -> dict[str, list[T]]:
+        async with AsyncScrapeEngine(**engine_kwargs) as engine:
+            outcomes = await asyncio.gather(
+                *(_guarded(engine, item, flow(engine, item)) for item in items)
+            )
+        found: dict[str, list[T]] = {}
+        for item, (results, error) in zip(items, outcomes):
+            found[item] = results
+            if error and errors is not None:
+                errors[item] = error
+        return found
+
+    return asyncio.run(_main())
+
+
+def run_serp_queries(
+    queries: Iterable[str],
+    *,
+    lr: str = "120590",
+    limit: Optional[int] = None,
+    row_cb: Optional[Callable[[dict], None]] = None,
+    row_filter: Optional[Callable[[dict], bool]] = None,
+    errors: Optional[dict[str, str]] = None,
+    **engine_kwargs: Any,
+) -> dict[str, list[dict]]:
+    """Sync entry point: run SERP parsing for many queries concurrently.
+
+    ``limit`` counts rows accepted by ``row_filter`` (all rows without one).
+    """
+    return _run_batch(
+        list(queries),
+        engine_kwargs,
+        lambda engine, query: engine.serp(query, lr=lr, limit=limit, row_cb=row_cb, row_filter=row_filter),
+        errors,
+    )
+
+
+def run_maps_queries(
+    queries: Iterable[str],
+    *,
+    limit: Optional[int] = None,
+    org_cb: Optional[Callable[[Organization], None]] = None,
+    errors: Optional[dict[str, str]] = None,
+    **engine_kwargs: Any,
+) -> dict[str, list[Organization]]:
+    """Sync entry point: run the Maps list scraper for many queries concurrently."""
+    return _run_batch(
+        list(queries),
+        engine_kwargs,
+        lambda engine, query: engine.maps(query, limit=limit, org_cb=org_cb),
+        errors,
+    )
+
+
+def run_reviews_urls(
+    urls: Iterable[str],
+    *,
+    review_cb: Optional[Callable[[Review], None]] = None,
+    errors: Optional[dict[str, str]] = None,
+    **engine_kwargs: Any,
+) -> dict[str, list[Review]]:
+    """Sync entry point: collect reviews for many organizations concurrently."""
+    return _run_batch(
+        list(urls),
+        engine_kwargs,
+        lambda engine, url: engine.reviews(url, review_cb=review_cb),
+        errors,
+    )
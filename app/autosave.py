@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+
+LOGGER = logging.getLogger(__name__)
+
+
+class AutosavePolicy:
+    """Decides when a writer asks for a save: every N rows or every N seconds."""
+
+    def __init__(self, every_rows: int = 10, every_s: float = 0.0) -> None:
+        self.every_rows = max(1, int(every_rows))
+        self.every_s = max(0.0, float(every_s))
+        self._rows = 0
+        self._last = time.monotonic()
+
+    def due(self) -> bool:
+        self._rows += 1
+        if self.every_s > 0:
+            now = time.monotonic()
+            if now - self._last < self.every_s:
+                return False
+            self._last = now
+            return True
+        return self._rows % self.every_rows == 0
+
+
+class BackgroundAutosave:
+    """Persists writer snapshots on a daemon thread.
+
+    ``request(version)`` only records the newest version and returns
+    immediately; the thread writes whatever is newest when it wakes up, so a
+    slow disk makes intermediate snapshots collapse into one instead of
+    stalling the scrape loop. ``save(version)`` must only read data that was
+    already complete at that version.
+    """
+
+    def __init__(self, save: Callable[[int], None], *, name: str = "autosave") -> None:
+        self._save = save
+        self._condition = threading.Condition()
+        self._pending: Optional[int] = None
+        self._saved: Optional[int] = None
+        self._closed = False
+        self.saves = 0
+        self.coalesced = 0
+        self.failures = 0
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def request(self, version: int) -> None:
+        with self._condition:
+            if self._closed:
+                return
+            if self._pending is not None:
+                self.coalesced += 1
+            self._pending = version if self._pending is None else max(self._pending, version)
+            self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+                version, self._pending = self._pending, None
+            if version == self._saved:
+                continue
+            try:
+                self._save(version)
+                self._saved = version
+                self.saves += 1
+            except Exception:
+                self.failures += 1
+                LOGGER.warning("Не удалось автосохранить файл, попробую при следующем сохранении", exc_info=True)
+
+    def close(self) -> None:
+        """Stop the thread after the save in progress; the caller writes the final state itself."""
+        with self._condition:
+            self._closed = True
+            self._pending = None
+            self._condition.notify()
+        self._thread.join()
+
+    def metrics(self) -> dict:
+        return {"saves": self.saves, "coalesced": self.coalesced, "failures": self.failures}
+
+
+def save_workbook_atomic(workbook, path: Path) -> None:
+    """Save next to ``path`` and swap it in, so a crash never leaves a truncated file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.stem}.tmp{path.suffix}")
+    workbook.save(tmp_path)
+    os.replace(tmp_path, path)
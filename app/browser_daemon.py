@@ -0,0 +1,157 @@
+"""Warm Chrome kept alive between runs and shared over CDP.
+
+`launch_chrome` connects to it when the state file points at a live endpoint,
+so back-to-back GUI/CLI runs skip the browser start. Each run still creates
+its own context and clears storage as before.
+
+    python main.py --browser-daemon [--headless true]   # serve in foreground
+    python -m app.browser_daemon start|stop|status
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from app.playwright_utils import (
+    DAEMON_STATE_PATH,
+    PLAYWRIGHT_LAUNCH_ARGS,
+    daemon_endpoint,
+    launch_chrome,
+    read_daemon_state,
+)
+
+
+LOGGER = logging.getLogger(__name__)
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+START_TIMEOUT_S = 30.0
+POLL_INTERVAL_S = 0.5
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+def _write_state(state: dict) -> None:
+    DAEMON_STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = DAEMON_STATE_PATH.with_suffix(".tmp")
+    tmp_path.write_text(json.dumps(state), encoding="utf-8")
+    os.replace(tmp_path, DAEMON_STATE_PATH)
+
+
+def _owns_state(pid: int) -> bool:
+    state = read_daemon_state()
+    return state is not None and int(state.get("pid", 0)) == pid
+
+
+def serve(*, headless: bool, port: int = 0) -> None:
+    """Run the warm browser until the state file is removed or Chrome exits."""
+    from playwright.sync_api import sync_playwright
+
+    port = port or _free_port()
+    pid = os.getpid()
+    with sync_playwright() as p:
+        browser = launch_chrome(
+            p,
+            headless=headless,
+            args=[*PLAYWRIGHT_LAUNCH_ARGS, f"--remote-debugging-port={port}"],
+            use_daemon=False,
+        )
+        _write_state(
+            {
+                "pid": pid,
+                "endpoint": f"http://127.0.0.1:{port}",
+                "headless": bool(headless),
+                "started_at": time.time(),
+            }
+        )
+        LOGGER.info("Прогретый браузер слушает CDP на порту %s", port)
+        try:
+            while browser.is_connected() and _owns_state(pid):
+                time.sleep(POLL_INTERVAL_S)
+        finally:
+            if _owns_state(pid):
+                DAEMON_STATE_PATH.unlink(missing_ok=True)
+            try:
+                browser.close()
+            except Exception:
+                LOGGER.debug("Failed to close daemon browser", exc_info=True)
+
+
+def _daemon_command(headless: bool) -> list[str]:
+    flags = ["--browser-daemon", "--headless", "true" if headless else "false"]
+    if getattr(sys, "frozen", False):
+        return [sys.executable, *flags]
+    return [sys.executable, str(ROOT_DIR / "main.py"), *flags]
+
+
+def ensure_browser_daemon(*, headless: bool, timeout_s: float = START_TIMEOUT_S) -> Optional[str]:
+    """Start the daemon in the background unless a matching one is already up."""
+    endpoint = daemon_endpoint(headless=headless)
+    if endpoint:
+        return endpoint
+    if read_daemon_state() is not None:
+        # A daemon in the other headless mode (or a dead one) holds the slot.
+        stop_browser_daemon()
+    kwargs: dict = {
+        "cwd": ROOT_DIR,
+        "stdin": subprocess.DEVNULL,
+        "stdout": subprocess.DEVNULL,
+        "stderr": subprocess.DEVNULL,
+    }
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    subprocess.Popen(_daemon_command(headless), **kwargs)
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        endpoint = daemon_endpoint(headless=headless)
+        if endpoint:
+            return endpoint
+        time.sleep(0.2)
+    LOGGER.warning("Прогретый браузер не запустился за %.0f с", timeout_s)
+    return None
+
+
+def stop_browser_daemon() -> bool:
+    # Removing the state file is the stop signal; the daemon closes Chrome itself.
+    if read_daemon_state() is None:
+        return False
+    DAEMON_STATE_PATH.unlink(missing_ok=True)
+    return True
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Warm Chrome shared over CDP")
+    parser.add_argument("action", choices=["start", "stop", "status"])
+    parser.add_argument("--headless", action="store_true")
+    args = parser.parse_args(argv)
+    if args.action == "start":
+        endpoint = ensure_browser_daemon(headless=args.headless)
+        print(endpoint or "❌ Не удалось запустить браузер")
+        return 0 if endpoint else 1
+    if args.action == "stop":
+        print("Остановлен" if stop_browser_daemon() else "Не запущен")
+        return 0
+    state = read_daemon_state()
+    if state and daemon_endpoint(headless=bool(state.get("headless"))):
+        print(f"Работает: {state['endpoint']} (pid {state.get('pid')}, headless={state.get('headless')})")
+    else:
+        print("Не запущен")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
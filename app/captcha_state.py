@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+
+LOGGER = logging.getLogger(__name__)
+
+CAPTCHA_RUNNING = "running"
+CAPTCHA_PARKED = "parked"
+CAPTCHA_CHECKING = "checking"
+CAPTCHA_STOPPED = "stopped"
+_CAPTCHA_TRANSITIONS = {
+    CAPTCHA_RUNNING: {CAPTCHA_PARKED, CAPTCHA_STOPPED},
+    CAPTCHA_PARKED: {CAPTCHA_CHECKING, CAPTCHA_RUNNING, CAPTCHA_STOPPED},
+    CAPTCHA_CHECKING: {CAPTCHA_PARKED, CAPTCHA_RUNNING, CAPTCHA_STOPPED},
+    CAPTCHA_STOPPED: set(),
+}
+
+CaptchaBoardListener = Callable[[str, str, dict], None]
+
+
+@dataclass
+class WorkerCaptchaState:
+    worker: str
+    state: str = CAPTCHA_RUNNING
+    url: str = ""
+    since: float = field(default_factory=time.monotonic)
+    captchas: int = 0
+
+
+class CaptchaBoard:
+    """Per-worker captcha state machine shared by the pages of the async engine.
+
+    Workers are keyed by a unique id (the engine numbers its pages). A worker
+    that hits a captcha is moved to ``parked``; only that worker waits, the
+    others keep scraping. Listeners (CLI log, the sharded runner) are told
+    about every transition and can show which workers are waiting. Invalid
+    transitions are ignored.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._workers: dict[str, WorkerCaptchaState] = {}
+        self._listeners: list[CaptchaBoardListener] = []
+
+    def add_listener(self, listener: CaptchaBoardListener) -> None:
+        self._listeners.append(listener)
+
+    def set_state(self, worker: str, state: str, url: str = "") -> bool:
+        with self._lock:
+            entry = self._workers.setdefault(worker, WorkerCaptchaState(worker))
+            if state == entry.state or state not in _CAPTCHA_TRANSITIONS[entry.state]:
+                return False
+            previous = entry.state
+            if state == CAPTCHA_PARKED and previous == CAPTCHA_RUNNING:
+                entry.captchas += 1
+            entry.state = state
+            entry.url = url or entry.url
+            entry.since = time.monotonic()
+            info = {
+                "previous": previous,
+                "parked": self._parked_locked(),
+                "url": entry.url,
+                "captchas": entry.captchas,
+            }
+        for listener in list(self._listeners):
+            try:
+                listener(worker, state, info)
+            except Exception:
+                LOGGER.debug("Captcha board listener failed", exc_info=True)
+        return True
+
+    def forget(self, worker: str) -> None:
+        """Drop a finished worker so long runs do not accumulate entries."""
+        with self._lock:
+            self._workers.pop(worker, None)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._workers.clear()
+
+    def _parked_locked(self) -> list[str]:
+        return [
+            name
+            for name, entry in self._workers.items()
+            if entry.state in (CAPTCHA_PARKED, CAPTCHA_CHECKING)
+        ]
+
+    def parked(self) -> list[str]:
+        with self._lock:
+            return self._parked_locked()
+
+    def state_of(self, worker: str) -> str:
+        with self._lock:
+            entry = self._workers.get(worker)
+            return entry.state if entry else CAPTCHA_RUNNING
+
+    def snapshot(self) -> dict[str, dict]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name: {
+                    "state": entry.state,
+                    "url": entry.url,
+                    "for_s": round(now - entry.since, 1),
+                    "captchas": entry.captchas,
+                }
+                for name, entry in self._workers.items()
+            }
+
+
+def log_captcha_transitions(log: Callable[[str], None]) -> CaptchaBoardListener:
+    """Board listener that reports parked workers through ``log``."""
+
+    def _listener(worker: str, state: str, info: dict) -> None:
+        parked = info.get("parked") or []
+        if state == CAPTCHA_PARKED and info.get("previous") == CAPTCHA_RUNNING:
+            log(f"🧩 Ждут капчу: {len(parked)} ({', '.join(parked)})")
+        elif state == CAPTCHA_RUNNING:
+            log(f"▶️ {worker} продолжает работу; ждут капчу: {len(parked)}")
+
+    return _listener
@@ -16,6 +16,32 @@ CaptchaActionPoll = Callable[[str, Page], Optional[Page]]
 _logger = get_logger()
 
 CAPTCHA_BUTTON_SELECTOR = "input#js-button.CheckboxCaptcha-Button"
+CAPTCHA_PROBE_JS = """
+() => {
+  const url = (location.href || "").toLowerCase();
+  if (url.includes("captcha")) return true;
+  const title = (document.title || "").toLowerCase();
+  if (title.includes("вы не робот") || title.includes("капча") || title.includes("captcha")) return true;
+  if (document.querySelector("input[name='rep'], form[action*='captcha'], div[class*='captcha']")) {
+    return true;
+  }
+  if (!document.body) return false;
+  // Visible text only: scripts and styles may embed these strings without a captcha on screen.
+  const markers = ["введите символы", "подтвердите, что запросы отправляли вы"];
+  const skipped = new Set(["SCRIPT", "STYLE", "NOSCRIPT", "TEMPLATE"]);
+  const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT, {
+    acceptNode: (node) =>
+      node.parentElement && skipped.has(node.parentElement.tagName)
+        ? NodeFilter.FILTER_REJECT
+        : NodeFilter.FILTER_ACCEPT,
+  });
+  for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+    const value = (node.nodeValue || "").replace(/\\s+/g, " ").toLowerCase();
+    if (markers.some((marker) => value.includes(marker))) return true;
+  }
+  return false;
+}
+"""
 YANDEX_WHITELIST_URLS = [
     "https://yandex.ru",
     "https://mail.yandex.ru",
@@ -41,7 +67,26 @@ def is_captcha(page: Page) -> bool:
     """Best-effort detection of Yandex captcha pages.
 
     We do NOT try to bypass captcha; only detect it and allow user to solve it manually.
+    URL, title and markers are checked in a single evaluate; the per-check
+    fallback below only runs when evaluate fails (e.g. mid-navigation).
     """
+    try:
+        return bool(page.evaluate(CAPTCHA_PROBE_JS))
+    except Exception:
+        _logger.debug("Captcha probe evaluate failed, checking step by step", exc_info=True)
+    return _is_captcha_stepwise(page)
+
+
+async def is_captcha_async(page) -> bool:
+    """``is_captcha`` for async pages: the same probe, without the step-by-step fallback."""
+    try:
+        return bool(await page.evaluate(CAPTCHA_PROBE_JS))
+    except Exception:
+        _logger.debug("Captcha probe evaluate failed", exc_info=True)
+        return False
+
+
+def _is_captcha_stepwise(page: Page) -> bool:
     try:
         u = (page.url or "").lower()
         if "showcaptcha" in u or "/captcha" in u or "captcha" in u:
@@ -71,6 +116,92 @@ def is_captcha(page: Page) -> bool:
     return False
 
 
+class CaptchaProbe:
+    """Rate-limited captcha check for per-card loops.
+
+    A real check runs after a document load (``domcontentloaded``/``load``; URL
+    changes via pushState do not count, Maps makes one per card), or once
+    ``interval_s`` has passed since the previous one; other calls return False
+    without touching the browser. ``metrics()`` reports how many checks ran,
+    how many were skipped, how often a captcha was found and the total cost.
+    """
+
+    def __init__(self, interval_s: float = 2.0) -> None:
+        self.interval_s = max(0.0, float(interval_s))
+        self._page: Optional[Page] = None
+        self._dirty = True
+        self._last_check = 0.0
+        self.checks = 0
+        self.skipped = 0
+        self.fired = 0
+        self.triggers = 0
+        self.cost_s = 0.0
+
+    def _mark_dirty(self, *_args) -> None:
+        self._dirty = True
+        self.triggers += 1
+
+    def _attach(self, page: Page) -> None:
+        if page is self._page:
+            return
+        if self._page is not None:
+            # The page was replaced (e.g. by the visible captcha browser): stop listening to the old one.
+            for event in ("domcontentloaded", "load"):
+                try:
+                    self._page.remove_listener(event, self._mark_dirty)
+                except Exception:
+                    _logger.debug("Captcha probe: failed to unsubscribe from %s", event, exc_info=True)
+        self._page = page
+        self._dirty = True
+        try:
+            page.on("domcontentloaded", self._mark_dirty)
+            page.on("load", self._mark_dirty)
+        except Exception:
+            _logger.debug("Captcha probe: failed to subscribe to page events", exc_info=True)
+
+    def _due(self, page, force: bool) -> bool:
+        self._attach(page)
+        now = time.monotonic()
+        if not (force or self._dirty or now - self._last_check >= self.interval_s):
+            self.skipped += 1
+            return False
+        self._dirty = False
+        self._last_check = now
+        return True
+
+    def _record(self, found: bool, started: float) -> bool:
+        self.cost_s += time.perf_counter() - started
+        self.checks += 1
+        if found:
+            self.fired += 1
+            # Re-check right away next time: the captcha page may still be on screen.
+            self._dirty = True
+        return found
+
+    def check(self, page: Page, *, force: bool = False) -> bool:
+        if not self._due(page, force):
+            return False
+        started = time.perf_counter()
+        return self._record(is_captcha(page), started)
+
+    async def check_async(self, page, *, force: bool = False) -> bool:
+        """``check`` for async pages, used by the async engine."""
+        if not self._due(page, force):
+            return False
+        started = time.perf_counter()
+        return self._record(await is_captcha_async(page), started)
+
+    def metrics(self) -> dict:
+        return {
+            "checks": self.checks,
+            "skipped": self.skipped,
+            "fired": self.fired,
+            "triggers": self.triggers,
+            "cost_ms": round(self.cost_s * 1000, 1),
+            "avg_ms": round(self.cost_s * 1000 / self.checks, 2) if self.checks else None,
+        }
+
+
 def wait_captcha_resolved(
     page: Page,
     log: Callable[[str], None],
@@ -92,6 +223,8 @@ def wait_captcha_resolved(
       Page - captcha gone (we can continue)
       None - stop requested
     """
+    if rate_limiter is not None:
+        rate_limiter.record_captcha()
     if action_poll is not None:
         try:
             maybe_page = action_poll("detected", page)
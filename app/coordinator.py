@@ -0,0 +1,568 @@
+"""Spread one batch across machines through a small HTTP coordinator.
+
+The coordinator owns the item list and the output file. Worker nodes lease a
+few work units at a time (one query or org id each), scrape them with the
+async engine and post the results back. A lease that is neither completed nor
+renewed within ``lease_s`` goes back to the queue, so a node that dies only
+delays its units. Results are merged in item order and deduped by org id,
+which makes the output the same as a single-node run of the same list.
+
+    python -m app.coordinator serve maps --file queries.txt --port 8765
+    python -m app.coordinator work http://192.168.1.10:8765 --concurrency 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import socket
+import sys
+import threading
+import time
+import urllib.request
+from collections import deque
+from dataclasses import asdict, dataclass, field, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Optional
+
+from app.sharding import SHARD_KINDS
+from app.utils import organization_key
+
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+DEFAULT_LEASE_S = 180.0
+MAX_UNIT_ATTEMPTS = 3
+# Longer than a node's idle poll, so waiting nodes still hear that the batch is done.
+DONE_GRACE_S = 5.0
+# A node that reached the coordinator before gives up after this many failed calls in a row.
+MAX_MISSED_CALLS = 12
+TOKEN_HEADER = "X-Parser-Token"
+
+
+@dataclass
+class WorkUnit:
+    id: int
+    item: str
+    attempts: int = 0
+    worker: str = ""
+    deadline: float = 0.0
+    # Validated Organization/Review records, see Coordinator.complete().
+    results: Optional[list] = None
+    failed: bool = False
+    errors: list[str] = field(default_factory=list)
+
+
+class Coordinator:
+    """Hands out work units over HTTP and writes the merged output.
+
+    All state lives behind one lock; the HTTP handler threads only call
+    ``lease``/``renew``/``complete`` and the writer runs on the caller's thread.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        items: list[str],
+        *,
+        output_path: Path,
+        settings=None,
+        lease_s: float = DEFAULT_LEASE_S,
+        options: Optional[dict] = None,
+        token: str = "",
+        log: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        if kind not in SHARD_KINDS:
+            raise ValueError(f"Unknown work kind: {kind}")
+        from app.settings_model import Settings
+
+        self.kind = kind
+        self.units = [WorkUnit(index, item) for index, item in enumerate(dict.fromkeys(items))]
+        self.output_path = output_path
+        self.settings = settings or Settings()
+        self.lease_s = lease_s
+        self.options = options or {}
+        self.token = token
+        self._log_cb = log
+        self._lock = threading.Lock()
+        self._pending: deque[int] = deque(unit.id for unit in self.units)
+        self._next_merge = 0
+        self.seen_keys: set[str] = set()
+        self.written = 0
+        self.reassigned = 0
+        self.workers: dict[str, float] = {}
+
+    def _log(self, message: str) -> None:
+        if self._log_cb:
+            try:
+                self._log_cb(message)
+                return
+            except Exception:
+                pass
+        LOGGER.info(message)
+
+    def _expire_leases(self, now: float) -> None:
+        # An expired lease counts as a failed attempt, so a unit that keeps killing nodes ends.
+        for unit in self.units:
+            if unit.worker and unit.results is None and not unit.failed and unit.deadline < now:
+                unit.errors.append(f"{unit.worker}: lease expired")
+                if unit.attempts >= MAX_UNIT_ATTEMPTS:
+                    self._log(f"❌ {unit.item}: аренда истекла {unit.attempts} раз — пропускаю")
+                    unit.failed = True
+                else:
+                    self._log(f"⚠️ Аренда истекла: {unit.item} (узел {unit.worker}) — отдаю другому")
+                    self._pending.appendleft(unit.id)
+                    self.reassigned += 1
+                unit.worker = ""
+
+    @property
+    def finished(self) -> bool:
+        with self._lock:
+            return self._next_merge >= len(self.units)
+
+    def lease(self, worker: str, count: int) -> dict:
+        now = time.time()
+        units: list[dict] = []
+        with self._lock:
+            self.workers[worker] = now
+            self._expire_leases(now)
+            while self._pending and len(units) < max(1, count):
+                unit = self.units[self._pending.popleft()]
+                if unit.results is not None or unit.failed:
+                    continue
+                unit.worker = worker
+                unit.deadline = now + self.lease_s
+                unit.attempts += 1
+                units.append({"id": unit.id, "item": unit.item})
+            done = self._next_merge >= len(self.units)
+        return {
+            "kind": self.kind,
+            "options": self.options,
+            "lease_s": self.lease_s,
+            "units": units,
+            "done": done,
+        }
+
+    def renew(self, worker: str, unit_ids: list[int]) -> int:
+        now = time.time()
+        renewed = 0
+        with self._lock:
+            self.workers[worker] = now
+            for unit_id in unit_ids:
+                if 0 <= unit_id < len(self.units) and self.units[unit_id].worker == worker:
+                    self.units[unit_id].deadline = now + self.lease_s
+                    renewed += 1
+        return renewed
+
+    def _record(self, payload) -> object:
+        """Organization or Review from one node-supplied result; ValueError when it is malformed."""
+        if self.kind == "reviews":
+            from app.reviews_parser import Review as record_cls
+        else:
+            from app.pacser_maps import Organization as record_cls
+        if not isinstance(payload, dict):
+            raise ValueError("result must be an object")
+        types = {item.name: type(item.default) for item in fields(record_cls)}
+        for name, value in payload.items():
+            if name not in types:
+                raise ValueError(f"unknown result field: {name}")
+            if not isinstance(value, types[name]):
+                raise ValueError(f"bad value for {name}")
+        return record_cls(**payload)
+
+    def complete(self, worker: str, unit_id: int, results: list[dict], error: str = "") -> bool:
+        """Accept the first result for a unit; late duplicates from a reassigned lease are dropped.
+
+        Results are validated before any state changes; a malformed one raises ValueError.
+        """
+        records = [] if error else [self._record(payload) for payload in results]
+        with self._lock:
+            self.workers[worker] = time.time()
+            if not 0 <= unit_id < len(self.units):
+                return False
+            unit = self.units[unit_id]
+            if unit.results is not None or unit.failed:
+                return False
+            if error:
+                unit.errors.append(f"{worker}: {error}")
+                unit.worker = ""
+                if unit.attempts >= MAX_UNIT_ATTEMPTS:
+                    unit.failed = True
+                    self._log(f"❌ {unit.item}: не удалось после {unit.attempts} попыток ({error})")
+                else:
+                    self._pending.append(unit.id)
+                return True
+            unit.results = records
+            return True
+
+    def _merge_ready(self, writer) -> None:
+        # Units are written strictly in item order so the file matches a single-node run.
+        while True:
+            with self._lock:
+                if self._next_merge >= len(self.units):
+                    return
+                unit = self.units[self._next_merge]
+                if unit.results is None and not unit.failed:
+                    return
+                results, unit.results = unit.results or [], []
+                self._next_merge += 1
+            for record in results:
+                self._write(writer, record)
+
+    def _open_writer(self):
+        if self.kind == "reviews":
+            from app.review_index import ReviewIndex
+            from app.reviews_excel_writer import ReviewsExcelWriter
+
+            return ReviewsExcelWriter(
+                self.output_path,
+                flush_interval_s=self.settings.program.excel_save_interval_s,
+                index=ReviewIndex() if self.settings.program.reviews_incremental else None,
+            )
+        from app.excel_writer import ExcelWriter
+
+        return ExcelWriter(self.output_path, flush_interval_s=self.settings.program.excel_save_interval_s)
+
+    def _write(self, writer, record) -> None:
+        if self.kind == "reviews":
+            if writer.append(record):
+                self.written += 1
+            return
+        from app.filters import passes_potential_filters
+
+        key = organization_key(record)
+        if key in self.seen_keys:
+            return
+        self.seen_keys.add(key)
+        writer.append(record, include_in_potential=passes_potential_filters(record, self.settings))
+        self.written += 1
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "units": len(self.units),
+                "merged": self._next_merge,
+                "leased": sum(1 for unit in self.units if unit.worker and unit.results is None),
+                "failed": sum(1 for unit in self.units if unit.failed),
+                "reassigned": self.reassigned,
+                "written": self.written,
+                "workers": {name: round(time.time() - seen, 1) for name, seen in self.workers.items()},
+            }
+
+    def serve(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, stop_event=None) -> int:
+        """Run the HTTP server until every unit is merged; returns the number of written rows."""
+        stop_event = stop_event or threading.Event()
+        server = ThreadingHTTPServer((host, port), _handler_for(self))
+        server.daemon_threads = True
+        thread = threading.Thread(target=server.serve_forever, name="coordinator-http", daemon=True)
+        thread.start()
+        self._log(f"Координатор слушает {host}:{server.server_address[1]}: {len(self.units)} заданий")
+        writer = self._open_writer()
+        try:
+            while not self.finished and not stop_event.is_set():
+                self._merge_ready(writer)
+                stop_event.wait(0.2)
+            self._merge_ready(writer)
+        finally:
+            writer.close()
+            # Keep answering for a moment so nodes learn the batch is done instead of timing out.
+            if not stop_event.is_set():
+                stop_event.wait(DONE_GRACE_S)
+            server.shutdown()
+            server.server_close()
+        status = self.status()
+        self._log(
+            f"Координатор завершил: записей {self.written}, переназначено {status['reassigned']}, "
+            f"не выполнено {status['failed']}"
+        )
+        return self.written
+
+
+def _handler_for(coordinator: Coordinator) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format: str, *args) -> None:
+            LOGGER.debug("coordinator: " + format, *args)
+
+        def _reply(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _authorized(self) -> bool:
+            if coordinator.token and self.headers.get(TOKEN_HEADER) != coordinator.token:
+                self._reply(403, {"error": "bad token"})
+                return False
+            return True
+
+        def do_GET(self) -> None:
+            if not self._authorized():
+                return
+            if self.path == "/status":
+                self._reply(200, coordinator.status())
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self) -> None:
+            if not self._authorized():
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                data = json.loads(self.rfile.read(length) or b"{}")
+                worker = str(data.get("worker") or self.client_address[0])
+                if self.path == "/lease":
+                    self._reply(200, coordinator.lease(worker, int(data.get("count") or 1)))
+                elif self.path == "/renew":
+                    self._reply(200, {"renewed": coordinator.renew(worker, list(data.get("units") or []))})
+                elif self.path == "/complete":
+                    accepted = coordinator.complete(
+                        worker,
+                        int(data["unit"]),
+                        list(data.get("results") or []),
+                        str(data.get("error") or ""),
+                    )
+                    self._reply(200, {"accepted": accepted})
+                else:
+                    self._reply(404, {"error": "not found"})
+            except Exception as exc:
+                LOGGER.debug("Coordinator request failed", exc_info=True)
+                self._reply(400, {"error": str(exc)})
+
+    return Handler
+
+
+class CoordinatorClient:
+    def __init__(self, url: str, *, worker: str, token: str = "", timeout_s: float = 30.0) -> None:
+        self.url = url.rstrip("/")
+        self.worker = worker
+        self.token = token
+        self.timeout_s = timeout_s
+
+    def _post(self, path: str, payload: dict) -> dict:
+        body = json.dumps({"worker": self.worker, **payload}, ensure_ascii=False).encode("utf-8")
+        request = urllib.request.Request(
+            f"{self.url}{path}",
+            data=body,
+            headers={"Content-Type": "application/json", TOKEN_HEADER: self.token},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout_s) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    def lease(self, count: int) -> dict:
+        return self._post("/lease", {"count": count})
+
+    def renew(self, unit_ids: list[int]) -> None:
+        self._post("/renew", {"units": unit_ids})
+
+    def complete(self, unit_id: int, results: list[dict], error: str = "") -> None:
+        self._post("/complete", {"unit": unit_id, "results": results, "error": error})
+
+
+def _scrape_units(
+    kind: str, items: list[str], options: dict, engine_kwargs: dict
+) -> tuple[dict[str, list[dict]], dict[str, str]]:
+    """Results per item plus the error of every item whose flow failed."""
+    from app.async_engine import run_maps_queries, run_reviews_urls, run_serp_queries
+    from app.parser_search import _row_to_organization, potential_row_filter
+    from app.settings_model import PotentialFiltersSettings, Settings
+
+    limit = options.get("limit")
+    errors: dict[str, str] = {}
+    if kind == "maps":
+        found = run_maps_queries(items, limit=limit, errors=errors, **engine_kwargs)
+    elif kind == "serp":
+        # The coordinator's potential filters decide which rows count towards the limit.
+        filters = PotentialFiltersSettings.from_dict(options.get("potential_filters"))
+        rows = run_serp_queries(
+            items,
+            limit=limit,
+            row_filter=potential_row_filter(Settings(potential_filters=filters)),
+            errors=errors,
+            **engine_kwargs,
+        )
+        found = {item: [_row_to_organization(row) for row in batch] for item, batch in rows.items()}
+    else:
+        found = run_reviews_urls(items, errors=errors, **engine_kwargs)
+    return {item: [asdict(entry) for entry in entries] for item, entries in found.items()}, errors
+
+
+def run_node(
+    url: str,
+    *,
+    settings=None,
+    concurrency: int = 2,
+    token: str = "",
+    worker: str = "",
+    stop_event=None,
+    log: Optional[Callable[[str], None]] = None,
+) -> int:
+    """Lease units from the coordinator until it reports the batch done; returns units processed."""
+    from app.settings_store import load_settings
+
+    settings = settings or load_settings()
+    stop_event = stop_event or threading.Event()
+    log = log or LOGGER.info
+    client = CoordinatorClient(url, worker=worker or socket.gethostname(), token=token)
+    engine_kwargs = {
+        "headless": settings.program.headless,
+        "concurrency": max(1, concurrency),
+        "stop_event": stop_event,
+        "serp_http": settings.program.serp_http,
+        "serp_pages": settings.program.serp_pages,
+        "warm_browser": settings.program.warm_browser,
+        "log": log,
+    }
+    processed = 0
+    connected = False
+    missed = 0
+    while not stop_event.is_set():
+        try:
+            reply = client.lease(max(1, concurrency))
+        except Exception as exc:
+            missed += 1
+            if connected and missed >= MAX_MISSED_CALLS:
+                log("Координатор больше не отвечает — завершаю узел")
+                break
+            log(f"Координатор недоступен ({exc}), повторю через 5 с")
+            stop_event.wait(5.0)
+            continue
+        connected = True
+        missed = 0
+        units = reply.get("units") or []
+        if not units:
+            if reply.get("done"):
+                break
+            stop_event.wait(2.0)
+            continue
+        unit_ids = [unit["id"] for unit in units]
+        renew_stop = threading.Event()
+
+        def _renew_leases() -> None:
+            # Renew at a third of the lease so a slow page does not look like a dead node.
+            while not renew_stop.wait(max(1.0, float(reply.get("lease_s") or DEFAULT_LEASE_S) / 3)):
+                try:
+                    client.renew(unit_ids)
+                except Exception:
+                    LOGGER.debug("Lease renewal failed", exc_info=True)
+
+        renewer = threading.Thread(target=_renew_leases, name="lease-renew", daemon=True)
+        renewer.start()
+        items = [unit["item"] for unit in units]
+        try:
+            results, errors = _scrape_units(reply["kind"], items, reply.get("options") or {}, engine_kwargs)
+            error = ""
+        except Exception as exc:
+            LOGGER.debug("Node batch failed", exc_info=True)
+            results, errors, error = {}, {}, str(exc) or exc.__class__.__name__
+        finally:
+            renew_stop.set()
+        if stop_event.is_set():
+            # Interrupted units would be partial; let the lease expire so another node redoes them.
+            break
+        for unit in units:
+            try:
+                # A failed unit goes back with its error, so the coordinator retries it elsewhere.
+                client.complete(unit["id"], results.get(unit["item"], []), error or errors.get(unit["item"], ""))
+            except Exception:
+                LOGGER.warning("Не удалось отправить результат %s", unit["item"], exc_info=True)
+        processed += len(units)
+        log(f"Узел: обработано {processed} заданий")
+    return processed
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Distribute a batch across several machines")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="Run the coordinator and write the merged output")
+    serve.add_argument("kind", choices=SHARD_KINDS)
+    serve.add_argument("--file", required=True, help="Queries or org ids, one per line")
+    serve.add_argument("--host", default="127.0.0.1", help="Use 0.0.0.0 to accept other machines")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--lease", type=float, default=DEFAULT_LEASE_S, help="Seconds before a unit is reassigned")
+    serve.add_argument("--limit", type=int, default=0)
+    serve.add_argument("--tiles", type=int, default=0, help="Maps: split queries into N x N viewports")
+    serve.add_argument("--out", default="", help="Output Excel file")
+    serve.add_argument("--token", default="", help="Shared secret the nodes must send")
+
+    work = sub.add_parser("work", help="Run a worker node")
+    work.add_argument("url", help="Coordinator URL, e.g. http://192.168.1.10:8765")
+    work.add_argument("--concurrency", type=int, default=2, help="Units scraped at once")
+    work.add_argument("--headless", choices=["true", "false"], help="Override the headless setting")
+    work.add_argument("--name", default="", help="Node name shown in the coordinator status")
+    work.add_argument("--token", default="")
+
+    args = parser.parse_args(argv)
+
+    from datetime import datetime
+
+    from app.page_archive import configure_page_archive
+    from app.request_budget import configure_request_budget
+    from app.settings_store import ROOT_DIR, load_settings
+    from app.utils import configure_logging
+
+    settings = load_settings()
+    configure_logging(settings.program.log_level)
+    configure_request_budget(settings.rate_limit)
+    configure_page_archive(settings.program.archive_pages)
+
+    if args.command == "serve":
+        items = [
+            line.strip()
+            for line in Path(args.file).read_text(encoding="utf-8").splitlines()
+            if line.strip() and not line.strip().startswith("#")
+        ]
+        if args.kind == "maps" and args.tiles > 1:
+            from app.tiling import expand_tiled_queries
+
+            items = expand_tiled_queries(items, args.tiles)
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        output_path = (
+            Path(args.out) if args.out else ROOT_DIR / "results" / "cluster" / f"{args.kind}_{timestamp}.xlsx"
+        )
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        coordinator = Coordinator(
+            args.kind,
+            items,
+            output_path=output_path,
+            settings=settings,
+            lease_s=args.lease,
+            options={
+                "potential_filters": asdict(settings.potential_filters),
+                **({"limit": args.limit} if args.limit > 0 else {}),
+            },
+            token=args.token,
+        )
+        try:
+            count = coordinator.serve(args.host, args.port)
+        except KeyboardInterrupt:
+            return 130
+        print(f"Готово: {count} записей → {output_path}")
+        return 0
+
+    if args.headless is not None:
+        settings.program.headless = args.headless == "true"
+    stop_event = threading.Event()
+    try:
+        run_node(
+            args.url,
+            settings=settings,
+            concurrency=args.concurrency,
+            token=args.token,
+            worker=args.name,
+            stop_event=stop_event,
+        )
+    except KeyboardInterrupt:
+        stop_event.set()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""Excel writer micro-benchmark: `python -m app.excel_bench [--rows N]`.
+
+Appends the same synthetic organizations through the current writer and
+through the previous per-row path (``asdict`` + inline regexes + ``max_row``
+per row, saving on the scrape thread) and prints rows/sec for both. Both ask
+for a save every ``--save-every`` rows and are timed up to the end of
+``close()``, so every save, including the final one, is counted.
+
+The old path reads ``max_row`` on every row, which scans all cells, so on
+the default 50k rows it takes minutes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+from openpyxl import Workbook
+
+from app.excel_writer import ExcelWriter
+from app.pacser_maps import Organization
+
+
+class LegacyExcelWriter(ExcelWriter):
+    """The row path as it was before the fast path, kept for comparison only."""
+
+    def __init__(self, path: Path, flush_every: int = 10, flush_interval_s: float = 0.0) -> None:
+        self.path = path
+        self.flush_every = flush_every
+        self._counter = 0
+        self.workbook = Workbook()
+        self.full_sheet = self.workbook.active
+        self.full_sheet.title = "FULL"
+        self.full_sheet.append(self.headers)
+        self.potential_sheet = self.workbook.create_sheet("POTENTIAL")
+        self.potential_sheet.append(self.headers)
+
+    def _set_link_cell(self, sheet, row: int, column: int, text: str, url: str) -> None:
+        if not url:
+            sheet.cell(row=row, column=column, value="")
+            return
+        cell = sheet.cell(row=row, column=column, value=text or url)
+        cell.hyperlink = url
+        cell.style = "Hyperlink"
+
+    def _extract_links(self, raw: str) -> list[str]:
+        if not raw:
+            return []
+        matches = re.findall(r"(https?://[^\s,;|]+|www\.[^\s,;|]+)", raw, re.IGNORECASE)
+        if matches:
+            return [match.strip() for match in matches if match.strip()]
+        parts = re.split(r"[\s,;|]+", raw)
+        return [part.strip() for part in parts if part.strip() and "." in part]
+
+    def _append_to_sheet(self, sheet, organization: Organization) -> None:
+        data = asdict(organization)
+        card_url = data.get("card_url", "")
+        website, vk, telegram, whatsapp = self._redistribute_links(
+            website=data.get("website", ""),
+            vk=data.get("vk", ""),
+            telegram=data.get("telegram", ""),
+            whatsapp=data.get("whatsapp", ""),
+        )
+        row = sheet.max_row + 1
+        sheet.cell(row=row, column=1, value=data.get("name", ""))
+        if card_url:
+            name_cell = sheet.cell(row=row, column=1)
+            name_cell.hyperlink = card_url
+            name_cell.style = "Hyperlink"
+        sheet.cell(row=row, column=2, value=data.get("phone", ""))
+        sheet.cell(row=row, column=3, value=data.get("verified", ""))
+        sheet.cell(row=row, column=4, value=data.get("award", ""))
+        sheet.cell(row=row, column=5, value=data.get("rating", ""))
+        sheet.cell(row=row, column=6, value=data.get("rating_count", ""))
+        self._set_link_cell(sheet, row, 7, "вк", vk)
+        self._set_link_cell(sheet, row, 8, "тг", telegram)
+        self._set_link_cell(sheet, row, 9, "ватсап", whatsapp)
+        self._set_link_cell(sheet, row, 10, "сайт", website)
+        self._set_link_cell(sheet, row, 11, "карточка", card_url)
+
+    def append(self, organization: Organization, include_in_potential: bool = True) -> None:
+        self._append_to_sheet(self.full_sheet, organization)
+        if include_in_potential:
+            self._append_to_sheet(self.potential_sheet, organization)
+        self._counter += 1
+        if self._counter % self.flush_every == 0:
+            self.flush()
+
+    def flush(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.workbook.save(self.path)
+
+    def close(self) -> None:
+        self.flush()
+        self.workbook.close()
+
+
+def synthetic_organizations(count: int) -> list[Organization]:
+    organizations = []
+    for index in range(count):
+        organizations.append(
+            Organization(
+                name=f"Организация {index}",
+                phone=f"+7 900 {index % 1000:03d}-{index % 100:02d}-{index % 97:02d}",
+                verified="синяя" if index % 3 == 0 else "",
+                award="хорошее место" if index % 5 == 0 else "",
+                website=f"https://org{index}.ru, https://vk.com/org{index} t.me/org{index}",
+                card_url=f"https://yandex.ru/maps/org/{100000 + index}/",
+                rating=f"{4 + (index % 10) / 10:.1f}",
+                rating_count=str(index % 500),
+            )
+        )
+    return organizations
+
+
+def _rows_per_second(
+    writer_cls: type[ExcelWriter],
+    organizations: list[Organization],
+    path: Path,
+    save_every: int,
+) -> float:
+    writer = writer_cls(path, flush_every=save_every)
+    started = time.perf_counter()
+    for index, organization in enumerate(organizations):
+        writer.append(organization, include_in_potential=index % 2 == 0)
+    writer.close()
+    elapsed = time.perf_counter() - started
+    return len(organizations) / elapsed if elapsed > 0 else float("inf")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure Excel writer rows/sec")
+    parser.add_argument("--rows", type=int, default=50_000, help="Organizations to append")
+    parser.add_argument(
+        "--save-every",
+        type=int,
+        default=5_000,
+        help="Both writers ask for a save every N rows",
+    )
+    args = parser.parse_args(argv)
+
+    organizations = synthetic_organizations(max(1, args.rows))
+    save_every = max(1, args.save_every)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy = _rows_per_second(LegacyExcelWriter, organizations, Path(tmp_dir) / "legacy.xlsx", save_every)
+        fast = _rows_per_second(ExcelWriter, organizations, Path(tmp_dir) / "fast.xlsx", save_every)
+    print(f"Организаций {len(organizations)}, половина дублируется в POTENTIAL, сохранение каждые {save_every}")
+    print(f"    до:    {legacy:10.0f} строк/с")
+    print(f"    после: {fast:10.0f} строк/с  (×{fast / legacy:.2f})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
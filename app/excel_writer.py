@@ -2,15 +2,27 @@ from __future__ import annotations
 
 import logging
 import re
-from dataclasses import asdict
+import threading
 from pathlib import Path
 from typing import Iterable
 
 from openpyxl import Workbook
 
+from app.autosave import AutosavePolicy, BackgroundAutosave, save_workbook_atomic
+
 
 LOGGER = logging.getLogger(__name__)
 
+LINK_PATTERN = re.compile(r"(https?://[^\s,;|]+|www\.[^\s,;|]+)", re.IGNORECASE)
+LINK_SPLIT_PATTERN = re.compile(r"[\s,;|]+")
+LINK_COLUMNS = (
+    (7, "вк"),
+    (8, "тг"),
+    (9, "ватсап"),
+    (10, "сайт"),
+    (11, "карточка"),
+)
+
 
 class ExcelWriter:
     headers = [
@@ -27,34 +39,36 @@ class ExcelWriter:
         "ссылка на карточку",
     ]
 
-    def __init__(self, path: Path, flush_every: int = 10) -> None:
+    def __init__(self, path: Path, flush_every: int = 10, flush_interval_s: float = 0.0) -> None:
         self.path = path
         self.flush_every = flush_every
-        self.workbook = Workbook()
-        self.full_sheet = self.workbook.active
-        self.full_sheet.title = "FULL"
-        self.full_sheet.append(self.headers)
-        self.potential_sheet = self.workbook.create_sheet("POTENTIAL")
-        self.potential_sheet.append(self.headers)
-        self._counter = 0
-        self.flush()
-
-    def _set_link_cell(self, sheet, row: int, column: int, text: str, url: str) -> None:
-        if not url:
-            sheet.cell(row=row, column=column, value="")
-            return
-        display_text = text or url
-        cell = sheet.cell(row=row, column=column, value=display_text)
-        cell.hyperlink = url
-        cell.style = "Hyperlink"
+        self.flush_interval_s = flush_interval_s
+        # Rows built by append() that are not in the workbook yet. Only the autosave thread
+        # (and close(), once it has stopped) moves them into the workbook and saves it, so
+        # the scrape loop never touches openpyxl or disk.
+        self._pending: list[tuple[list, list[tuple[int, str]], bool]] = []
+        self._pending_lock = threading.Lock()
+        self._appended = 0
+        self._written = 0
+        self._workbook = Workbook()
+        self._full_sheet = self._workbook.active
+        self._full_sheet.title = "FULL"
+        self._full_sheet.append(self.headers)
+        self._potential_sheet = self._workbook.create_sheet("POTENTIAL")
+        self._potential_sheet.append(self.headers)
+        # Next free row per sheet, so appends never scan ``max_row``.
+        self._next_row = {self._full_sheet.title: 2, self._potential_sheet.title: 2}
+        self._policy = AutosavePolicy(flush_every, flush_interval_s)
+        self._autosave = BackgroundAutosave(self._save_snapshot, name="excel-autosave")
+        self._save_snapshot(0)
 
     def _extract_links(self, raw: str) -> list[str]:
         if not raw:
             return []
-        matches = re.findall(r"(https?://[^\s,;|]+|www\.[^\s,;|]+)", raw, re.IGNORECASE)
+        matches = LINK_PATTERN.findall(raw)
         if matches:
             return [match.strip() for match in matches if match.strip()]
-        parts = re.split(r"[\s,;|]+", raw)
+        parts = LINK_SPLIT_PATTERN.split(raw)
         return [part.strip() for part in parts if part.strip() and "." in part]
 
     def _redistribute_links(
@@ -87,39 +101,62 @@ class ExcelWriter:
             website = remaining_sites[0] if remaining_sites else ""
         return website, vk, telegram, whatsapp
 
-    def _append_to_sheet(self, sheet, organization: "Organization") -> None:
-        data = asdict(organization)
-        name = data.get("name", "")
-        card_url = data.get("card_url", "")
+    def _build_row(self, organization: "Organization") -> tuple[list, list[tuple[int, str]]]:
+        """Return cell values and ``(column, url)`` hyperlinks for one organization."""
+        card_url = organization.card_url or ""
         website, vk, telegram, whatsapp = self._redistribute_links(
-            website=data.get("website", ""),
-            vk=data.get("vk", ""),
-            telegram=data.get("telegram", ""),
-            whatsapp=data.get("whatsapp", ""),
+            website=organization.website or "",
+            vk=organization.vk or "",
+            telegram=organization.telegram or "",
+            whatsapp=organization.whatsapp or "",
         )
-        row = sheet.max_row + 1
-        sheet.cell(row=row, column=1, value=name)
+        values = [
+            organization.name,
+            organization.phone,
+            organization.verified,
+            organization.award,
+            organization.rating,
+            organization.rating_count,
+        ]
+        links: list[tuple[int, str]] = []
         if card_url:
-            name_cell = sheet.cell(row=row, column=1)
-            name_cell.hyperlink = card_url
-            name_cell.style = "Hyperlink"
-        sheet.cell(row=row, column=2, value=data.get("phone", ""))
-        sheet.cell(row=row, column=3, value=data.get("verified", ""))
-        sheet.cell(row=row, column=4, value=data.get("award", ""))
-        sheet.cell(row=row, column=5, value=data.get("rating", ""))
-        sheet.cell(row=row, column=6, value=data.get("rating_count", ""))
-        self._set_link_cell(sheet, row, 7, "вк", vk)
-        self._set_link_cell(sheet, row, 8, "тг", telegram)
-        self._set_link_cell(sheet, row, 9, "ватсап", whatsapp)
-        self._set_link_cell(sheet, row, 10, "сайт", website)
-        self._set_link_cell(sheet, row, 11, "карточка", card_url)
+            links.append((1, card_url))
+        for (column, text), url in zip(LINK_COLUMNS, (vk, telegram, whatsapp, website, card_url)):
+            if url:
+                values.append(text or url)
+                links.append((column, url))
+            else:
+                values.append("")
+        return values, links
+
+    def _emit_row(self, sheet, values: list, links: list[tuple[int, str]]) -> None:
+        row = self._next_row[sheet.title]
+        self._next_row[sheet.title] = row + 1
+        sheet.append(values)
+        for column, url in links:
+            cell = sheet.cell(row=row, column=column)
+            cell.hyperlink = url
+            cell.style = "Hyperlink"
+
+    def _save_snapshot(self, count: int) -> None:
+        """Move the rows appended before ``count`` into the workbook and save it."""
+        with self._pending_lock:
+            rows = self._pending[: count - self._written]
+            del self._pending[: len(rows)]
+        self._written += len(rows)
+        for values, links, include_in_potential in rows:
+            self._emit_row(self._full_sheet, values, links)
+            if include_in_potential:
+                self._emit_row(self._potential_sheet, values, links)
+        save_workbook_atomic(self._workbook, self.path)
+        LOGGER.info("Сохранил файл: %s", self.path)
 
     def append(self, organization: "Organization", include_in_potential: bool = True) -> None:
-        self._append_to_sheet(self.full_sheet, organization)
-        if include_in_potential:
-            self._append_to_sheet(self.potential_sheet, organization)
-        self._counter += 1
-        if self._counter % self.flush_every == 0:
+        values, links = self._build_row(organization)
+        with self._pending_lock:
+            self._pending.append((values, links, include_in_potential))
+            self._appended += 1
+        if self._policy.due():
             self.flush()
 
     def append_many(self, organizations: Iterable["Organization"]) -> None:
@@ -127,13 +164,16 @@ class ExcelWriter:
             self.append(organization)
 
     def flush(self) -> None:
-        self.path.parent.mkdir(parents=True, exist_ok=True)
-        self.workbook.save(self.path)
-        LOGGER.info("Сохранил файл: %s", self.path)
+        """Queue a snapshot of everything appended so far; returns without waiting."""
+        self._autosave.request(self._appended)
 
     def close(self) -> None:
-        self.flush()
-        self.workbook.close()
+        self._autosave.close()
+        try:
+            self._save_snapshot(self._appended)
+        finally:
+            self._workbook.close()
+        LOGGER.debug("Автосохранение Excel: %s", self._autosave.metrics())
 
 
 from app.pacser_maps import Organization  # noqa: E402
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import logging
 import queue
 import os
 import platform
@@ -16,14 +17,14 @@ from urllib.parse import quote
 from pathlib import Path
 
 import customtkinter as ctk
-import qrcode
-from PIL import Image
 
-from playwright.sync_api import sync_playwright
-
-from app.excel_writer import ExcelWriter
-from app.filters import passes_potential_filters
-from main import REQUIREMENTS_FILE, _missing_modules, _parse_required_modules, ensure_dependencies
+from main import (
+    REQUIREMENTS_FILE,
+    _missing_modules,
+    _parse_required_modules,
+    dependencies_cached,
+    ensure_dependencies,
+)
 from app.notifications import notify_sound
 from app.playwright_utils import (
     PLAYWRIGHT_LAUNCH_ARGS,
@@ -33,13 +34,16 @@ from app.playwright_utils import (
     is_chrome_missing_error,
     launch_chrome,
 )
+from app.page_archive import configure_page_archive
+from app.request_budget import configure_request_budget
 from app.settings_store import load_settings, save_settings
-from app.utils import build_result_paths, configure_logging, split_query
+from app.utils import build_rate_limiter, build_result_paths, configure_logging, split_query
 
 
 RESULTS_DIR = Path(__file__).resolve().parents[1] / "results"
 FAST_MODE_LABEL = "быстрый"
 SLOW_MODE_LABEL = "подробный"
+HYBRID_MODE_LABEL = "гибридный"
 DONATION_URL = "https://www.sberbank.ru/ru/choise_bank?requisiteNumber=+79633181841&bankCode=100000000004"
 DONATION_PHONE = "+7-963-318-18-41"
 THANKS_MESSAGE = (
@@ -60,12 +64,24 @@ LOG_LEVEL_LABELS = {
     "Только ошибки": "error",
 }
 LOG_LEVEL_LABELS_REVERSE = {value: key for key, value in LOG_LEVEL_LABELS.items()}
+EXCEL_SAVE_LABELS = {
+    "Каждые 10 строк": 0.0,
+    "Раз в 10 секунд": 10.0,
+    "Раз в 30 секунд": 30.0,
+    "Раз в минуту": 60.0,
+}
+EXCEL_SAVE_LABELS_REVERSE = {value: key for key, value in EXCEL_SAVE_LABELS.items()}
 LOG_LEVEL_ORDER = {
     "debug": 10,
     "info": 20,
     "warning": 30,
     "error": 40,
 }
+# The widget keeps only the tail of the log; the full history goes to log.txt.
+LOG_BUFFER_MAX_LINES = 2000
+DRAIN_INTERVAL_MS = 100
+DRAIN_MAX_EVENTS = 5000
+GUI_LOGGER = logging.getLogger("parser_serm.gui")
 
 CITIES = [
     "Москва Красносельский",
@@ -443,7 +459,7 @@ class ParserGUI:
         self._delay_max_s = 0.15
 
         self._build_ui()
-        self.root.after(100, self._drain_queue)
+        self.root.after(DRAIN_INTERVAL_MS, self._drain_queue)
         configure_logging(self._settings.program.log_level)
         self.root.protocol("WM_DELETE_WINDOW", self._on_close)
         self._start_dependency_check()
@@ -553,6 +569,9 @@ class ParserGUI:
         webbrowser.open(DONATION_URL)
 
     def _build_qr_image(self, size: int = 180) -> ctk.CTkImage:
+        import qrcode
+        from PIL import Image
+
         qr = qrcode.QRCode(border=1, box_size=6)
         qr.add_data(DONATION_URL)
         qr.make(fit=True)
@@ -618,7 +637,7 @@ class ParserGUI:
         )
         mode_switch = ctk.CTkSegmentedButton(
             mode_row,
-            values=[SLOW_MODE_LABEL, FAST_MODE_LABEL],
+            values=[SLOW_MODE_LABEL, FAST_MODE_LABEL, HYBRID_MODE_LABEL],
             variable=self.mode_var,
             command=self._on_mode_change,
         )
@@ -773,8 +792,21 @@ class ParserGUI:
         self.progress.set(1.0)
 
     def _append_log(self, text: str) -> None:
+        self._append_log_lines([text])
+
+    def _append_log_lines(self, lines: list[str]) -> None:
+        if not lines:
+            return
+        lines = lines[-LOG_BUFFER_MAX_LINES:]
         self.log_box.configure(state="normal")
-        self.log_box.insert("end", text + "\n")
+        self.log_box.insert("end", "\n".join(lines) + "\n")
+        try:
+            line_count = int(str(self.log_box.index("end-1c")).split(".")[0]) - 1
+            excess = line_count - LOG_BUFFER_MAX_LINES
+            if excess > 0:
+                self.log_box.delete("1.0", f"{excess + 1}.0")
+        except Exception:
+            pass
         self.log_box.see("end")
         self.log_box.configure(state="disabled")
 
@@ -784,6 +816,7 @@ class ParserGUI:
         return LOG_LEVEL_ORDER.get(level_name, 20) >= LOG_LEVEL_ORDER.get(current_level, 20)
 
     def _log(self, message: str, level: str = "info") -> None:
+        GUI_LOGGER.log(LOG_LEVEL_ORDER.get((level or "info").lower(), 20), message)
         if not self._should_show_log(level):
             return
         self._log_queue.put(("log", (level, message)))
@@ -795,42 +828,59 @@ class ParserGUI:
         self._log_queue.put(("captcha", payload))
 
     def _drain_queue(self) -> None:
+        # One textbox insert per tick; only the latest progress event is applied.
+        pending_lines: list[str] = []
+        pending_progress: object = None
         try:
-            while True:
+            for _ in range(DRAIN_MAX_EVENTS):
                 kind, payload = self._log_queue.get_nowait()
+                self._log_queue.task_done()
                 if kind == "log":
                     if isinstance(payload, tuple):
                         _, message = payload
-                        self._append_log(str(message))
+                        pending_lines.append(str(message))
                     else:
-                        self._append_log(str(payload))
-                elif kind == "status":
-                    text, color = payload
-                    self._set_status(str(text), str(color))
-                elif kind == "progress":
-                    data = payload
-                    if isinstance(data, dict):
-                        total = data.get("total")
-                        index = data.get("index")
-                        if isinstance(total, int) and total > 0 and isinstance(index, int):
-                            self._set_progress(index / total)
-                elif kind == "progress_done":
-                    self._finish_progress()
-                elif kind == "state":
-                    self._set_running(bool(payload))
-                elif kind == "deps_state":
-                    if isinstance(payload, dict):
-                        self._handle_dependencies_state(payload)
-                elif kind == "captcha":
-                    if isinstance(payload, dict):
-                        self._handle_captcha_event(payload)
-                elif kind == "thanks":
-                    if isinstance(payload, dict):
-                        self._open_thanks_popup(payload.get("message", THANKS_MESSAGE))
-                self._log_queue.task_done()
+                        pending_lines.append(str(payload))
+                    continue
+                if kind == "progress":
+                    pending_progress = payload
+                    continue
+                self._append_log_lines(pending_lines)
+                pending_lines = []
+                if kind == "progress_done":
+                    pending_progress = None
+                self._handle_queue_event(kind, payload)
         except queue.Empty:
             pass
-        self.root.after(100, self._drain_queue)
+        self._append_log_lines(pending_lines)
+        if pending_progress is not None:
+            self._handle_queue_event("progress", pending_progress)
+        self.root.after(DRAIN_INTERVAL_MS, self._drain_queue)
+
+    def _handle_queue_event(self, kind: str, payload: object) -> None:
+        if kind == "status":
+            text, color = payload
+            self._set_status(str(text), str(color))
+        elif kind == "progress":
+            data = payload
+            if isinstance(data, dict):
+                total = data.get("total")
+                index = data.get("index")
+                if isinstance(total, int) and total > 0 and isinstance(index, int):
+                    self._set_progress(index / total)
+        elif kind == "progress_done":
+            self._finish_progress()
+        elif kind == "state":
+            self._set_running(bool(payload))
+        elif kind == "deps_state":
+            if isinstance(payload, dict):
+                self._handle_dependencies_state(payload)
+        elif kind == "captcha":
+            if isinstance(payload, dict):
+                self._handle_captcha_event(payload)
+        elif kind == "thanks":
+            if isinstance(payload, dict):
+                self._open_thanks_popup(payload.get("message", THANKS_MESSAGE))
 
     def _build_query(self) -> str:
         niche = self.niche_entry.get().strip()
@@ -1026,6 +1076,10 @@ class ParserGUI:
 
     def _dependency_worker(self) -> None:
         try:
+            if dependencies_cached():
+                self._log_queue.put(("log", ("info", "✅ Зависимости уже установлены.")))
+                self._log_queue.put(("deps_state", {"ready": True}))
+                return
             modules = _parse_required_modules(REQUIREMENTS_FILE)
             missing = _missing_modules(modules)
             if missing:
@@ -1132,6 +1186,14 @@ class ParserGUI:
             value=LOG_LEVEL_LABELS_REVERSE.get(program.log_level, "Обычные (рекомендуется)")
         )
         autosave_var = ctk.BooleanVar(value=program.autosave_settings)
+        excel_save_var = ctk.StringVar(
+            value=EXCEL_SAVE_LABELS_REVERSE.get(program.excel_save_interval_s, "Каждые 10 строк")
+        )
+        adaptive_rate_var = ctk.BooleanVar(value=program.adaptive_rate)
+        warm_browser_var = ctk.BooleanVar(value=program.warm_browser)
+        reviews_incremental_var = ctk.BooleanVar(value=program.reviews_incremental)
+        serp_http_var = ctk.BooleanVar(value=program.serp_http)
+        archive_pages_var = ctk.BooleanVar(value=program.archive_pages)
 
         finish_sound_var = ctk.BooleanVar(value=notifications.on_finish)
         captcha_sound_var = ctk.BooleanVar(value=notifications.on_captcha)
@@ -1151,6 +1213,12 @@ class ParserGUI:
             "open_result": open_result_var,
             "log_level": log_level_var,
             "autosave_settings": autosave_var,
+            "excel_save_interval": excel_save_var,
+            "adaptive_rate": adaptive_rate_var,
+            "warm_browser": warm_browser_var,
+            "reviews_incremental": reviews_incremental_var,
+            "serp_http": serp_http_var,
+            "archive_pages": archive_pages_var,
             "sound_finish": finish_sound_var,
             "sound_captcha": captcha_sound_var,
             "sound_error": error_sound_var,
@@ -1235,16 +1303,39 @@ class ParserGUI:
         ctk.CTkCheckBox(body, text="Открывать результат после завершения", variable=open_result_var).grid(
             row=row, column=0, sticky="w", padx=10, pady=4
         )
+        row += 1
+        ctk.CTkCheckBox(
+            body, text="Адаптивные задержки (ускоряться без капчи)", variable=adaptive_rate_var
+        ).grid(row=row, column=0, sticky="w", padx=10, pady=4)
+        row += 1
+        ctk.CTkCheckBox(
+            body, text="Держать браузер запущенным между запусками", variable=warm_browser_var
+        ).grid(row=row, column=0, sticky="w", padx=10, pady=4)
+        row += 1
+        ctk.CTkCheckBox(
+            body, text="Отзывы: сохранять только новые", variable=reviews_incremental_var
+        ).grid(row=row, column=0, sticky="w", padx=10, pady=4)
+        row += 1
+        ctk.CTkCheckBox(
+            body, text="Быстрый режим: без браузера, где хватает HTML", variable=serp_http_var
+        ).grid(row=row, column=0, sticky="w", padx=10, pady=4)
+        row += 1
+        ctk.CTkCheckBox(
+            body, text="Сохранять страницы в архив (для повторного разбора)", variable=archive_pages_var
+        ).grid(row=row, column=0, sticky="w", padx=10, pady=4)
         row += 1
 
         def _open_browser() -> None:
             def _run() -> None:
                 try:
+                    from playwright.sync_api import sync_playwright
+
                     with sync_playwright() as p:
                         browser = launch_chrome(
                             p,
                             headless=False,
                             args=PLAYWRIGHT_LAUNCH_ARGS,
+                            use_daemon=self._settings.program.warm_browser,
                         )
                         context = browser.new_context(
                             user_agent=PLAYWRIGHT_USER_AGENT,
@@ -1282,6 +1373,17 @@ class ParserGUI:
         )
         row += 1
 
+        excel_save_row = ctk.CTkFrame(body, fg_color="transparent")
+        excel_save_row.grid(row=row, column=0, sticky="ew", padx=10, pady=(6, 4))
+        excel_save_row.grid_columnconfigure(1, weight=1)
+        ctk.CTkLabel(excel_save_row, text="Сохранять Excel во время работы").grid(
+            row=0, column=0, sticky="w"
+        )
+        ctk.CTkOptionMenu(
+            excel_save_row, variable=excel_save_var, values=list(EXCEL_SAVE_LABELS.keys())
+        ).grid(row=0, column=1, sticky="e")
+        row += 1
+
         ctk.CTkCheckBox(body, text="Автосохранение настроек", variable=autosave_var).grid(
             row=row, column=0, sticky="w", padx=10, pady=(6, 10)
         )
@@ -1362,6 +1464,13 @@ class ParserGUI:
         log_label = str(vars_map["log_level"].get() or "Обычные (рекомендуется)")
         program.log_level = LOG_LEVEL_LABELS.get(log_label, "info")
         program.autosave_settings = bool(vars_map["autosave_settings"].get())
+        excel_save_label = str(vars_map["excel_save_interval"].get() or "Каждые 10 строк")
+        program.excel_save_interval_s = EXCEL_SAVE_LABELS.get(excel_save_label, 0.0)
+        program.adaptive_rate = bool(vars_map["adaptive_rate"].get())
+        program.warm_browser = bool(vars_map["warm_browser"].get())
+        program.reviews_incremental = bool(vars_map["reviews_incremental"].get())
+        program.serp_http = bool(vars_map["serp_http"].get())
+        program.archive_pages = bool(vars_map["archive_pages"].get())
 
         notifications.on_finish = bool(vars_map["sound_finish"].get())
         notifications.on_captcha = bool(vars_map["sound_captcha"].get())
@@ -1430,12 +1539,14 @@ class ParserGUI:
         self._captcha_whitelist_event.clear()
         self._set_running(True)
         self._set_status("Запуск…", "#4CAF50")
-        if mode == FAST_MODE_LABEL:
+        if mode in (FAST_MODE_LABEL, HYBRID_MODE_LABEL):
             self._set_progress_mode("determinate")
             self._set_progress(0.0)
         else:
             self._set_progress_mode("indeterminate")
         configure_logging(self._settings.program.log_level, full_log_path=results_folder / "log.txt")
+        configure_request_budget(self._settings.rate_limit)
+        configure_page_archive(self._settings.program.archive_pages)
 
         worker = threading.Thread(
             target=self._run_worker,
@@ -1595,8 +1706,11 @@ class ParserGUI:
     ) -> None:
         self._log_queue.put(("status", ("Работаю", "#4CAF50")))
         try:
-            if mode == FAST_MODE_LABEL:
-                self._run_fast(query, output_path, results_folder)
+            self._ensure_warm_browser()
+            if mode in (FAST_MODE_LABEL, HYBRID_MODE_LABEL):
+                self._run_fast(
+                    query, output_path, results_folder, enrich_gaps=mode == HYBRID_MODE_LABEL
+                )
             else:
                 self._run_slow(query, output_path, results_folder)
         except Exception as exc:
@@ -1607,6 +1721,20 @@ class ParserGUI:
             self._log_queue.put(("progress_done", None))
             self._log_queue.put(("state", False))
 
+    def _ensure_warm_browser(self) -> None:
+        if not self._settings.program.warm_browser:
+            return
+        from app.browser_daemon import ensure_browser_daemon
+
+        try:
+            endpoint = ensure_browser_daemon(headless=self._settings.program.headless)
+        except Exception:
+            endpoint = None
+        if endpoint:
+            self._log("🔥 Использую прогретый браузер.", level="debug")
+        else:
+            self._log("⚠️ Прогретый браузер не запустился, запускаю обычный.", level="warning")
+
     def _reviews_output_path(self) -> Path:
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         folder = RESULTS_DIR / "reviews"
@@ -1634,6 +1762,8 @@ class ParserGUI:
         self._set_progress_mode("determinate")
         self._set_progress(0.0)
         configure_logging(self._settings.program.log_level, full_log_path=output_path.parent / "log_reviews.txt")
+        configure_request_budget(self._settings.rate_limit)
+        configure_page_archive(self._settings.program.archive_pages)
 
         worker = threading.Thread(
             target=self._run_reviews_worker,
@@ -1644,11 +1774,17 @@ class ParserGUI:
         worker.start()
 
     def _run_reviews_worker(self, url: str, output_path: Path) -> None:
+        from app.review_index import ReviewIndex
         from app.reviews_excel_writer import ReviewsExcelWriter
         from app.reviews_parser import YandexReviewsParser
 
         self._log_queue.put(("status", ("Отзывы: работаю", "#4CAF50")))
-        writer = ReviewsExcelWriter(output_path)
+        self._ensure_warm_browser()
+        writer = ReviewsExcelWriter(
+            output_path,
+            flush_interval_s=self._settings.program.excel_save_interval_s,
+            index=ReviewIndex() if self._settings.program.reviews_incremental else None,
+        )
         count = 0
         total = 0
         try:
@@ -1676,6 +1812,7 @@ class ParserGUI:
                 captcha_resume_event=self._captcha_event,
                 captcha_hook=captcha_hook,
                 log=self._log,
+                warm_browser=self._settings.program.warm_browser,
             )
             for review in parser.run():
                 if self._stop_event.is_set():
@@ -1708,6 +1845,8 @@ class ParserGUI:
         output_path: Path,
         results_folder: Path,
     ) -> None:
+        from app.excel_writer import ExcelWriter
+        from app.filters import passes_potential_filters
         from app.pacser_maps import YandexMapsScraper
 
         self._log("🐢 подробный: Яндекс Карты.")
@@ -1737,8 +1876,10 @@ class ParserGUI:
             captcha_whitelist_event=self._captcha_whitelist_event,
             captcha_hook=captcha_hook,
             log=self._log,
+            rate_limiter=build_rate_limiter(self._settings.program.adaptive_rate),
+            warm_browser=self._settings.program.warm_browser,
         )
-        writer = ExcelWriter(output_path)
+        writer = ExcelWriter(output_path, flush_interval_s=self._settings.program.excel_save_interval_s)
         count = 0
         try:
             for org in scraper.run():
@@ -1767,6 +1908,8 @@ class ParserGUI:
         query: str,
         output_path: Path,
         results_folder: Path,
+        *,
+        enrich_gaps: bool = False,
     ) -> None:
         from app.parser_search import run_fast_parser
 
@@ -1787,7 +1930,7 @@ class ParserGUI:
                 self._emit_captcha_prompt({"stage": stage, "message": captcha_message(stage)})
 
         def progress_cb(payload: dict) -> None:
-            if payload.get("phase") == "serp_parse":
+            if payload.get("phase") in {"serp_parse", "maps_enrich"}:
                 self._emit_progress(
                     {
                         "index": payload.get("index", 0),
@@ -1810,10 +1953,13 @@ class ParserGUI:
             progress=progress_cb,
             captcha_hook=captcha_hook,
             settings=self._settings,
+            limit=self._limit if self._limit > 0 else None,
+            enrich_gaps=enrich_gaps,
         )
 
         if not self._stop_event.is_set():
-            self._log(f"⚡ {FAST_MODE_LABEL} завершён. Записано: {count}")
+            label = HYBRID_MODE_LABEL if enrich_gaps else FAST_MODE_LABEL
+            self._log(f"⚡ {label} завершён. Записано: {count}")
             notify_sound("finish", self._settings)
             if self._settings.program.open_result:
                 _safe_open_path(results_folder)
@@ -0,0 +1,696 @@
+"""SQLite job queue and worker daemon for unattended runs.
+
+Jobs are Maps/SERP query lists or review syncs for org ids. The daemon claims
+them by priority, runs each through ``ShardedRunner`` (so every job gets its
+own browser processes and one deduped output) and retries failures with
+exponential backoff. Schedules re-enqueue a job daily at a fixed time or
+every N seconds.
+
+    python -m app.job_queue add maps "кафе в Москве" "бары в Москве" --priority 5
+    python -m app.job_queue add reviews --file org_ids.txt
+    python -m app.job_queue schedule reviews --file org_ids.txt --at 03:00 --name nightly-reviews
+    python -m app.job_queue worker --concurrency 2
+    python -m app.job_queue list --state failed
+    python -m app.job_queue stats
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import random
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from app.settings_store import CONFIG_DIR, ROOT_DIR
+
+
+LOGGER = logging.getLogger(__name__)
+
+JOBS_DB_PATH = CONFIG_DIR / "jobs.sqlite3"
+JOBS_RESULTS_DIR = ROOT_DIR / "results" / "jobs"
+JOB_KINDS = ("maps", "serp", "reviews")
+JOB_STATES = ("queued", "running", "done", "failed", "cancelled")
+BACKOFF_BASE_S = 60.0
+BACKOFF_MAX_S = 3600.0
+# A running job whose daemon has not touched it for this long is handed out again.
+STALE_AFTER_S = 120.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    items TEXT NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_after REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL,
+    duration_s REAL,
+    result_count INTEGER,
+    output TEXT,
+    error TEXT,
+    worker TEXT,
+    schedule_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS jobs_pick ON jobs (state, priority, run_after);
+CREATE TABLE IF NOT EXISTS schedules (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    items TEXT NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    priority INTEGER NOT NULL DEFAULT 0,
+    at_time TEXT,
+    every_s REAL,
+    next_run REAL NOT NULL,
+    enabled INTEGER NOT NULL DEFAULT 1
+);
+"""
+
+
+@dataclass
+class Job:
+    id: int
+    kind: str
+    items: list[str]
+    options: dict = field(default_factory=dict)
+    priority: int = 0
+    state: str = "queued"
+    attempts: int = 0
+    max_attempts: int = 3
+    run_after: float = 0.0
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    duration_s: Optional[float] = None
+    result_count: Optional[int] = None
+    output: Optional[str] = None
+    error: Optional[str] = None
+    worker: Optional[str] = None
+    schedule_id: Optional[int] = None
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Job":
+        data = dict(row)
+        data.pop("heartbeat_at", None)
+        data["items"] = json.loads(data["items"])
+        data["options"] = json.loads(data["options"] or "{}")
+        return cls(**data)
+
+
+def backoff_s(attempt: int) -> float:
+    """Delay before retry number ``attempt`` (1-based), with jitter so retries spread out."""
+    delay = min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** max(0, attempt - 1))
+    return delay * random.uniform(1.0, 1.25)
+
+
+def next_daily_run(at_time: str, now: float) -> float:
+    hour, minute = (int(part) for part in at_time.split(":", 1))
+    current = datetime.fromtimestamp(now)
+    candidate = current.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if candidate.timestamp() <= now:
+        candidate += timedelta(days=1)
+    return candidate.timestamp()
+
+
+class JobQueue:
+    """Persistent job table; every method opens a short transaction so several processes can share it."""
+
+    def __init__(self, path: Path = JOBS_DB_PATH) -> None:
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connect() as conn:
+            # IMMEDIATE takes the write lock up front, so two daemons never claim the same job.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def enqueue(
+        self,
+        kind: str,
+        items: list[str],
+        *,
+        priority: int = 0,
+        max_attempts: int = 3,
+        run_after: float = 0.0,
+        options: Optional[dict] = None,
+        schedule_id: Optional[int] = None,
+    ) -> int:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if not items:
+            raise ValueError("Job has no items")
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (kind, items, options, priority, max_attempts, run_after, created_at, schedule_id)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    kind,
+                    json.dumps(list(items), ensure_ascii=False),
+                    json.dumps(options or {}, ensure_ascii=False),
+                    int(priority),
+                    max(1, int(max_attempts)),
+                    float(run_after),
+                    time.time(),
+                    schedule_id,
+                ),
+            )
+            return int(cursor.lastrowid)
+
+    def claim(self, worker: str) -> Optional[Job]:
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE state = 'queued' AND run_after <= ?"
+                " ORDER BY priority DESC, id LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = 'running', attempts = attempts + 1, started_at = ?,"
+                " heartbeat_at = ?, finished_at = NULL, worker = ? WHERE id = ?",
+                (now, now, worker, row["id"]),
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+        return Job.from_row(row)
+
+    def heartbeat(self, job_ids: list[int]) -> None:
+        if not job_ids:
+            return
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND state = 'running'",
+                [(time.time(), job_id) for job_id in job_ids],
+            )
+
+    def complete(self, job_id: int, result_count: int, output: str, error: Optional[str] = None) -> None:
+        """Mark a job done; ``error`` records items that failed while the rest completed."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = 'done', finished_at = ?, duration_s = ? - started_at,"
+                " result_count = ?, output = ?, error = ? WHERE id = ?",
+                (now, now, int(result_count), output, error[:2000] if error else None, job_id),
+            )
+
+    def fail(self, job_id: int, error: str) -> Optional[float]:
+        """Record a failed attempt; returns the retry delay, or None when attempts are used up."""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            retry = row["attempts"] < row["max_attempts"]
+            delay = backoff_s(row["attempts"]) if retry else None
+            conn.execute(
+                "UPDATE jobs SET state = ?, run_after = ?, finished_at = ?, duration_s = ? - started_at,"
+                " error = ? WHERE id = ?",
+                (
+                    "queued" if retry else "failed",
+                    now + delay if delay is not None else 0.0,
+                    now,
+                    now,
+                    error[:2000],
+                    job_id,
+                ),
+            )
+        return delay
+
+    def release(self, job_id: int) -> None:
+        """Put an interrupted job back without charging it an attempt."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = 'queued', attempts = MAX(0, attempts - 1), worker = NULL"
+                " WHERE id = ? AND state = 'running'",
+                (job_id,),
+            )
+
+    def cancel(self, job_id: int) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = 'cancelled', finished_at = ? WHERE id = ? AND state = 'queued'",
+                (time.time(), job_id),
+            )
+            return cursor.rowcount > 0
+
+    def requeue_stale(self) -> int:
+        """Hand out again the jobs of daemons that stopped heartbeating.
+
+        The lost run keeps its attempt, so a job that keeps killing its daemon
+        ends up ``failed`` instead of being requeued forever.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT id, attempts, max_attempts FROM jobs"
+                " WHERE state = 'running' AND COALESCE(heartbeat_at, started_at, 0) < ?",
+                (now - STALE_AFTER_S,),
+            ).fetchall()
+            for row in rows:
+                retry = row["attempts"] < row["max_attempts"]
+                conn.execute(
+                    "UPDATE jobs SET state = ?, run_after = ?, finished_at = ?, worker = NULL, error = ?"
+                    " WHERE id = ?",
+                    (
+                        "queued" if retry else "failed",
+                        now + backoff_s(row["attempts"]) if retry else 0.0,
+                        None if retry else now,
+                        "демон перестал отвечать",
+                        row["id"],
+                    ),
+                )
+        return len(rows)
+
+    def list_jobs(self, state: Optional[str] = None, limit: int = 50) -> list[Job]:
+        with self._connect() as conn:
+            if state:
+                rows = conn.execute(
+                    "SELECT * FROM jobs WHERE state = ? ORDER BY id DESC LIMIT ?", (state, limit)
+                ).fetchall()
+            else:
+                rows = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [Job.from_row(row) for row in rows]
+
+    def stats(self) -> list[dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT kind, state, COUNT(*) AS jobs, SUM(COALESCE(result_count, 0)) AS results,"
+                " AVG(duration_s) AS avg_s, MAX(duration_s) AS max_s, SUM(attempts) AS attempts"
+                " FROM jobs GROUP BY kind, state ORDER BY kind, state"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def add_schedule(
+        self,
+        name: str,
+        kind: str,
+        items: list[str],
+        *,
+        at_time: Optional[str] = None,
+        every_s: Optional[float] = None,
+        priority: int = 0,
+        options: Optional[dict] = None,
+    ) -> int:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        if bool(at_time) == bool(every_s):
+            raise ValueError("Schedule needs exactly one of at_time or every_s")
+        now = time.time()
+        next_run = next_daily_run(at_time, now) if at_time else now + float(every_s)
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT INTO schedules (name, kind, items, options, priority, at_time, every_s, next_run)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    name,
+                    kind,
+                    json.dumps(list(items), ensure_ascii=False),
+                    json.dumps(options or {}, ensure_ascii=False),
+                    int(priority),
+                    at_time,
+                    every_s,
+                    next_run,
+                ),
+            )
+            return int(cursor.lastrowid)
+
+    def remove_schedule(self, schedule_id: int) -> bool:
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM schedules WHERE id = ?", (schedule_id,)).rowcount > 0
+
+    def list_schedules(self) -> list[dict]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM schedules ORDER BY next_run").fetchall()
+        return [dict(row) for row in rows]
+
+    def enqueue_due(self) -> list[int]:
+        """Turn due schedules into jobs; a schedule whose previous job is still pending is skipped."""
+        now = time.time()
+        created: list[int] = []
+        with self._transaction() as conn:
+            due = conn.execute(
+                "SELECT * FROM schedules WHERE enabled = 1 AND next_run <= ?", (now,)
+            ).fetchall()
+            for schedule in due:
+                next_run = (
+                    next_daily_run(schedule["at_time"], now)
+                    if schedule["at_time"]
+                    else now + float(schedule["every_s"])
+                )
+                conn.execute("UPDATE schedules SET next_run = ? WHERE id = ?", (next_run, schedule["id"]))
+                pending = conn.execute(
+                    "SELECT 1 FROM jobs WHERE schedule_id = ? AND state IN ('queued', 'running') LIMIT 1",
+                    (schedule["id"],),
+                ).fetchone()
+                if pending:
+                    LOGGER.info("Расписание «%s»: предыдущее задание ещё не выполнено", schedule["name"])
+                    continue
+                cursor = conn.execute(
+                    "INSERT INTO jobs (kind, items, options, priority, created_at, schedule_id)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        schedule["kind"],
+                        schedule["items"],
+                        schedule["options"],
+                        schedule["priority"],
+                        now,
+                        schedule["id"],
+                    ),
+                )
+                created.append(int(cursor.lastrowid))
+        return created
+
+
+class JobDaemon:
+    """Claims queued jobs and runs up to ``concurrency`` of them at once."""
+
+    def __init__(
+        self,
+        job_queue: JobQueue,
+        *,
+        concurrency: int = 1,
+        settings=None,
+        poll_s: float = 2.0,
+        stop_event: Optional[threading.Event] = None,
+        log: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        from app.settings_store import load_settings
+
+        self.queue = job_queue
+        self.concurrency = max(1, int(concurrency))
+        self.settings = settings or load_settings()
+        self.poll_s = poll_s
+        self.stop_event = stop_event or threading.Event()
+        self.worker_name = f"{socket.gethostname()}:{os.getpid()}"
+        self._log_cb = log
+        self._running: dict[int, Future] = {}
+
+    def _log(self, message: str) -> None:
+        if self._log_cb:
+            try:
+                self._log_cb(message)
+                return
+            except Exception:
+                pass
+        LOGGER.info(message)
+
+    def run_job(self, job: Job) -> None:
+        from app.sharding import ShardedRunner
+        from app.tiling import expand_tiled_queries
+
+        options = job.options
+        items = job.items
+        if job.kind == "maps" and int(options.get("tiles") or 1) > 1:
+            items = expand_tiled_queries(items, int(options["tiles"]))
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        output_path = JOBS_RESULTS_DIR / f"job_{job.id}_{job.kind}_{timestamp}.xlsx"
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        self._log(f"▶️ Задание {job.id} ({job.kind}, попытка {job.attempts}): {len(items)} элементов")
+        runner = ShardedRunner(
+            job.kind,
+            items,
+            output_path=output_path,
+            workers=max(1, int(options.get("workers") or 1)),
+            settings=self.settings,
+            concurrency=max(1, int(options.get("concurrency") or 1)),
+            limit=int(options["limit"]) if options.get("limit") else None,
+            stop_event=self.stop_event,
+            log=lambda message: self._log(f"[задание {job.id}] {message}"),
+        )
+        try:
+            count = runner.run()
+            if not count and (runner.errors or runner.failed_items):
+                raise RuntimeError((runner.errors or list(runner.failed_items.values()))[-1])
+        except Exception as exc:
+            if self.stop_event.is_set():
+                self.queue.release(job.id)
+                return
+            delay = self.queue.fail(job.id, str(exc))
+            if delay is None:
+                self._log(f"❌ Задание {job.id} провалено: {exc}")
+            else:
+                self._log(f"⚠️ Задание {job.id} упало ({exc}), повтор через {delay:.0f} с")
+            return
+        if self.stop_event.is_set():
+            self.queue.release(job.id)
+            self._log(f"⏹ Задание {job.id} прервано и вернётся в очередь")
+            return
+        failed = runner.failed_items
+        error = None
+        if failed:
+            error = f"не выполнено {len(failed)} из {len(items)}: " + "; ".join(
+                f"{item} ({message})" for item, message in failed.items()
+            )
+        self.queue.complete(job.id, count, str(output_path), error)
+        self._log(f"✅ Задание {job.id} готово: {count} записей → {output_path}")
+        if failed:
+            self._retry_failed_items(job, list(failed))
+
+    def _retry_failed_items(self, job: Job, items: list[str]) -> None:
+        """Enqueue the items that failed as a new job with the attempts the original has left."""
+        attempts_left = job.max_attempts - job.attempts
+        if attempts_left <= 0:
+            self._log(f"❌ Задание {job.id}: не выполнено {len(items)} элементов, попытки исчерпаны")
+            return
+        # Tiles are already expanded in the failed items.
+        options = {key: value for key, value in job.options.items() if key != "tiles"}
+        retry_id = self.queue.enqueue(
+            job.kind,
+            items,
+            priority=job.priority,
+            max_attempts=attempts_left,
+            run_after=time.time() + backoff_s(job.attempts),
+            options=options,
+        )
+        self._log(f"⚠️ Задание {job.id}: не выполнено {len(items)} элементов, повтор заданием {retry_id}")
+
+    def run(self) -> None:
+        self._log(f"Демон заданий запущен ({self.worker_name}), параллельно до {self.concurrency}")
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job") as pool:
+            try:
+                while not self.stop_event.is_set():
+                    self._tick(pool)
+                    self.stop_event.wait(self.poll_s)
+            except KeyboardInterrupt:
+                self.stop_event.set()
+            self._log("Останавливаю демон: жду завершения текущих заданий")
+
+    def _tick(self, pool: ThreadPoolExecutor) -> None:
+        try:
+            for job_id in self.queue.enqueue_due():
+                self._log(f"🕑 По расписанию поставлено задание {job_id}")
+            self._running = {
+                job_id: future for job_id, future in self._running.items() if not future.done()
+            }
+            self.queue.heartbeat(list(self._running))
+            # Checked on every tick, so jobs of a daemon that died are picked up by the ones still alive.
+            stale = self.queue.requeue_stale()
+            if stale:
+                self._log(f"Вернул в очередь зависших заданий: {stale}")
+            while len(self._running) < self.concurrency:
+                job = self.queue.claim(self.worker_name)
+                if job is None:
+                    break
+                self._running[job.id] = pool.submit(self.run_job, job)
+        except Exception:
+            LOGGER.warning("Ошибка очереди заданий", exc_info=True)
+
+
+def _format_ts(value: Optional[float]) -> str:
+    return datetime.fromtimestamp(value).strftime("%Y-%m-%d %H:%M") if value else "-"
+
+
+def _read_items(args: argparse.Namespace) -> list[str]:
+    items = list(args.items or [])
+    if args.file:
+        for line in Path(args.file).read_text(encoding="utf-8").splitlines():
+            item = line.strip()
+            if item and not item.startswith("#"):
+                items.append(item)
+    return list(dict.fromkeys(items))
+
+
+def _job_options(args: argparse.Namespace) -> dict:
+    options = {
+        "limit": args.limit,
+        "concurrency": args.concurrency,
+        "workers": args.workers,
+        "tiles": args.tiles,
+    }
+    return {key: value for key, value in options.items() if value}
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Persistent job queue for unattended runs")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def _job_args(command: argparse.ArgumentParser) -> None:
+        command.add_argument("kind", choices=JOB_KINDS)
+        command.add_argument("items", nargs="*", help="Queries (maps/serp) or org ids / Maps URLs (reviews)")
+        command.add_argument("--file", default="", help="File with one item per line")
+        command.add_argument("--priority", type=int, default=0, help="Higher runs first")
+        command.add_argument("--limit", type=int, default=0)
+        command.add_argument("--concurrency", type=int, default=2, help="Pages per browser")
+        command.add_argument("--workers", type=int, default=1, help="Browser processes per job")
+        command.add_argument("--tiles", type=int, default=0, help="Maps: split queries into N x N viewports")
+
+    add = sub.add_parser("add", help="Enqueue a job")
+    _job_args(add)
+    add.add_argument("--max-attempts", type=int, default=3)
+    add.add_argument("--delay", type=float, default=0.0, help="Seconds before the job may start")
+
+    schedule = sub.add_parser("schedule", help="Enqueue a job on a schedule")
+    _job_args(schedule)
+    schedule.add_argument("--name", default="")
+    when = schedule.add_mutually_exclusive_group(required=True)
+    when.add_argument("--at", default="", help="Daily at HH:MM local time")
+    when.add_argument("--every", type=float, default=0.0, help="Every N seconds")
+
+    worker = sub.add_parser("worker", help="Run the daemon in the foreground")
+    worker.add_argument("--concurrency", type=int, default=1, help="Jobs run at the same time")
+    worker.add_argument("--headless", choices=["true", "false"], help="Override the headless setting")
+    worker.add_argument("--poll", type=float, default=2.0)
+
+    listing = sub.add_parser("list", help="Show recent jobs")
+    listing.add_argument("--state", choices=JOB_STATES)
+    listing.add_argument("--limit", type=int, default=30)
+
+    sub.add_parser("stats", help="Counts and durations by kind and state")
+    sub.add_parser("schedules", help="Show schedules")
+    cancel = sub.add_parser("cancel", help="Cancel a queued job")
+    cancel.add_argument("job_id", type=int)
+    unschedule = sub.add_parser("unschedule", help="Remove a schedule")
+    unschedule.add_argument("schedule_id", type=int)
+
+    args = parser.parse_args(argv)
+    job_queue = JobQueue()
+
+    if args.command in ("add", "schedule"):
+        items = _read_items(args)
+        if not items:
+            print("❌ Нет элементов для задания")
+            return 2
+        if args.command == "add":
+            job_id = job_queue.enqueue(
+                args.kind,
+                items,
+                priority=args.priority,
+                max_attempts=args.max_attempts,
+                run_after=time.time() + args.delay if args.delay > 0 else 0.0,
+                options=_job_options(args),
+            )
+            print(f"Задание {job_id} поставлено в очередь ({len(items)} элементов)")
+            return 0
+        try:
+            schedule_id = job_queue.add_schedule(
+                args.name or f"{args.kind} x{len(items)}",
+                args.kind,
+                items,
+                at_time=args.at or None,
+                every_s=args.every or None,
+                priority=args.priority,
+                options=_job_options(args),
+            )
+        except ValueError as exc:
+            print(f"❌ {exc}")
+            return 2
+        print(f"Расписание {schedule_id} добавлено")
+        return 0
+
+    if args.command == "worker":
+        from app.page_archive import configure_page_archive
+        from app.request_budget import configure_request_budget
+        from app.settings_store import load_settings
+        from app.utils import configure_logging
+
+        settings = load_settings()
+        if args.headless is not None:
+            settings.program.headless = args.headless == "true"
+        configure_logging(settings.program.log_level, None, JOBS_RESULTS_DIR / "log_jobs.txt")
+        configure_request_budget(settings.rate_limit)
+        configure_page_archive(settings.program.archive_pages)
+        JobDaemon(job_queue, concurrency=args.concurrency, settings=settings, poll_s=args.poll).run()
+        return 0
+
+    if args.command == "list":
+        for job in job_queue.list_jobs(args.state, args.limit):
+            duration = f"{job.duration_s:.0f} с" if job.duration_s is not None else "-"
+            print(
+                f"{job.id:>5}  {job.kind:<7} {job.state:<9} p={job.priority:<3} "
+                f"попыток {job.attempts}/{job.max_attempts}  элементов {len(job.items):<4} "
+                f"записей {job.result_count if job.result_count is not None else '-':<6} "
+                f"{duration:<8} создано {_format_ts(job.created_at)}"
+            )
+            if job.error:
+                print(f"       ошибка: {job.error.splitlines()[0][:120]}")
+        return 0
+
+    if args.command == "stats":
+        for row in job_queue.stats():
+            avg_s = f"{row['avg_s']:.0f}" if row["avg_s"] is not None else "-"
+            max_s = f"{row['max_s']:.0f}" if row["max_s"] is not None else "-"
+            print(
+                f"{row['kind']:<7} {row['state']:<9} заданий {row['jobs']:<5} записей {row['results']:<7} "
+                f"попыток {row['attempts']:<5} среднее {avg_s} с, максимум {max_s} с"
+            )
+        return 0
+
+    if args.command == "schedules":
+        for row in job_queue.list_schedules():
+            when_text = f"ежедневно в {row['at_time']}" if row["at_time"] else f"каждые {row['every_s']:.0f} с"
+            items = json.loads(row["items"])
+            print(
+                f"{row['id']:>4}  {row['name']:<24} {row['kind']:<7} {when_text:<22} "
+                f"элементов {len(items):<4} следующий запуск {_format_ts(row['next_run'])}"
+            )
+        return 0
+
+    if args.command == "cancel":
+        print("Отменено" if job_queue.cancel(args.job_id) else "Задание не в очереди")
+        return 0
+
+    if args.command == "unschedule":
+        print("Удалено" if job_queue.remove_schedule(args.schedule_id) else "Расписание не найдено")
+        return 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,25 +5,104 @@ import re
 import random
 import threading
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, fields, replace
 from typing import Callable, Generator, Optional
 from urllib.parse import quote
 
 from playwright.sync_api import Page, TimeoutError as PlaywrightTimeoutError
 from playwright.sync_api import sync_playwright
 
-from app.captcha_utils import CaptchaFlowHelper, is_captcha, wait_captcha_resolved, CaptchaHook
+from app.captcha_utils import CaptchaFlowHelper, CaptchaProbe, wait_captcha_resolved, CaptchaHook
+from app.page_archive import archive_page
+from app.request_budget import acquire_request
+from app.selector_registry import get_selector_registry
+from app.tiling import parse_tile_item, search_text
 from app.playwright_utils import (
     PLAYWRIGHT_LAUNCH_ARGS,
     PLAYWRIGHT_USER_AGENT,
     PLAYWRIGHT_VIEWPORT,
     launch_chrome,
+    new_isolated_context,
 )
-from app.utils import extract_count, human_delay, normalize_rating, sanitize_text
+from app.utils import (
+    RateLimiter,
+    extract_count,
+    human_delay,
+    normalize_rating,
+    sanitize_text,
+)
 
 
 LOGGER = logging.getLogger(__name__)
 
+VISIBLE_IDS_JS = """
+(selector) => {
+  return Array.from(document.querySelectorAll(selector))
+    .map(node => node.dataset.id)
+    .filter(Boolean);
+}
+"""
+SCROLL_LIST_JS = """
+({selector, scrollStep}) => {
+  const container = document.querySelector(selector);
+  if (!container) {
+    return { moved: false, scrollTop: 0 };
+  }
+  const prevTop = container.scrollTop;
+  const maxTop = container.scrollHeight - container.clientHeight;
+  const nextTop = Math.min(prevTop + scrollStep, maxTop);
+  container.scrollTop = nextTop;
+  container.dispatchEvent(new Event("scroll", { bubbles: true }));
+  return { moved: nextTop > prevTop, scrollTop: nextTop, maxTop };
+}
+"""
+CLICK_LIST_ITEM_JS = """
+({itemSelector, wrapperSelectors, orgId}) => {
+  const item = Array.from(document.querySelectorAll(itemSelector))
+    .find(node => node.dataset.id === orgId);
+  if (!item) {
+    return null;
+  }
+  for (const selector of wrapperSelectors) {
+    const wrapper = item.querySelector(selector);
+    if (wrapper) {
+      wrapper.scrollIntoView({ block: "center" });
+      wrapper.click();
+      return selector;
+    }
+  }
+  return null;
+}
+"""
+CARD_SNAPSHOT_JS = """
+(root) => {
+  const text = (sel) => {
+    const el = root.querySelector(sel);
+    return el ? (el.textContent || "").trim() : "";
+  };
+  const titleLink = root.querySelector("h1.card-title-view__title a.card-title-view__title-link");
+  let verified = "";
+  if (root.querySelector("span.business-verified-badge._prioritized")) {
+    verified = "зелёная";
+  } else if (root.querySelector("span.business-verified-badge")) {
+    verified = "синяя";
+  }
+  const siteLink = root.querySelector("a.business-urls-view__link[href]");
+  return {
+    name: titleLink ? (titleLink.textContent || "").trim() : "",
+    href: titleLink ? (titleLink.getAttribute("href") || "") : "",
+    ratingText: text(".business-rating-badge-view__rating-text"),
+    countText: text(".business-header-rating-view__text"),
+    phoneText: text("span[itemprop='telephone']"),
+    verified,
+    award: text(".business-header-awards-view__award-text"),
+    links: Array.from(root.querySelectorAll("a[href]")).map(a => a.getAttribute("href") || ""),
+    siteHref: siteLink ? (siteLink.getAttribute("href") || "") : "",
+    siteText: text(".business-urls-view__text"),
+  };
+}
+"""
+
 
 @dataclass
 class Organization:
@@ -40,6 +119,75 @@ class Organization:
     rating_count: str = ""
 
 
+# Fields the SERP snippet cannot fill reliably: the card has the award, the social
+# links and the checkmark colour. Hybrid mode opens the card when any is empty.
+ENRICHABLE_FIELDS = ("verified", "award", "vk", "telegram", "whatsapp")
+
+
+def missing_fields(org: Organization) -> list[str]:
+    return [name for name in ENRICHABLE_FIELDS if not getattr(org, name)]
+
+
+def merge_organizations(base: Organization, detail: Organization) -> Organization:
+    """Fill empty fields of ``base`` from ``detail``; the Maps checkmark wins as it knows green."""
+    updates = {
+        field.name: getattr(detail, field.name)
+        for field in fields(Organization)
+        if not getattr(base, field.name) and getattr(detail, field.name)
+    }
+    if detail.verified:
+        updates["verified"] = detail.verified
+    return replace(base, **updates)
+
+
+class ListEndTracker:
+    """End-of-list rule shared by the sync scraper and the async engine.
+
+    After every scroll round ``step`` says whether to keep walking ("more"),
+    stop ("end") or wait for lazy loading first ("wait"; report the outcome
+    with ``waited``). The list ends when the scroll position stays put for
+    three rounds, nothing moved for ``max_idle_s`` or lazy loading brought
+    nothing within ``LAZY_LOAD_WAIT_S``.
+    """
+
+    LAZY_LOAD_WAIT_S = 10.0
+
+    def __init__(self, max_idle_s: float) -> None:
+        self.max_idle_s = max_idle_s
+        self.last_progress = time.monotonic()
+        self.last_scroll_top: Optional[int] = None
+        self.same_scroll_top_rounds = 0
+
+    def step(self, *, moved: bool, added: int, parsed: int, scroll_top: Optional[int]) -> str:
+        if scroll_top is not None:
+            if self.last_scroll_top == scroll_top:
+                self.same_scroll_top_rounds += 1
+            else:
+                self.same_scroll_top_rounds = 0
+            self.last_scroll_top = scroll_top
+        if moved or added or parsed:
+            self.last_progress = time.monotonic()
+            return "more"
+        if self.same_scroll_top_rounds >= 3:
+            LOGGER.info("Прокрутка уперлась в конец списка — завершаю")
+            return "end"
+        idle_s = time.monotonic() - self.last_progress
+        if idle_s >= self.max_idle_s:
+            LOGGER.info("Список не листается %.2fs — завершаю", idle_s)
+            return "end"
+        LOGGER.info("Дошёл до конца списка, жду новые карточки")
+        return "wait"
+
+    def waited(self, added: int) -> bool:
+        """Outcome of the lazy-loading wait; False means the list has ended."""
+        if not added:
+            LOGGER.info("Новых карточек нет — завершаю")
+            return False
+        LOGGER.info("После ожидания загружено новых карточек: %s", added)
+        self.last_progress = time.monotonic()
+        return True
+
+
 class YandexMapsScraper:
     base_url = "https://yandex.ru/web-maps/"
     scroll_container_selector = "div.scroll__container"
@@ -49,6 +197,11 @@ class YandexMapsScraper:
     list_item_wrapper_selector = (
         "div.search-snippet-view__body-button-wrapper[role='button'][tabindex='0']"
     )
+    # Fallbacks for the click target; the primary is always tried first (see SelectorRegistry.ordered).
+    list_item_wrapper_selectors = (
+        list_item_wrapper_selector,
+        "div.search-snippet-view__body-button-wrapper",
+    )
     max_scroll_idle_time = 10
 
     def __init__(
@@ -62,16 +215,35 @@ class YandexMapsScraper:
         captcha_whitelist_event=None,
         captcha_hook: Optional[CaptchaHook] = None,
         log: Optional[Callable[[str], None]] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        captcha_check_interval_s: float = 2.0,
+        warm_browser: bool = False,
     ) -> None:
         self.query = query
         self.limit = limit
         self.headless = headless
+        self.warm_browser = warm_browser
         self.stop_event = stop_event or threading.Event()
         self.pause_event = pause_event or threading.Event()
         self.captcha_resume_event = captcha_resume_event or threading.Event()
         self.captcha_whitelist_event = captcha_whitelist_event
         self.captcha_hook = captcha_hook
         self._log_cb = log
+        # Callers pass build_rate_limiter(program.adaptive_rate); without one the delays stay fixed.
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.captcha_probe = CaptchaProbe(captcha_check_interval_s)
+
+    @classmethod
+    def search_url(cls, query: str) -> str:
+        """Maps search URL; tile items from ``app.tiling`` also pin the viewport."""
+        text, viewport = parse_tile_item(query)
+        if viewport:
+            # The viewport already pins the area; a city in the text would recenter the map.
+            text = search_text(text)
+        url = f"{cls.base_url}?text={quote(text)}"
+        if viewport:
+            url += f"&ll={viewport['ll']}&z={viewport['z']}"
+        return url
 
     def run(self) -> Generator[Organization, None, None]:
         self._log(
@@ -86,21 +258,16 @@ class YandexMapsScraper:
                 p,
                 headless=self.headless,
                 args=PLAYWRIGHT_LAUNCH_ARGS,
+                use_daemon=self.warm_browser,
             )
             LOGGER.info("Создаю контекст браузера")
-            context = browser.new_context(
-                user_agent=PLAYWRIGHT_USER_AGENT,
-                viewport=PLAYWRIGHT_VIEWPORT,
-                is_mobile=False,
-                has_touch=False,
-                device_scale_factor=1,
-            )
-            self._reset_browser_data(context)
+            context = new_isolated_context(browser)
             page = context.new_page()
             page.set_default_timeout(20000)
 
-            url = f"{self.base_url}?text={quote(self.query)}"
+            url = self.search_url(self.query)
             LOGGER.info("Открываю страницу: %s", url)
+            acquire_request(url, self.stop_event, self.pause_event)
             nav_start = time.monotonic()
             page.goto(url, wait_until="domcontentloaded")
             captcha_helper = CaptchaFlowHelper(
@@ -133,6 +300,8 @@ class YandexMapsScraper:
 
                 yield from self._collect_organizations(page)
             finally:
+                LOGGER.info("Селекторы: %s", get_selector_registry().metrics())
+                LOGGER.info("Проверки капчи: %s", self.captcha_probe.metrics())
                 try:
                     captcha_helper.close()
                 except Exception:
@@ -159,7 +328,7 @@ class YandexMapsScraper:
     def _ensure_no_captcha(self, page: Page) -> Optional[Page]:
         if self.stop_event.is_set():
             return None
-        if is_captcha(page):
+        if self.captcha_probe.check(page):
             return wait_captcha_resolved(
                 page,
                 self._log,
@@ -167,44 +336,10 @@ class YandexMapsScraper:
                 self.captcha_resume_event,
                 hook=self.captcha_hook,
                 action_poll=getattr(self, "_captcha_action_poll", None),
+                rate_limiter=self.rate_limiter,
             )
         return page
 
-    def _reset_browser_data(self, context) -> None:
-        LOGGER.info("Очищаю cookies, разрешения и хранилище для новой сессии")
-        try:
-            context.clear_cookies()
-        except Exception:
-            LOGGER.warning("Failed to clear cookies")
-        try:
-            context.clear_permissions()
-        except Exception:
-            LOGGER.warning("Failed to clear permissions")
-        context.add_init_script(
-            """
-            (() => {
-              try { localStorage.clear(); } catch (e) {}
-              try { sessionStorage.clear(); } catch (e) {}
-              try {
-                if (window.caches && caches.keys) {
-                  caches.keys().then(keys => keys.forEach(key => caches.delete(key)));
-                }
-              } catch (e) {}
-              try {
-                if (window.indexedDB && indexedDB.databases) {
-                  indexedDB.databases().then(dbs => {
-                    dbs.forEach(db => {
-                      if (db && db.name) {
-                        indexedDB.deleteDatabase(db.name);
-                      }
-                    });
-                  });
-                }
-              } catch (e) {}
-            })();
-            """
-        )
-
     def _close_popups(self, page) -> None:
         selectors = [
             "button:has-text('Принять')",
@@ -215,6 +350,7 @@ class YandexMapsScraper:
         for selector in selectors:
             try:
                 LOGGER.info("Пробую закрыть всплывающее окно: %s", selector)
+                acquire_request(page.url, self.stop_event, self.pause_event)
                 click_start = time.monotonic()
                 page.locator(selector).first.click(timeout=2000)
                 LOGGER.info(
@@ -238,19 +374,18 @@ class YandexMapsScraper:
         )
 
     def _collect_organizations(self, page) -> Generator[Organization, None, None]:
-        all_ids = self._collect_all_ids(page)
-        total = len(all_ids)
-        LOGGER.info("Уникальных организаций в списке: %s", total)
-        if total == 0:
-            LOGGER.info("Результаты не найдены")
-            return
-
-        self._reset_list_scroll(page)
+        """Walk the result list once: parse visible cards, scroll, repeat until the list ends.
+
+        New ids are discovered on the same scroll that brings them into view, so
+        results start flowing right away and the list is never scrolled twice.
+        """
+        seen_ids: set[str] = set(self._collect_visible_ids(page))
         parsed_ids: set[str] = set()
-        stalled_rounds = 0
         scroll_step = 1200
+        end_tracker = ListEndTracker(self.max_scroll_idle_time)
+        LOGGER.info("Иду по списку: видно карточек=%s", len(seen_ids))
 
-        while len(parsed_ids) < total:
+        while True:
             if self.stop_event.is_set():
                 return
             if self.pause_event.is_set():
@@ -265,9 +400,9 @@ class YandexMapsScraper:
 
             items = page.locator(self.list_item_selector)
             count = items.count()
-            if count == 0:
-                LOGGER.info("Нет видимых карточек для разбора")
-                break
+            if count == 0 and not parsed_ids:
+                LOGGER.info("Результаты не найдены")
+                return
 
             parsed_this_round = 0
             for index in range(count):
@@ -281,8 +416,9 @@ class YandexMapsScraper:
                     return
                 item = items.nth(index)
                 org_id = self._safe_attr(item, "data-id")
-                if not org_id or org_id not in all_ids or org_id in parsed_ids:
+                if not org_id or org_id in parsed_ids:
                     continue
+                seen_ids.add(org_id)
 
                 if self.limit and len(parsed_ids) >= self.limit:
                     LOGGER.info("Достигнут лимит: %s", self.limit)
@@ -293,6 +429,7 @@ class YandexMapsScraper:
 
                 card_wait_start = time.monotonic()
                 card = self._wait_for_card(page, org_id)
+                self.rate_limiter.record_latency(time.monotonic() - card_wait_start)
                 if not card:
                     LOGGER.info(
                         "Карточка не загрузилась (id=%s, %.2fs)",
@@ -309,6 +446,13 @@ class YandexMapsScraper:
 
                 parse_start = time.monotonic()
                 org = self._parse_card(card, org_id)
+                archive_page(
+                    "maps_card",
+                    lambda: card.evaluate("el => el.outerHTML"),
+                    url=page.url,
+                    query=self.query,
+                    org_id=org_id,
+                )
                 LOGGER.info(
                     "Карточка разобрана (id=%s, %.2fs)",
                     org_id,
@@ -317,38 +461,14 @@ class YandexMapsScraper:
                 parsed_ids.add(org_id)
                 parsed_this_round += 1
                 yield org
+                if len(parsed_ids) % 25 == 0:
+                    LOGGER.info("Темп: %s", self.rate_limiter.metrics())
+                self.rate_limiter.wait_action(self.stop_event, self.pause_event)
 
             moved, scroll_info = self._scroll_list(page, scroll_step)
-            if parsed_this_round == 0 and not moved:
-                stalled_rounds += 1
-            else:
-                stalled_rounds = 0
-
-            if stalled_rounds >= 1 and not moved:
-                LOGGER.info("Прогресса нет и список больше не листается — завершаю")
-                break
-
-            human_delay(0.2, 0.4)
-
-    def _collect_all_ids(self, page) -> set[str]:
-        all_ids = set(self._collect_visible_ids(page))
-        LOGGER.info("Собираю id карточек: старт=%s", len(all_ids))
-        scroll_step = 1200
-        last_scroll_move = time.monotonic()
-        last_scroll_top: int | None = None
-        same_scroll_top_rounds = 0
-
-        while True:
-            if self.limit and len(all_ids) >= self.limit:
-                LOGGER.info("Лимит %s достигнут во время предварительной загрузки", self.limit)
-                break
-
-            moved, scroll_info = self._scroll_list(page, scroll_step)
-            new_ids = self._collect_visible_ids(page)
-            before_count = len(all_ids)
-            all_ids.update(new_ids)
-            added = len(all_ids) - before_count
-            scroll_top = scroll_info.get("scrollTop") if scroll_info else None
+            before_count = len(seen_ids)
+            seen_ids.update(self._collect_visible_ids(page))
+            added = len(seen_ids) - before_count
             if added:
                 LOGGER.info(
                     "После прокрутки добавлено карточек: %s (scrollTop=%s/%s)",
@@ -357,56 +477,36 @@ class YandexMapsScraper:
                     scroll_info.get("maxTop"),
                 )
 
-            if scroll_top is not None:
-                if last_scroll_top == scroll_top:
-                    same_scroll_top_rounds += 1
-                else:
-                    same_scroll_top_rounds = 0
-                last_scroll_top = scroll_top
-
-            if same_scroll_top_rounds >= 3 and added == 0:
-                LOGGER.info("Прокрутка уперлась в конец списка — заканчиваю предварительную загрузку")
-                break
-
-            if moved:
-                last_scroll_move = time.monotonic()
+            verdict = end_tracker.step(
+                moved=moved,
+                added=added,
+                parsed=parsed_this_round,
+                scroll_top=scroll_info.get("scrollTop") if scroll_info else None,
+            )
+            if verdict == "more":
+                human_delay(0.2, 0.4)
                 continue
-
-            if time.monotonic() - last_scroll_move >= self.max_scroll_idle_time:
-                LOGGER.info(
-                    "Список не листается %.2fs — начинаю парсинг",
-                    time.monotonic() - last_scroll_move,
-                )
+            if verdict == "end":
                 break
 
-            idle_start_size = len(all_ids)
+            # At the bottom: give lazy loading a chance before calling it the end.
+            idle_start_size = len(seen_ids)
             idle_start = time.monotonic()
-            LOGGER.info("Дошёл до конца списка, жду новые карточки")
-            while time.monotonic() - idle_start < 10:
+            while time.monotonic() - idle_start < ListEndTracker.LAZY_LOAD_WAIT_S:
+                if self.stop_event.is_set():
+                    return
                 time.sleep(random.uniform(0.3, 0.5))
-                all_ids.update(self._collect_visible_ids(page))
-                if len(all_ids) > idle_start_size:
-                    LOGGER.info("После ожидания загружено новых карточек: %s", len(all_ids) - idle_start_size)
+                seen_ids.update(self._collect_visible_ids(page))
+                if len(seen_ids) > idle_start_size:
                     break
-
-            if len(all_ids) == idle_start_size:
-                LOGGER.info("Новых карточек нет — заканчиваю предварительную загрузку")
+            if not end_tracker.waited(len(seen_ids) - idle_start_size):
                 break
 
-        return all_ids
+        LOGGER.info("Уникальных организаций в списке: %s, разобрано: %s", len(seen_ids), len(parsed_ids))
 
     def _collect_visible_ids(self, page) -> list[str]:
         try:
-            return page.evaluate(
-                """
-                (selector) => {
-                  return Array.from(document.querySelectorAll(selector))
-                    .map(node => node.dataset.id)
-                    .filter(Boolean);
-                }
-                """,
-                self.list_item_selector,
-            )
+            return page.evaluate(VISIBLE_IDS_JS, self.list_item_selector)
         except Exception:
             return []
 
@@ -428,10 +528,16 @@ class YandexMapsScraper:
 
     def _click_list_item_wrapper(self, item, org_id: str) -> bool:
         try:
-            wrapper = item.locator(self.list_item_wrapper_selector).first
-            if wrapper.count() == 0:
+            selector = get_selector_registry().find(
+                "maps_card_wrapper",
+                self.list_item_wrapper_selectors,
+                lambda sel: item.locator(sel).first.count() > 0,
+            )
+            if selector is None:
                 LOGGER.info("Не нашёл обёртку карточки для клика (id=%s)", org_id)
                 return False
+            wrapper = item.locator(selector).first
+            acquire_request(item.page.url, self.stop_event, self.pause_event)
             click_start = time.monotonic()
             wrapper.scroll_into_view_if_needed()
             wrapper.evaluate("el => el.click()")
@@ -454,6 +560,30 @@ class YandexMapsScraper:
             except PlaywrightTimeoutError:
                 return None
 
+    @classmethod
+    def fetch_card(cls, page, org_id: str, *, stop_event=None, pause_event=None, timeout_ms: int = 8000):
+        """Open the Maps card of ``org_id`` directly and return its Organization, or None."""
+        url = f"https://yandex.ru/maps/org/{org_id}/"
+        acquire_request(url, stop_event, pause_event)
+        page.goto(url, wait_until="domcontentloaded")
+        selector = f"div.business-card-view[data-id='{org_id}']"
+        try:
+            page.wait_for_selector(selector, timeout=timeout_ms)
+        except PlaywrightTimeoutError:
+            selector = "div.business-card-view"
+            try:
+                page.wait_for_selector(selector, timeout=1000)
+            except PlaywrightTimeoutError:
+                return None
+        snapshot = page.eval_on_selector(selector, CARD_SNAPSHOT_JS)
+        archive_page(
+            "maps_card",
+            lambda: page.eval_on_selector(selector, "el => el.outerHTML"),
+            url=url,
+            org_id=org_id,
+        )
+        return cls.organization_from_snapshot(snapshot or {}, org_id)
+
     def _parse_card(self, card_root, org_id: str) -> Organization:
         title_link = card_root.locator(
             "h1.card-title-view__title a.card-title-view__title-link"
@@ -518,6 +648,44 @@ class YandexMapsScraper:
             rating_count=rating_count,
         )
 
+    @classmethod
+    def organization_from_snapshot(cls, snapshot: dict, org_id: str) -> Organization:
+        """Build an Organization from the result of CARD_SNAPSHOT_JS."""
+        name = sanitize_text(snapshot.get("name"))
+        card_url = cls._normalize_card_url(sanitize_text(snapshot.get("href")), org_id)
+        vk = ""
+        telegram = ""
+        whatsapp = ""
+        for raw_href in snapshot.get("links") or []:
+            href = sanitize_text(raw_href)
+            lower_href = href.lower()
+            if not vk and "vk.com" in lower_href:
+                vk = href
+            if not telegram and ("t.me" in lower_href or "telegram.me" in lower_href):
+                telegram = href
+            if not whatsapp and (
+                "wa.me" in lower_href
+                or "api.whatsapp.com" in lower_href
+                or "whatsapp.com" in lower_href
+            ):
+                whatsapp = href
+        website = cls._normalize_website(
+            sanitize_text(snapshot.get("siteHref")) or sanitize_text(snapshot.get("siteText"))
+        )
+        return Organization(
+            name=name,
+            phone=cls._normalize_phone(sanitize_text(snapshot.get("phoneText"))),
+            verified=sanitize_text(snapshot.get("verified")),
+            award=sanitize_text(snapshot.get("award")),
+            vk=vk,
+            telegram=telegram,
+            whatsapp=whatsapp,
+            website=website,
+            card_url=card_url,
+            rating=normalize_rating(sanitize_text(snapshot.get("ratingText"))),
+            rating_count=extract_count(sanitize_text(snapshot.get("countText"))),
+        )
+
     @staticmethod
     def _normalize_phone(raw_phone: str) -> str:
         digits = "".join(ch for ch in raw_phone if ch.isdigit())
@@ -571,20 +739,7 @@ class YandexMapsScraper:
     def _scroll_list(self, page, step: int) -> tuple[bool, dict]:
         try:
             result = page.evaluate(
-                """
-                ({selector, scrollStep}) => {
-                  const container = document.querySelector(selector);
-                  if (!container) {
-                    return { moved: false, scrollTop: 0 };
-                  }
-                  const prevTop = container.scrollTop;
-                  const maxTop = container.scrollHeight - container.clientHeight;
-                  const nextTop = Math.min(prevTop + scrollStep, maxTop);
-                  container.scrollTop = nextTop;
-                  container.dispatchEvent(new Event("scroll", { bubbles: true }));
-                  return { moved: nextTop > prevTop, scrollTop: nextTop, maxTop };
-                }
-                """,
+                SCROLL_LIST_JS,
                 {"selector": self.scroll_container_selector, "scrollStep": step},
             )
             time.sleep(random.uniform(0.15, 0.25))
@@ -600,22 +755,3 @@ class YandexMapsScraper:
         except Exception as exc:
             LOGGER.info("Не удалось пролистать список: %s", exc)
             return False, {}
-
-    def _reset_list_scroll(self, page) -> None:
-        try:
-            page.evaluate(
-                """
-                (selector) => {
-                  const container = document.querySelector(selector);
-                  if (!container) {
-                    return false;
-                  }
-                  container.scrollTop = 0;
-                  container.dispatchEvent(new Event("scroll", { bubbles: true }));
-                  return true;
-                }
-                """,
-                self.scroll_container_selector,
-            )
-        except Exception:
-            LOGGER.info("Не удалось сбросить прокрутку списка")
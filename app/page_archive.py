@@ -0,0 +1,470 @@
+"""Raw page archive and offline re-extraction.
+
+With ``program.archive_pages`` on, every SERP page, Maps card and reviews page
+the scrapers parse is stored as compressed HTML in a content-addressed store
+(identical pages are kept once) with an SQLite index by kind, query and org id.
+``reextract`` runs the current extraction code over the archive on all cores,
+so a selector fix or a new field costs CPU time instead of another scrape.
+
+    python -m app.page_archive stats
+    python -m app.page_archive reextract maps --query "кафе в Москве" --jobs 8
+    python -m app.page_archive reextract reviews --org-id 1234567890
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import logging
+import multiprocessing
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Iterator, Optional, Union
+from urllib.parse import parse_qs, urlsplit
+
+from app.settings_store import ROOT_DIR
+
+try:  # Optional: zstd packs HTML tighter and faster than gzip.
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+LOGGER = logging.getLogger(__name__)
+
+ARCHIVE_DIR = ROOT_DIR / "archive"
+REEXTRACT_RESULTS_DIR = ROOT_DIR / "results" / "reextract"
+PAGE_KINDS = ("serp", "maps_card", "reviews")
+# CLI names for the kinds above.
+REEXTRACT_KINDS = {"serp": "serp", "maps": "maps_card", "reviews": "reviews"}
+CODEC_SUFFIXES = {"zstd": ".html.zst", "gzip": ".html.gz"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    digest TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    query TEXT NOT NULL DEFAULT '',
+    org_id TEXT NOT NULL DEFAULT '',
+    url TEXT NOT NULL DEFAULT '',
+    size INTEGER NOT NULL DEFAULT 0,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_query ON pages (kind, query);
+CREATE INDEX IF NOT EXISTS pages_org ON pages (org_id);
+"""
+
+
+@dataclass
+class ArchivedPage:
+    id: int
+    digest: str
+    kind: str
+    query: str
+    org_id: str
+    url: str
+    size: int
+    fetched_at: float
+
+
+def _query_from_url(url: str) -> str:
+    try:
+        return (parse_qs(urlsplit(url).query).get("text") or [""])[0]
+    except Exception:
+        return ""
+
+
+class PageArchive:
+    """Content-addressed store of compressed pages plus an SQLite index.
+
+    Objects live at ``objects/<2 hex>/<sha256>.html.zst`` (``.html.gz`` when
+    ``zstandard`` is not installed); the index is opened per call, so scraper
+    threads and sharded worker processes can all write to one archive.
+    """
+
+    def __init__(self, root: Path = ARCHIVE_DIR) -> None:
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.index_path = self.root / "index.sqlite3"
+        self.codec = "zstd" if zstandard is not None else "gzip"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+        finally:
+            conn.close()
+
+    def _object_path(self, digest: str, codec: str) -> Path:
+        return self.objects_dir / digest[:2] / f"{digest}{CODEC_SUFFIXES[codec]}"
+
+    def _find_object(self, digest: str) -> Optional[Path]:
+        for codec in CODEC_SUFFIXES:
+            path = self._object_path(digest, codec)
+            if path.exists():
+                return path
+        return None
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            return zstandard.ZstdCompressor(level=10).compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    def put(self, kind: str, html: str, *, url: str = "", query: str = "", org_id: str = "") -> str:
+        """Store one page and index it; returns the content digest."""
+        if kind not in PAGE_KINDS:
+            raise ValueError(f"unknown page kind: {kind}")
+        data = html.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        if self._find_object(digest) is None:
+            path = self._object_path(digest, self.codec)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(self._compress(data))
+            os.replace(tmp_path, path)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO pages (digest, kind, query, org_id, url, size, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (digest, kind, query or _query_from_url(url), org_id, url, len(data), time.time()),
+            )
+        return digest
+
+    def read(self, digest: str) -> str:
+        path = self._find_object(digest)
+        if path is None:
+            raise FileNotFoundError(f"в архиве нет страницы {digest}")
+        raw = path.read_bytes()
+        if path.name.endswith(CODEC_SUFFIXES["zstd"]):
+            if zstandard is None:
+                raise RuntimeError("страница сжата zstd — установите пакет zstandard")
+            data = zstandard.ZstdDecompressor().decompressobj().decompress(raw)
+        else:
+            data = gzip.decompress(raw)
+        return data.decode("utf-8")
+
+    def entries(
+        self,
+        kind: str,
+        *,
+        query: Optional[str] = None,
+        org_id: Optional[str] = None,
+        latest: bool = True,
+    ) -> list[ArchivedPage]:
+        """Indexed pages of ``kind``, newest first.
+
+        With ``latest`` only the newest capture of each query (SERP) or org id
+        (cards and reviews) is returned.
+        """
+        where = ["kind = ?"]
+        params: list = [kind]
+        if query is not None:
+            where.append("query = ?")
+            params.append(query)
+        if org_id is not None:
+            where.append("org_id = ?")
+            params.append(org_id)
+        condition = " AND ".join(where)
+        sql = f"SELECT * FROM pages WHERE {condition}"
+        if latest:
+            group = "query" if kind == "serp" else "CASE WHEN org_id != '' THEN org_id ELSE digest END"
+            sql += f" AND id IN (SELECT MAX(id) FROM pages WHERE {condition} GROUP BY {group})"
+            params += params
+        sql += " ORDER BY id DESC"
+        with self._connect() as conn:
+            return [ArchivedPage(**dict(row)) for row in conn.execute(sql, params).fetchall()]
+
+    def stats(self) -> dict:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT kind, COUNT(*) AS pages, COUNT(DISTINCT digest) AS objects,"
+                " COALESCE(SUM(size), 0) AS raw_bytes FROM pages GROUP BY kind"
+            ).fetchall()
+        stored = sum(path.stat().st_size for path in self.objects_dir.glob("*/*.html.*"))
+        return {
+            "codec": self.codec,
+            "kinds": {row["kind"]: dict(row) for row in rows},
+            "stored_bytes": stored,
+        }
+
+
+_archive: Optional[PageArchive] = None
+_archive_lock = threading.Lock()
+
+
+def configure_page_archive(enabled: bool, root: Optional[Path] = None) -> Optional[PageArchive]:
+    """Turn page archiving on or off for this process."""
+    global _archive
+    with _archive_lock:
+        if not enabled:
+            _archive = None
+        elif _archive is None or (root is not None and _archive.root != Path(root)):
+            try:
+                _archive = PageArchive(root or ARCHIVE_DIR)
+            except Exception:
+                LOGGER.warning("Не удалось открыть архив страниц — сохраняю без него", exc_info=True)
+                _archive = None
+        return _archive
+
+
+def get_page_archive() -> Optional[PageArchive]:
+    return _archive
+
+
+def archive_page(kind: str, html: Union[str, Callable[[], str]], **meta: str) -> None:
+    """Store a page when archiving is on; ``html`` may be a callable so it is read only then.
+
+    Never raises: a failed write must not cost the scraped data.
+    """
+    archive = _archive
+    if archive is None:
+        return
+    try:
+        archive.put(kind, html() if callable(html) else html, **meta)
+    except Exception:
+        LOGGER.debug("Не удалось сохранить страницу в архив (%s)", kind, exc_info=True)
+
+
+async def archive_page_async(kind: str, html: Callable[[], Awaitable[str]], **meta: str) -> None:
+    """Async twin of ``archive_page``: compression and disk writes run off the event loop."""
+    import asyncio
+
+    archive = _archive
+    if archive is None:
+        return
+    try:
+        content = await html()
+        await asyncio.to_thread(archive.put, kind, content, **meta)
+    except Exception:
+        LOGGER.debug("Не удалось сохранить страницу в архив (%s)", kind, exc_info=True)
+
+
+def _serp_records(page) -> list:
+    """SERP rows through the same card snapshot JS the live scrapers run."""
+    from app.parser_search import (
+        CARD_SNAPSHOT_JS as SERP_CARD_SNAPSHOT_JS,
+        SERP_CARD_SELECTORS,
+        _build_serp_row,
+        _row_to_organization,
+        _serp_dedupe_key,
+        _snapshot_fields,
+    )
+
+    selector = next((sel for sel in SERP_CARD_SELECTORS if page.locator(sel).count() > 0), None)
+    if selector is None:
+        return []
+    snapshots = page.eval_on_selector_all(selector, f"(nodes) => nodes.map({SERP_CARD_SNAPSHOT_JS})")
+    records = []
+    seen_keys: set[str] = set()
+    for snapshot in snapshots or []:
+        fields = _snapshot_fields(snapshot)
+        dedupe_key = _serp_dedupe_key(str(fields["card_url"]), str(fields["name"]), str(fields["reviews"]))
+        if dedupe_key in seen_keys:
+            continue
+        seen_keys.add(dedupe_key)
+        row = _build_serp_row(
+            name=str(fields["name"]),
+            rating=str(fields["rating"]),
+            reviews=str(fields["reviews"]),
+            verified=bool(fields["verified"]),
+            phones=str(fields["phones"]),
+            website=str(fields["website"]),
+            card_url=str(fields["card_url"]),
+        )
+        records.append(_row_to_organization(row))
+    return records
+
+
+def _reextract_chunk(kind: str, root: str, entries: list[ArchivedPage]) -> list[tuple[int, list, str]]:
+    # Runs in a worker process; returns (entry id, records, error) per page.
+    from playwright.sync_api import sync_playwright
+
+    from app.pacser_maps import CARD_SNAPSHOT_JS, YandexMapsScraper
+    from app.playwright_utils import PLAYWRIGHT_LAUNCH_ARGS, launch_chrome
+    from app.reviews_parser import REVIEWS_SNAPSHOT_JS, YandexReviewsParser
+
+    archive = PageArchive(Path(root))
+    results: list[tuple[int, list, str]] = []
+
+    with sync_playwright() as p:
+        browser = launch_chrome(p, headless=True, args=PLAYWRIGHT_LAUNCH_ARGS, use_daemon=False)
+        # Page scripts stay off and nothing reaches the network: the DOM is all the snapshots need.
+        context = browser.new_context(java_script_enabled=False)
+        context.route("**/*", lambda route: route.abort())
+        page = context.new_page()
+        try:
+            for entry in entries:
+                try:
+                    page.set_content(archive.read(entry.digest), wait_until="domcontentloaded")
+                    if kind == "serp":
+                        records = _serp_records(page)
+                    elif kind == "maps_card":
+                        snapshot = page.eval_on_selector("div.business-card-view", CARD_SNAPSHOT_JS)
+                        records = [YandexMapsScraper.organization_from_snapshot(snapshot or {}, entry.org_id)]
+                    else:
+                        snapshots = page.evaluate(REVIEWS_SNAPSHOT_JS, YandexReviewsParser.snapshot_args())
+                        records = [
+                            YandexReviewsParser.review_from_snapshot(snapshot, entry.org_id)
+                            for snapshot in snapshots or []
+                        ]
+                    results.append((entry.id, records, ""))
+                except Exception as exc:
+                    results.append((entry.id, [], str(exc)))
+        finally:
+            context.close()
+            browser.close()
+    return results
+
+
+def _split_chunks(entries: list[ArchivedPage], jobs: int) -> list[list[ArchivedPage]]:
+    # Every kind re-extracts in a headless browser, so each process gets one chunk.
+    count = max(1, min(jobs, len(entries)))
+    return [entries[index::count] for index in range(count)]
+
+
+def reextract(
+    kind: str,
+    output_path: Path,
+    *,
+    archive: Optional[PageArchive] = None,
+    query: Optional[str] = None,
+    org_id: Optional[str] = None,
+    latest: bool = True,
+    jobs: Optional[int] = None,
+    settings=None,
+    log: Callable[[str], None] = LOGGER.info,
+) -> int:
+    """Re-run extraction over archived pages and write a fresh xlsx; returns rows written."""
+    from app.settings_store import load_settings
+    from app.utils import organization_key
+
+    archive = archive or PageArchive()
+    settings = settings or load_settings()
+    entries = archive.entries(kind, query=query, org_id=org_id, latest=latest)
+    if not entries:
+        log("В архиве нет подходящих страниц")
+        return 0
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    chunks = _split_chunks(entries, jobs)
+    log(f"Страниц: {len(entries)}, процессов: {min(jobs, len(chunks))}")
+
+    by_id: dict[int, list] = {}
+    failed = 0
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(jobs, len(chunks)), mp_context=ctx) as pool:
+        futures = [pool.submit(_reextract_chunk, kind, str(archive.root), chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            for entry_id, records, error in future.result():
+                by_id[entry_id] = records
+                if error:
+                    failed += 1
+                    LOGGER.debug("Страница %s не разобрана: %s", entry_id, error)
+            log(f"Разобрано страниц: {len(by_id)}/{len(entries)}")
+
+    # The parent is the only writer, in index order, so the output does not depend on process timing.
+    written = 0
+    if kind == "reviews":
+        from app.reviews_excel_writer import ReviewsExcelWriter
+
+        writer = ReviewsExcelWriter(output_path)
+        try:
+            for entry in entries:
+                for review in by_id.get(entry.id, []):
+                    written += 1 if writer.append(review) else 0
+        finally:
+            writer.close()
+    else:
+        from app.excel_writer import ExcelWriter
+        from app.filters import passes_potential_filters
+
+        writer = ExcelWriter(output_path)
+        seen: set[str] = set()
+        try:
+            for entry in entries:
+                for org in by_id.get(entry.id, []):
+                    key = organization_key(org)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    writer.append(org, include_in_potential=passes_potential_filters(org, settings))
+                    written += 1
+        finally:
+            writer.close()
+    if failed:
+        log(f"⚠️ Не удалось разобрать страниц: {failed}")
+    return written
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.page_archive", description=__doc__.splitlines()[0])
+    parser.add_argument("--root", default=str(ARCHIVE_DIR), help="Archive folder")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("stats", help="Pages and disk usage per kind")
+
+    run = commands.add_parser("reextract", help="Parse archived pages again and write a new xlsx")
+    run.add_argument("kind", choices=sorted(REEXTRACT_KINDS))
+    run.add_argument("--query", default=None)
+    run.add_argument("--org-id", default=None)
+    run.add_argument("--all-versions", action="store_true", help="Every capture, not just the newest per org/query")
+    run.add_argument("--jobs", type=int, default=0, help="Processes (default: all cores)")
+    run.add_argument("--out", default="", help="Output xlsx")
+
+    args = parser.parse_args(argv)
+
+    from datetime import datetime
+
+    from app.settings_store import load_settings
+    from app.utils import configure_logging
+
+    settings = load_settings()
+    configure_logging(settings.program.log_level)
+    archive = PageArchive(Path(args.root))
+
+    if args.command == "stats":
+        info = archive.stats()
+        print(f"Сжатие: {info['codec']}, на диске: {info['stored_bytes'] / 1_048_576:.1f} МБ")
+        for kind, row in sorted(info["kinds"].items()):
+            print(
+                f"{kind}: страниц {row['pages']}, уникальных {row['objects']},"
+                f" без сжатия {row['raw_bytes'] / 1_048_576:.1f} МБ"
+            )
+        return 0
+
+    if args.command == "reextract":
+        kind = REEXTRACT_KINDS[args.kind]
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        output_path = Path(args.out) if args.out else REEXTRACT_RESULTS_DIR / f"{args.kind}_{timestamp}.xlsx"
+        written = reextract(
+            kind,
+            output_path,
+            archive=archive,
+            query=args.query,
+            org_id=args.org_id,
+            latest=not args.all_versions,
+            jobs=args.jobs or None,
+            settings=settings,
+            log=print,
+        )
+        print(f"Готово: {output_path} ({written})")
+        return 0
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,29 +5,55 @@ import re
 import time
 import urllib.parse
 from pathlib import Path
-from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from playwright.sync_api import Page, sync_playwright
 
-from app.captcha_utils import is_captcha, wait_captcha_resolved, CaptchaHook
+from app.captcha_utils import CaptchaProbe, is_captcha, wait_captcha_resolved, CaptchaHook
 from app.excel_writer import ExcelWriter
 from app.filters import passes_potential_filters
 from app.notifications import notify_sound
+from app.page_archive import archive_page
 from app.playwright_utils import (
     PLAYWRIGHT_LAUNCH_ARGS,
     PLAYWRIGHT_USER_AGENT,
     PLAYWRIGHT_VIEWPORT,
     launch_chrome,
+    new_isolated_context,
 )
 from app.settings_model import Settings
-from app.utils import extract_phones, get_logger, maybe_human_delay, RateLimiter
-from app.pacser_maps import Organization
+from app.utils import (
+    build_rate_limiter,
+    extract_phones,
+    get_logger,
+    maybe_human_delay,
+    RateLimiter,
+    _wait_with_pause,
+    extract_org_id,
+)
+from app.pacser_maps import Organization, YandexMapsScraper, merge_organizations, missing_fields
+from app.request_budget import acquire_request
+from app.selector_registry import get_selector_registry
 
 _logger = get_logger()
 
 INT_RE = re.compile(r"\d+")
 RATING_A11Y_RE = re.compile(r"Рейтинг\s*([0-9]+(?:[.,][0-9]+)?)", re.IGNORECASE)
 CAPTCHA_BUTTON_SELECTOR = "input#js-button.CheckboxCaptcha-Button"
+SERP_CARD_SELECTORS = [
+    ".OrgCard",
+    ".OrganicCard",
+    ".Organic-Card",
+    "li.OrgCard",
+]
+CAROUSEL_ARROW_SELECTOR = (
+    ".Scroller-Arrow.ArrowButton_direction_right, "
+    ".ArrowButton.ArrowButton_direction_right"
+)
+CAROUSEL_SHADOW_SELECTOR = ".Scroller-ArrowShadow.Scroller-ArrowShadow_direction_right"
+# With a limit, the carousel is loaded this many cards beyond what is still missing,
+# so rows dropped by the potential filters or dedupe rarely force another load round.
+LIMIT_CARD_MARGIN = 10
 YANDEX_WHITELIST_URLS = [
     "https://yandex.ru",
     "https://mail.yandex.ru",
@@ -174,50 +200,13 @@ def _apply_rate_limiter_settings(
         return
     min_s = float(_get_setting(settings_getter, "delay_min_s", delay_min_s) or 0.0)
     max_s = float(_get_setting(settings_getter, "delay_max_s", delay_max_s) or 0.0)
-    rate_limiter.min_delay_s = max(0.0, min_s)
-    rate_limiter.max_delay_s = max(rate_limiter.min_delay_s, max_s)
+    rate_limiter.set_delay_range(min_s, max_s)
     if backoff_base_s is not None:
         rate_limiter.backoff_base_s = max(0.0, float(backoff_base_s))
     if backoff_max_s is not None:
         rate_limiter.backoff_max_s = max(0.0, float(backoff_max_s))
 
 
-def _reset_browser_data(context) -> None:
-    _logger.info("Очищаю cookies, разрешения и хранилище для новой сессии")
-    try:
-        context.clear_cookies()
-    except Exception:
-        _logger.warning("Failed to clear cookies")
-    try:
-        context.clear_permissions()
-    except Exception:
-        _logger.warning("Failed to clear permissions")
-    context.add_init_script(
-        """
-        (() => {
-          try { localStorage.clear(); } catch (e) {}
-          try { sessionStorage.clear(); } catch (e) {}
-          try {
-            if (window.caches && caches.keys) {
-              caches.keys().then(keys => keys.forEach(key => caches.delete(key)));
-            }
-          } catch (e) {}
-          try {
-            if (window.indexedDB && indexedDB.databases) {
-              indexedDB.databases().then(dbs => {
-                dbs.forEach(db => {
-                  if (db && db.name) {
-                    indexedDB.deleteDatabase(db.name);
-                  }
-                });
-              });
-            }
-          } catch (e) {}
-        })();
-        """
-    )
-
-
 class CaptchaFlowHelper:
     def __init__(
         self,
@@ -420,9 +409,11 @@ class CaptchaFlowHelper:
         return None
 
 
-def build_serp_url(query: str, lr: str) -> str:
+def build_serp_url(query: str, lr: str, page: int = 0) -> str:
+    """SERP URL; ``page`` is the 0-based results page (Yandex ``p=``)."""
     q = urllib.parse.quote_plus(query)
-    return f"https://yandex.ru/search/?lr={lr}&text={q}&serp-reload-from=companies&noreask=1"
+    url = f"https://yandex.ru/search/?lr={lr}&text={q}&serp-reload-from=companies&noreask=1"
+    return f"{url}&p={page}" if page > 0 else url
 
 
 def _normalize_href(href: str) -> str:
@@ -463,65 +454,147 @@ def _safe_text(loc) -> str:
     return ""
 
 
+CARD_SNAPSHOT_JS = """
+card => {
+  const getText = (sel) => {
+    const el = card.querySelector(sel);
+    return el ? (el.textContent || "").trim() : "";
+  };
+  const titleLink = card.querySelector("a.OrgCard-Title");
+  const titleTextEl = titleLink ? titleLink.querySelector(".OrgCard-TitleText") : null;
+  const name = titleTextEl ? (titleTextEl.textContent || "").trim() : "";
+  const titleHref = titleLink ? (titleLink.getAttribute("href") || "") : "";
+
+  const labelContent = getText(".LabelRating .Label-Content");
+  const ratingA11y = getText(".LabelRating .A11yHidden");
+  const reviewsText = getText("a.OrgCard-ReviewsLink");
+
+  const a11yHidden = Array.from(card.querySelectorAll(".A11yHidden"));
+  const badgeBlue = a11yHidden.some(el => /Информация об организации подтверждена владельцем/i.test(el.textContent || ""));
+  const verifiedA11y = a11yHidden.some(el => /подтверждена владельцем/i.test(el.textContent || ""));
+  const verifiedIcon = !!card.querySelector(".OrgCard-TitleVerified, .Icon_type_verified");
+
+  let mainText = "";
+  let mainHref = "";
+  const mainBtn = card.querySelector(".OrgsListActions-FirstMainButton");
+  if (mainBtn) {
+    const txtEl = mainBtn.querySelector(".Button-Text") || mainBtn;
+    mainText = (txtEl.textContent || "").trim();
+    mainHref = mainBtn.getAttribute("href") || "";
+  }
+  if (!mainHref) {
+    const link = card.querySelector(".OrgsListActions a.Button_link");
+    if (link) {
+      const txtEl = link.querySelector(".Button-Text") || link;
+      if (!mainText) mainText = (txtEl.textContent || "").trim();
+      mainHref = link.getAttribute("href") || "";
+    }
+  }
+
+  return {
+    name,
+    titleHref,
+    labelContent,
+    ratingA11y,
+    reviewsText,
+    badgeBlue,
+    verifiedIcon,
+    verifiedA11y,
+    mainText,
+    mainHref,
+  };
+}
+"""
+
+
 def _extract_card_snapshot(card) -> Dict[str, object]:
     try:
-        return card.evaluate(
-            """
-            card => {
-              const getText = (sel) => {
-                const el = card.querySelector(sel);
-                return el ? (el.textContent || "").trim() : "";
-              };
-              const titleLink = card.querySelector("a.OrgCard-Title");
-              const titleTextEl = titleLink ? titleLink.querySelector(".OrgCard-TitleText") : null;
-              const name = titleTextEl ? (titleTextEl.textContent || "").trim() : "";
-              const titleHref = titleLink ? (titleLink.getAttribute("href") || "") : "";
-
-              const labelContent = getText(".LabelRating .Label-Content");
-              const ratingA11y = getText(".LabelRating .A11yHidden");
-              const reviewsText = getText("a.OrgCard-ReviewsLink");
-
-              const a11yHidden = Array.from(card.querySelectorAll(".A11yHidden"));
-              const badgeBlue = a11yHidden.some(el => /Информация об организации подтверждена владельцем/i.test(el.textContent || ""));
-              const verifiedA11y = a11yHidden.some(el => /подтверждена владельцем/i.test(el.textContent || ""));
-              const verifiedIcon = !!card.querySelector(".OrgCard-TitleVerified, .Icon_type_verified");
-
-              let mainText = "";
-              let mainHref = "";
-              const mainBtn = card.querySelector(".OrgsListActions-FirstMainButton");
-              if (mainBtn) {
-                const txtEl = mainBtn.querySelector(".Button-Text") || mainBtn;
-                mainText = (txtEl.textContent || "").trim();
-                mainHref = mainBtn.getAttribute("href") || "";
-              }
-              if (!mainHref) {
-                const link = card.querySelector(".OrgsListActions a.Button_link");
-                if (link) {
-                  const txtEl = link.querySelector(".Button-Text") || link;
-                  if (!mainText) mainText = (txtEl.textContent || "").trim();
-                  mainHref = link.getAttribute("href") || "";
-                }
-              }
-
-              return {
-                name,
-                titleHref,
-                labelContent,
-                ratingA11y,
-                reviewsText,
-                badgeBlue,
-                verifiedIcon,
-                verifiedA11y,
-                mainText,
-                mainHref,
-              };
-            }
-            """
-        )
+        return card.evaluate(CARD_SNAPSHOT_JS)
     except Exception:
         return {}
 
 
+def _snapshot_fields(snapshot) -> Dict[str, object]:
+    """Normalize a raw card snapshot into name/rating/reviews/links/phones."""
+    if not isinstance(snapshot, dict):
+        snapshot = {}
+    name = snapshot.get("name", "") or ""
+    raw_link = snapshot.get("titleHref", "") or ""
+    link = _strip_profile_link(_normalize_href(raw_link)) if raw_link else ""
+
+    rating = ""
+    label_content = snapshot.get("labelContent", "") or ""
+    rating_a11y = snapshot.get("ratingA11y", "") or ""
+    if label_content:
+        try:
+            rating = str(float(str(label_content).replace(",", ".")))
+        except Exception:
+            rating = str(label_content).replace(",", ".")
+    elif rating_a11y:
+        m = RATING_A11Y_RE.search(str(rating_a11y))
+        if m:
+            rating = m.group(1).replace(",", ".")
+
+    reviews = ""
+    reviews_text = snapshot.get("reviewsText", "") or ""
+    if reviews_text:
+        m = INT_RE.search(str(reviews_text))
+        reviews = m.group(0) if m else ""
+
+    verified = bool(
+        snapshot.get("badgeBlue")
+        or snapshot.get("verifiedIcon")
+        or snapshot.get("verifiedA11y")
+    )
+
+    main_text = snapshot.get("mainText", "") or ""
+    main_href = snapshot.get("mainHref", "") or ""
+    website = _normalize_href(main_href) if main_href else ""
+
+    oid = _extract_oid_from_href(link) if link else ""
+    card_url = _build_profile_url(oid) if oid else ""
+    phones = ", ".join(extract_phones(main_text)) if main_text else ""
+    return {
+        "name": name,
+        "rating": rating,
+        "reviews": reviews,
+        "verified": verified,
+        "website": website,
+        "card_url": card_url,
+        "phones": phones,
+    }
+
+
+def _serp_dedupe_key(card_url: str, name: str, reviews: str) -> str:
+    oid = _extract_oid_from_href(card_url) if card_url else ""
+    return oid or f"{name}|{reviews}"
+
+
+def _build_serp_row(
+    *,
+    name: str,
+    rating: str,
+    reviews: str,
+    verified: bool,
+    phones: str,
+    website: str,
+    card_url: str,
+) -> Dict:
+    return {
+        "name": name,
+        "rating": rating,
+        "reviews": reviews,
+        "good_place": "",
+        "telegram": "",
+        "vk": "",
+        "badge_blue": 1 if verified else 0,
+        "badge_green": "",
+        "phones": phones,
+        "website": website,
+        "url": card_url,
+    }
+
+
 def _arrow_is_disabled(arrow) -> bool:
     """Return True if carousel right arrow is disabled/unavailable."""
     try:
@@ -598,6 +671,8 @@ def _wait_for_carousel_arrow(
     log: Callable[[str], None],
     timeout_ms: int = 30000,
     retries: int = 3,
+    stop_event=None,
+    pause_event=None,
 ):
     """Wait for carousel arrow to appear; reload if needed."""
     selector = (
@@ -615,6 +690,7 @@ def _wait_for_carousel_arrow(
             log(f"SERP: стрелка карусели не найдена (попытка {attempt}/{retries}). Перезагружаю...")
             try:
                 if target_url:
+                    acquire_request(target_url, stop_event, pause_event)
                     page.goto(target_url, wait_until="domcontentloaded")
                 else:
                     page.reload(wait_until="domcontentloaded")
@@ -709,18 +785,67 @@ def _build_profile_url(oid: str) -> str:
     return f"https://yandex.ru/profile/{oid}"
 
 
-def _extract_from_extra_popup(page: Page, card, log: Callable[[str], None]) -> Tuple[str, str, str]:
+EXTRA_BUTTON_SELECTOR = "button:has-text('Ещё')"
+EXTRA_POPUP_JS = """
+() => {
+  const popups = document.querySelectorAll(".Popup2_visible.OrgsListActions-PopupContent");
+  const popup = popups[popups.length - 1];
+  if (!popup) {
+    return null;
+  }
+  const buttons = Array.from(popup.querySelectorAll(".OrgsListActions-ExtraButton"));
+  const hasIcon = (el, type) => !!el.querySelector(".OrgsListActions-Icon_type_" + type);
+  const anchors = buttons.filter(el => el.tagName === "A");
+  const phoneButton = buttons.find(el => el.tagName === "BUTTON" && hasIcon(el, "phone"));
+  const phoneText = phoneButton ? phoneButton.querySelector(".Button-Text") : null;
+  const route = anchors.find(el => hasIcon(el, "route") || /Маршрут/.test(el.textContent || ""));
+  const site = anchors.find(el => hasIcon(el, "site"));
+  return {
+    phoneText: phoneText ? (phoneText.textContent || "").trim() : "",
+    routeHref: route ? (route.getAttribute("href") || "") : "",
+    siteHref: site ? (site.getAttribute("href") || "") : "",
+  };
+}
+"""
+
+
+def _needs_extra_popup(phones: str, card_url: str, website: str) -> bool:
+    return not phones or not card_url or not website
+
+
+def _extra_popup_fields(snapshot) -> Tuple[str, str, str]:
+    """Phones, profile link and site from an ``EXTRA_POPUP_JS`` snapshot."""
+    if not isinstance(snapshot, dict):
+        return "", "", ""
+    phone_text = snapshot.get("phoneText", "") or ""
+    phones = ", ".join(extract_phones(phone_text)) if phone_text else ""
+    route_href = snapshot.get("routeHref", "") or ""
+    profile_link = _strip_profile_link(_normalize_href(route_href)) if route_href else ""
+    site_href = snapshot.get("siteHref", "") or ""
+    site_link = _normalize_href(site_href) if site_href else ""
+    return phones, profile_link, site_link
+
+
+def _extract_from_extra_popup(
+    page: Page,
+    card,
+    log: Callable[[str], None],
+    delay_ms: int = 200,
+    stop_event=None,
+    pause_event=None,
+) -> Tuple[str, str, str]:
     try:
-        btn = card.locator("button:has-text('Ещё')").first
+        btn = card.locator(EXTRA_BUTTON_SELECTOR).first
         if btn.count() == 0:
             return "", "", ""
-        popup = None
+        snapshot = None
         for _ in range(2):
             try:
                 card.scroll_into_view_if_needed(timeout=500)
             except Exception:
                 pass
             try:
+                acquire_request(page.url, stop_event, pause_event)
                 click_start = time.monotonic()
                 btn.click(timeout=800, force=True)
                 _trace_click(log, "more actions", "playwright click", duration_s=time.monotonic() - click_start)
@@ -733,47 +858,19 @@ def _extract_from_extra_popup(page: Page, card, log: Callable[[str], None]) -> T
                     _trace_click(log, "more actions", "evaluate click", success=False)
                     pass
             try:
-                page.wait_for_timeout(200)
+                page.wait_for_timeout(delay_ms)
             except Exception:
-                time.sleep(0.2)
-            popup = page.locator(".Popup2_visible.OrgsListActions-PopupContent").last
-            if popup.count() > 0:
+                time.sleep(delay_ms / 1000)
+            snapshot = page.evaluate(EXTRA_POPUP_JS)
+            if snapshot:
                 break
-        if not popup or popup.count() == 0:
+        if not snapshot:
             return "", "", ""
-        phone_text = _safe_text(
-            popup.locator(
-                "button.OrgsListActions-ExtraButton:has(.OrgsListActions-Icon_type_phone) .Button-Text"
-            )
-        )
-        phones = ", ".join(extract_phones(phone_text)) if phone_text else ""
-        profile_link = ""
-        site_link = ""
-        try:
-            route_anchor = popup.locator(
-                "a.OrgsListActions-ExtraButton:has(.OrgsListActions-Icon_type_route), "
-                "a.OrgsListActions-ExtraButton:has-text('Маршрут')"
-            ).first
-            if route_anchor.count() > 0:
-                href = route_anchor.get_attribute("href") or ""
-                href = _normalize_href(href)
-                profile_link = _strip_profile_link(href)
-        except Exception:
-            profile_link = ""
-        try:
-            site_anchor = popup.locator(
-                "a.OrgsListActions-ExtraButton:has(.OrgsListActions-Icon_type_site)"
-            ).first
-            if site_anchor.count() > 0:
-                site_href = site_anchor.get_attribute("href") or ""
-                site_link = _normalize_href(site_href)
-        except Exception:
-            site_link = ""
         try:
             page.keyboard.press("Escape")
         except Exception:
             pass
-        return phones, profile_link, site_link
+        return _extra_popup_fields(snapshot)
     except Exception:
         return "", "", ""
 
@@ -811,7 +908,14 @@ def _extract_phone_from_main_button(card) -> str:
     return ", ".join(phones) if phones else ""
 
 
-def _click_show_phone(card, page: Page, log: Callable[[str], None]) -> str:
+def _click_show_phone(
+    card,
+    page: Page,
+    log: Callable[[str], None],
+    delay_ms: int = 200,
+    stop_event=None,
+    pause_event=None,
+) -> str:
     try:
         btn = card.locator(".OrgsListActions-FirstMainButton").first
         if btn.count() == 0:
@@ -821,6 +925,7 @@ def _click_show_phone(card, page: Page, log: Callable[[str], None]) -> str:
         text_before = _safe_text(btn.locator(".Button-Text")) or _safe_text(btn)
         if "Показать телефон" not in text_before:
             return ""
+        acquire_request(page.url, stop_event, pause_event)
         try:
             click_start = time.monotonic()
             btn.click(timeout=800, force=True)
@@ -834,9 +939,9 @@ def _click_show_phone(card, page: Page, log: Callable[[str], None]) -> str:
                 _trace_click(log, "show phone", "evaluate click", success=False)
                 return ""
         try:
-            page.wait_for_timeout(200)
+            page.wait_for_timeout(delay_ms)
         except Exception:
-            time.sleep(0.2)
+            time.sleep(delay_ms / 1000)
         text_after = _safe_text(btn.locator(".Button-Text")) or _safe_text(btn)
         phones = extract_phones(text_after)
         return ", ".join(phones) if phones else ""
@@ -861,40 +966,91 @@ def _extract_card_url_from_card(card, fallback_link: str) -> str:
     return _build_profile_url(oid)
 
 
-def _load_all_cards(page: Page, stop_event, pause_event, log: Callable[[str], None]):
-    selectors = [
-        ".OrgCard",
-        ".OrganicCard",
-        ".Organic-Card",
-        "li.OrgCard",
-        ".OrgCard-Body",
-    ]
-    cards = None
-    for sel in selectors:
-        loc = page.locator(sel)
-        try:
-            if loc.count() > 0:
-                cards = loc
-                break
-        except Exception:
-            _logger.debug("SERP: card locator failed for %s", sel, exc_info=True)
+class CarouselProgress:
+    """End-of-carousel rule shared by the sync and async SERP loaders.
+
+    The carousel has ended when the arrow and its shadow are gone after two
+    clicks brought no cards, or three clicks in a row brought nothing while
+    no shadow hints at more cards.
+    """
+
+    def __init__(self, count: int) -> None:
+        self.last_count = count
+        self.stalled = 0
+
+    def ended_before_click(self, arrow_visible: bool, shadow_visible: bool) -> bool:
+        return not arrow_visible and not shadow_visible and self.stalled >= 2
+
+    def update(self, count: int) -> None:
+        if count > self.last_count:
+            self.last_count = count
+            self.stalled = 0
+        else:
+            self.stalled += 1
+
+    def ended_after_click(self, shadow_visible: bool) -> bool:
+        return self.stalled >= 3 and not shadow_visible
+
+
+def _count_passing(row_filter: Optional[Callable[[Dict], bool]], row: Dict) -> int:
+    """1 when ``row`` counts towards ``limit``: every row without a filter, else the ones it accepts."""
+    if row_filter is None:
+        return 1
+    try:
+        return 1 if row_filter(row) else 0
+    except Exception:
+        _logger.debug("SERP: row_filter failed", exc_info=True)
+        return 0
+
+
+def _find_serp_cards(page: Page):
+    selector = get_selector_registry().find(
+        "serp_cards",
+        SERP_CARD_SELECTORS,
+        lambda sel: page.locator(sel).count() > 0,
+    )
+    return page.locator(selector) if selector else None
+
+
+def _load_all_cards(
+    page: Page,
+    stop_event,
+    pause_event,
+    log: Callable[[str], None],
+    *,
+    max_cards: int = 0,
+    max_clicks: int = 0,
+    clicks_used: int = 0,
+    arrow_delay_ms: int = 200,
+) -> Tuple[object, int]:
+    """Page the carousel until it ends, ``max_cards`` are loaded or ``max_clicks`` arrow clicks are spent.
+
+    Returns the cards locator (``None`` when there are no cards) and the number
+    of arrow clicks used so far, so a follow-up call can continue the budget.
+    """
+    cards = _find_serp_cards(page)
     if cards is None:
         log("SERP: карточки не найдены.")
-        return None
+        return None, clicks_used
 
-    arrow_selector = (
-        ".Scroller-Arrow.ArrowButton_direction_right, "
-        ".ArrowButton.ArrowButton_direction_right"
-    )
-    shadow_selector = ".Scroller-ArrowShadow.Scroller-ArrowShadow_direction_right"
-    stalled = 0
-    last_count = cards.count()
-    log("SERP: загрузка всех карточек...")
+    arrow_selector = CAROUSEL_ARROW_SELECTOR
+    shadow_selector = CAROUSEL_SHADOW_SELECTOR
+    progress = CarouselProgress(cards.count())
+    if max_cards:
+        log(f"SERP: загрузка карточек (нужно {max_cards})...")
+    else:
+        log("SERP: загрузка всех карточек...")
 
     while not stop_event.is_set():
         while pause_event.is_set() and not stop_event.is_set():
             time.sleep(0.05)
 
+        if max_cards and progress.last_count >= max_cards:
+            break
+        if max_clicks and clicks_used >= max_clicks:
+            log(f"SERP: исчерпан лимит кликов по карусели ({max_clicks}).")
+            break
+
         _close_distribution_offer(page, log)
         arrow = page.locator(arrow_selector).first
         try:
@@ -906,10 +1062,12 @@ def _load_all_cards(page: Page, stop_event, pause_event, log: Callable[[str], No
         except Exception:
             shadow_visible = False
 
-        if not arrow_visible and not shadow_visible and stalled >= 2:
+        if progress.ended_before_click(arrow_visible, shadow_visible):
             break
 
         if arrow_visible:
+            acquire_request(page.url, stop_event, pause_event)
+            clicks_used += 1
             try:
                 click_start = time.monotonic()
                 arrow.click(timeout=800)
@@ -918,28 +1076,22 @@ def _load_all_cards(page: Page, stop_event, pause_event, log: Callable[[str], No
                 _trace_click(log, "carousel arrow", "playwright click", success=False)
                 _logger.debug("SERP: arrow click failed", exc_info=True)
 
-        grew = _wait_for_card_growth_fast(cards, stop_event, pause_event, timeout_s=0.2)
+        _wait_for_card_growth_fast(cards, stop_event, pause_event, timeout_s=0.2)
         try:
-            current_count = cards.count()
+            progress.update(cards.count())
         except Exception:
-            current_count = last_count
-
-        if grew or current_count > last_count:
-            stalled = 0
-            last_count = current_count
-        else:
-            stalled += 1
+            progress.update(progress.last_count)
 
         try:
-            page.wait_for_timeout(200)
+            page.wait_for_timeout(arrow_delay_ms)
         except Exception:
-            time.sleep(0.2)
+            time.sleep(arrow_delay_ms / 1000)
 
-        if stalled >= 3 and not shadow_visible:
+        if progress.ended_after_click(shadow_visible):
             break
 
-    log(f"SERP: карточек найдено {last_count}.")
-    return cards
+    log(f"SERP: карточек найдено {progress.last_count}.")
+    return cards, clicks_used
 
 
 def parse_serp_cards(
@@ -966,8 +1118,22 @@ def parse_serp_cards(
     batch_pause_s: float = 0.0,
     start_index: int = 0,
     settings_getter: Optional[Callable[[], object]] = None,
+    keep_rows: bool = True,
+    captcha_check_interval_s: float = 2.0,
+    limit: Optional[int] = None,
+    row_filter: Optional[Callable[[Dict], bool]] = None,
 ) -> List[Dict]:
-    """Parse organization cards in Yandex SERP."""
+    """Parse organization cards in Yandex SERP.
+
+    Every parsed row is passed to ``row_cb`` as soon as it is ready; an
+    error raised by ``row_cb`` stops parsing and propagates. With
+    ``keep_rows=False`` rows are not accumulated and an empty list is returned,
+    so a streaming sink behind ``row_cb`` keeps memory flat.
+
+    With ``limit`` the carousel is loaded only as far as needed and parsing
+    stops once ``limit`` rows pass ``row_filter`` (all rows count without it).
+    ``max_clicks`` caps carousel arrow clicks for the whole call.
+    """
     if is_captcha(page):
         page = wait_captcha_resolved(
             page,
@@ -993,25 +1159,19 @@ def parse_serp_cards(
         except Exception:
             return int(fallback or 0)
 
+    clicks_used = 0
     if do_scroll:
-        cards = _load_all_cards(page, stop_event, pause_event, log)
+        cards, clicks_used = _load_all_cards(
+            page,
+            stop_event,
+            pause_event,
+            log,
+            max_cards=start_index + limit + LIMIT_CARD_MARGIN if limit and do_parse else 0,
+            max_clicks=max_clicks,
+            arrow_delay_ms=arrow_delay_ms,
+        )
     else:
-        cards = None
-        selectors = [
-            ".OrgCard",
-            ".OrganicCard",
-            ".Organic-Card",
-            "li.OrgCard",
-            ".OrgCard-Body",
-        ]
-        for sel in selectors:
-            loc = page.locator(sel)
-            try:
-                if loc.count() > 0:
-                    cards = loc
-                    break
-            except Exception:
-                _logger.debug("SERP: card locator failed", exc_info=True)
+        cards = _find_serp_cards(page)
 
     if cards is None:
         log("SERP: карточки не найдены.")
@@ -1026,16 +1186,45 @@ def parse_serp_cards(
         total = 0
 
     rows: List[Dict] = []
+    rows_count = 0
+    passed_count = 0
     seen_keys: set[str] = set()
-    for idx in range(total):
-        if idx < start_index:
-            continue
+    captcha_probe = CaptchaProbe(captcha_check_interval_s)
+    idx = start_index - 1
+    while True:
+        idx += 1
+        if limit and passed_count >= limit:
+            log(f"SERP: достигнут лимит {limit}.")
+            break
+        if idx >= total:
+            # Short of the limit: page the carousel further unless it already ended.
+            if not (limit and do_scroll) or stop_event.is_set():
+                break
+            if max_clicks and clicks_used >= max_clicks:
+                break
+            cards, clicks_used = _load_all_cards(
+                page,
+                stop_event,
+                pause_event,
+                log,
+                max_cards=total + (limit - passed_count) + LIMIT_CARD_MARGIN,
+                max_clicks=max_clicks,
+                clicks_used=clicks_used,
+                arrow_delay_ms=arrow_delay_ms,
+            )
+            try:
+                new_total = cards.count() if cards is not None else total
+            except Exception:
+                new_total = total
+            if new_total <= total:
+                break
+            total = new_total
         if stop_event.is_set():
             break
         while pause_event.is_set() and not stop_event.is_set():
             time.sleep(0.1)
 
-        if is_captcha(page):
+        if captcha_probe.check(page):
             page = wait_captcha_resolved(
                 page,
                 log,
@@ -1049,60 +1238,24 @@ def parse_serp_cards(
                 break
 
         card = cards.nth(idx)
-        snapshot = _extract_card_snapshot(card)
-        name = snapshot.get("name", "") if isinstance(snapshot, dict) else ""
-        raw_link = snapshot.get("titleHref", "") if isinstance(snapshot, dict) else ""
-        link = _strip_profile_link(_normalize_href(raw_link)) if raw_link else ""
-
-        rating = ""
-        if isinstance(snapshot, dict):
-            label_content = snapshot.get("labelContent", "") or ""
-            rating_a11y = snapshot.get("ratingA11y", "") or ""
-        else:
-            label_content = ""
-            rating_a11y = ""
-        if label_content:
-            try:
-                rating = str(float(str(label_content).replace(",", ".")))
-            except Exception:
-                rating = str(label_content).replace(",", ".")
-        elif rating_a11y:
-            m = RATING_A11Y_RE.search(str(rating_a11y))
-            if m:
-                rating = m.group(1).replace(",", ".")
-
-        reviews = ""
-        if isinstance(snapshot, dict):
-            reviews_text = snapshot.get("reviewsText", "") or ""
-        else:
-            reviews_text = ""
-        if reviews_text:
-            m = INT_RE.search(str(reviews_text))
-            reviews = m.group(0) if m else ""
-
-        verified = False
-        if isinstance(snapshot, dict):
-            verified = bool(
-                snapshot.get("badgeBlue")
-                or snapshot.get("verifiedIcon")
-                or snapshot.get("verifiedA11y")
-            )
-
-        main_text = snapshot.get("mainText", "") if isinstance(snapshot, dict) else ""
-        main_href = snapshot.get("mainHref", "") if isinstance(snapshot, dict) else ""
-        website = _normalize_href(main_href) if main_href else ""
-
-        oid = _extract_oid_from_href(link) if link else ""
-        card_url = _build_profile_url(oid) if oid else ""
-
-        phones = ", ".join(extract_phones(main_text)) if main_text else ""
+        # No latency is recorded here: the snapshot is a DOM round-trip, not a page load,
+        # so in SERP the adaptive limiter reacts to captchas only.
+        fields = _snapshot_fields(_extract_card_snapshot(card))
+        name = fields["name"]
+        rating = fields["rating"]
+        reviews = fields["reviews"]
+        verified = fields["verified"]
+        website = fields["website"]
+        card_url = fields["card_url"]
+        phones = fields["phones"]
         if not phones:
-            phones = _click_show_phone(card, page, log)
+            phones = _click_show_phone(card, page, log, phone_delay_ms, stop_event, pause_event)
 
         profile_link = ""
-        need_popup = not phones or not card_url or not website
-        if need_popup:
-            popup_phone, popup_profile, popup_site = _extract_from_extra_popup(page, card, log)
+        if _needs_extra_popup(phones, card_url, website):
+            popup_phone, popup_profile, popup_site = _extract_from_extra_popup(
+                page, card, log, phone_delay_ms, stop_event, pause_event
+            )
             if not phones:
                 phones = popup_phone
             if not profile_link:
@@ -1117,36 +1270,39 @@ def parse_serp_cards(
         if not card_url:
             _logger.debug("SERP: card_url not found for card %s (%s)", idx + 1, name)
 
-        oid = _extract_oid_from_href(card_url) if card_url else ""
-        dedupe_key = oid or f"{name}|{reviews}"
+        dedupe_key = _serp_dedupe_key(card_url, name, reviews)
         if dedupe_key in seen_keys:
             _logger.debug("SERP: duplicate card skipped %s", dedupe_key)
             continue
         seen_keys.add(dedupe_key)
 
-        row = {
-            "name": name,
-            "rating": rating,
-            "reviews": reviews,
-            "good_place": "",
-            "telegram": "",
-            "vk": "",
-            "badge_blue": 1 if verified else 0,
-            "badge_green": "",
-            "phones": phones,
-            "website": website,
-            "url": card_url,
-        }
-        rows.append(row)
+        row = _build_serp_row(
+            name=name,
+            rating=rating,
+            reviews=reviews,
+            verified=verified,
+            phones=phones,
+            website=website,
+            card_url=card_url,
+        )
+        rows_count += 1
+        if keep_rows:
+            rows.append(row)
+        passed_count += _count_passing(row_filter, row)
 
         if row_cb:
             try:
                 row_cb(row, idx + 1, total)
             except Exception:
-                _logger.debug("SERP: row_cb failed", exc_info=True)
+                # A sink that cannot take rows would silently lose the rest of the query.
+                _logger.exception("SERP: не удалось записать карточку %s — останавливаю запрос", idx + 1)
+                raise
 
         if progress:
-            progress({"phase": "serp_parse", "index": idx + 1, "total": total, "rows": len(rows)})
+            payload = {"phase": "serp_parse", "index": idx + 1, "total": total, "rows": rows_count}
+            if rate_limiter is not None:
+                payload["rate"] = rate_limiter.metrics()
+            progress(payload)
 
         _logger.debug(
             "SERP: card %s/%s name=%s phone=%s site=%s url=%s",
@@ -1158,6 +1314,8 @@ def parse_serp_cards(
             "yes" if card_url else "no",
         )
 
+        if card_delay_ms > 0:
+            _wait_with_pause(stop_event, pause_event, card_delay_ms / 1000)
         maybe_human_delay(
             stop_event,
             pause_event,
@@ -1183,28 +1341,161 @@ def parse_serp_cards(
             )
             rate_limiter.wait_action(stop_event, pause_event)
 
+    if page is not None and rows_count:
+        archive_page("serp", page.content, url=page.url)
+    _logger.info("Проверки капчи: %s", captcha_probe.metrics())
     return rows
 
 
+def _row_to_organization(row: dict) -> Organization:
+    badge = "синяя" if row.get("badge_blue") else ""
+    return Organization(
+        name=row.get("name", ""),
+        phone=row.get("phones", ""),
+        verified=badge,
+        award=row.get("good_place", ""),
+        vk=row.get("vk", ""),
+        telegram=row.get("telegram", ""),
+        whatsapp="",
+        website=row.get("website", ""),
+        card_url=row.get("url", ""),
+        rating=row.get("rating", ""),
+        rating_count=row.get("reviews", ""),
+    )
+
+
+def _harvest_cookies(context) -> None:
+    # A session that got through (maybe after a captcha) lends its cookies to the HTTP engine.
+    from app.serp_http import harvest_cookies
+
+    try:
+        harvest_cookies(context.cookies())
+    except Exception:
+        _logger.debug("Failed to harvest cookies", exc_info=True)
+
+
+def potential_row_filter(settings: Settings) -> Callable[[Dict], bool]:
+    """Row filter that makes ``limit`` count rows passing the potential filters."""
+    return lambda row: passes_potential_filters(_row_to_organization(row), settings)
+
+
 def _rows_to_organizations(rows: Iterable[dict]) -> list[Organization]:
-    organizations: list[Organization] = []
-    for row in rows:
-        badge = "синяя" if row.get("badge_blue") else ""
-        org = Organization(
-            name=row.get("name", ""),
-            phone=row.get("phones", ""),
-            verified=badge,
-            award=row.get("good_place", ""),
-            vk=row.get("vk", ""),
-            telegram=row.get("telegram", ""),
-            whatsapp="",
-            website=row.get("website", ""),
-            card_url=row.get("url", ""),
-            rating=row.get("rating", ""),
-            rating_count=row.get("reviews", ""),
+    return [_row_to_organization(row) for row in rows]
+
+
+def _enrich_organizations(
+    context,
+    organizations: list[Organization],
+    *,
+    stop_event,
+    pause_event,
+    captcha_resume_event,
+    log: Callable[[str], None],
+    captcha_hook: Optional[CaptchaHook] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    progress: Optional[Callable[[dict], None]] = None,
+) -> Iterator[Organization]:
+    """Open the Maps card of every organization by oid and yield it merged with the card.
+
+    Yields exactly one Organization per input, in order: the SERP row as is
+    when its card cannot be opened. Returns early on stop.
+    """
+    page = context.new_page()
+    page.set_default_timeout(20000)
+    total = len(organizations)
+    log(f"гибрид: дополняю из Карт {total} организаций")
+    try:
+        for index, org in enumerate(organizations, start=1):
+            if stop_event.is_set():
+                return
+            while pause_event.is_set() and not stop_event.is_set():
+                time.sleep(0.1)
+            org_id = extract_org_id(org.card_url)
+            detail = None
+            try:
+                started = time.monotonic()
+                detail = YandexMapsScraper.fetch_card(
+                    page, org_id, stop_event=stop_event, pause_event=pause_event
+                )
+                if detail is None and is_captcha(page):
+                    resolved = wait_captcha_resolved(
+                        page,
+                        log,
+                        stop_event,
+                        captcha_resume_event,
+                        hook=captcha_hook,
+                        rate_limiter=rate_limiter,
+                    )
+                    if resolved is None:
+                        return
+                    page = resolved
+                    detail = YandexMapsScraper.fetch_card(
+                        page, org_id, stop_event=stop_event, pause_event=pause_event
+                    )
+                if rate_limiter is not None:
+                    rate_limiter.record_latency(time.monotonic() - started)
+            except Exception:
+                _logger.debug("гибрид: карточка не открылась (id=%s)", org_id, exc_info=True)
+            if detail is None:
+                _logger.info("гибрид: карточка не загрузилась (id=%s), оставляю данные поиска", org_id)
+                yield org
+            else:
+                yield merge_organizations(org, detail)
+            if progress:
+                progress({"phase": "maps_enrich", "index": index, "total": total})
+            if rate_limiter is not None:
+                rate_limiter.wait_action(stop_event, pause_event)
+    finally:
+        try:
+            page.close()
+        except Exception:
+            _logger.debug("Failed to close enrichment page", exc_info=True)
+
+
+def _run_fast_over_http(
+    *,
+    query: str,
+    output_path: Path,
+    lr: str,
+    settings: Settings,
+    limit: Optional[int],
+    stop_event,
+    pause_event,
+    log: Callable[[str], None],
+    progress: Optional[Callable[[dict], None]] = None,
+) -> Optional[int]:
+    """Fast mode without Chrome; None means this query needs the browser."""
+    from app.serp_http import NeedsBrowser, close_http_pool, fetch_serp_rows
+
+    def _passes(row: Dict) -> bool:
+        return passes_potential_filters(_row_to_organization(row), settings)
+
+    try:
+        rows = fetch_serp_rows(
+            query,
+            lr,
+            limit=limit,
+            row_filter=_passes,
+            stop_event=stop_event,
+            pause_event=pause_event,
         )
-        organizations.append(org)
-    return organizations
+    except NeedsBrowser as exc:
+        log(f"быстрый: без браузера не получилось ({exc}) — открываю Chrome")
+        return None
+    finally:
+        # A fast run fetches a single query, so its keep-alive connections are done here.
+        close_http_pool()
+    writer = ExcelWriter(output_path, flush_interval_s=settings.program.excel_save_interval_s)
+    try:
+        for index, row in enumerate(rows, start=1):
+            org = _row_to_organization(row)
+            writer.append(org, include_in_potential=passes_potential_filters(org, settings))
+            if progress:
+                progress({"phase": "serp_parse", "index": index, "total": len(rows), "rows": index})
+    finally:
+        writer.close()
+    log(f"быстрый: карточек {len(rows)} без браузера")
+    return len(rows)
 
 
 def run_fast_parser(
@@ -1223,10 +1514,41 @@ def run_fast_parser(
     progress: Optional[Callable[[dict], None]] = None,
     captcha_hook: Optional[CaptchaHook] = None,
     settings: Optional[Settings] = None,
+    limit: Optional[int] = None,
+    enrich_gaps: bool = False,
 ) -> int:
+    """Sweep the SERP carousel and write every card.
+
+    With ``enrich_gaps`` (hybrid mode) rows that pass the potential filters
+    and miss a Maps-only field (checkmark, award, social links) are held back
+    and completed from their Maps card after the sweep; everything else is written straight away. ``limit``
+    counts rows that still pass the filters after enrichment: when Maps data
+    makes held rows fail, the sweep continues from the next card for the
+    shortfall.
+    """
+    # Hybrid needs the browser for Maps cards anyway, so only plain fast mode goes over HTTP.
+    if settings and settings.program.serp_http and not enrich_gaps:
+        written = _run_fast_over_http(
+            query=query,
+            output_path=output_path,
+            lr=lr,
+            settings=settings,
+            limit=limit,
+            stop_event=stop_event,
+            pause_event=pause_event,
+            log=log,
+            progress=progress,
+        )
+        if written is not None:
+            return written
+
     url = build_serp_url(query, lr)
     log(f"быстрый: открываю поиск → {url}")
-    rate_limiter = RateLimiter(min_delay_s=delay_min_s, max_delay_s=delay_max_s)
+    rate_limiter = build_rate_limiter(
+        settings.program.adaptive_rate if settings else False,
+        min_delay_s=delay_min_s,
+        max_delay_s=delay_max_s,
+    )
 
     with sync_playwright() as p:
         headless = settings.program.headless if settings else False
@@ -1234,17 +1556,12 @@ def run_fast_parser(
             p,
             headless=headless,
             args=PLAYWRIGHT_LAUNCH_ARGS,
+            use_daemon=settings.program.warm_browser if settings else False,
         )
-        context = browser.new_context(
-            user_agent=PLAYWRIGHT_USER_AGENT,
-            viewport=PLAYWRIGHT_VIEWPORT,
-            is_mobile=False,
-            has_touch=False,
-            device_scale_factor=1,
-        )
-        _reset_browser_data(context)
+        context = new_isolated_context(browser)
         page = context.new_page()
         page.set_default_timeout(20000)
+        acquire_request(url, stop_event, pause_event)
         page.goto(url, wait_until="domcontentloaded")
 
         def _captcha_hook(stage: str, _page: Page) -> None:
@@ -1268,40 +1585,98 @@ def run_fast_parser(
             target_url=url,
             whitelist_event=captcha_whitelist_event,
         )
-        try:
-            rows = parse_serp_cards(
-                page,
-                max_clicks=max_clicks,
-                arrow_delay_ms=25,
-                card_delay_ms=10,
-                phone_delay_ms=12,
-                stop_event=stop_event,
-                pause_event=pause_event,
-                log=log,
-                captcha_resume_event=captcha_resume_event,
-                captcha_hook=_captcha_hook if settings else None,
-                captcha_action_poll=captcha_helper.poll if settings else None,
-                progress=progress,
-                delay_min_s=delay_min_s,
-                delay_max_s=delay_max_s,
-                rate_limiter=rate_limiter,
-            )
+        writer = ExcelWriter(
+            output_path,
+            flush_interval_s=settings.program.excel_save_interval_s if settings else 0.0,
+        )
+        written = 0
+
+        def _passes(row: Dict) -> bool:
+            return passes_potential_filters(_row_to_organization(row), settings) if settings else True
+
+        pending: list[Organization] = []
+        enriched = 0
+        last_index = 0
+
+        def _write_org(org: Organization) -> bool:
+            nonlocal written
+            include = passes_potential_filters(org, settings) if settings else True
+            writer.append(org, include_in_potential=include)
+            written += 1
+            return include
+
+        def _write_row(row: Dict, index: int, _total: int) -> None:
+            nonlocal last_index
+            last_index = index
+            org = _row_to_organization(row)
+            if enrich_gaps and _passes(row) and missing_fields(org) and extract_org_id(org.card_url):
+                pending.append(org)
+                return
+            _write_org(org)
 
-            organizations = _rows_to_organizations(rows)
-            writer = ExcelWriter(output_path)
-            try:
-                for org in organizations:
-                    if stop_event.is_set():
-                        break
-                    include = passes_potential_filters(org, settings) if settings else True
-                    writer.append(org, include_in_potential=include)
-            finally:
-                writer.close()
+        try:
+            remaining = limit
+            while True:
+                pending.clear()
+                enriched = 0
+                start_index = last_index
+                parse_serp_cards(
+                    page,
+                    max_clicks=max_clicks,
+                    arrow_delay_ms=200,
+                    card_delay_ms=0,
+                    phone_delay_ms=200,
+                    stop_event=stop_event,
+                    pause_event=pause_event,
+                    log=log,
+                    captcha_resume_event=captcha_resume_event,
+                    captcha_hook=_captcha_hook if settings else None,
+                    captcha_action_poll=captcha_helper.poll if settings else None,
+                    progress=progress,
+                    delay_min_s=delay_min_s,
+                    delay_max_s=delay_max_s,
+                    row_cb=_write_row,
+                    rate_limiter=rate_limiter,
+                    keep_rows=False,
+                    limit=remaining,
+                    # --limit counts rows that make it to POTENTIAL.
+                    row_filter=_passes,
+                    start_index=start_index,
+                )
+                if not pending or stop_event.is_set():
+                    break
+                dropped = 0
+                for org in _enrich_organizations(
+                    context,
+                    pending,
+                    stop_event=stop_event,
+                    pause_event=pause_event,
+                    captcha_resume_event=captcha_resume_event,
+                    log=log,
+                    captcha_hook=_captcha_hook if settings else None,
+                    rate_limiter=rate_limiter,
+                    progress=progress,
+                ):
+                    enriched += 1
+                    if not _write_org(org):
+                        dropped += 1
+                # Maps data made some held rows fail the filters: sweep on for the shortfall.
+                if not (limit and dropped) or stop_event.is_set() or last_index == start_index:
+                    break
+                log(f"гибрид: после Карт не прошли фильтры {dropped}, ищу замену")
+                remaining = dropped
         finally:
+            # Rows left over after a stop or an error keep their SERP data.
+            for org in pending[enriched:]:
+                _write_org(org)
+            writer.close()
+            if settings and settings.program.serp_http:
+                _harvest_cookies(context)
+            _logger.info("Селекторы: %s", get_selector_registry().metrics())
             try:
                 captcha_helper.close()
             except Exception:
                 _logger.debug("Failed to close captcha helper", exc_info=True)
             context.close()
             browser.close()
-    return len(organizations)
+    return written
@@ -1,7 +1,14 @@
 from __future__ import annotations
 
-from typing import Any
+import asyncio
+import json
+import logging
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
 
+
+LOGGER = logging.getLogger(__name__)
 
 CHROME_DOWNLOAD_URL = "https://chrome.browserapp.ru/"
 
@@ -15,6 +22,63 @@ PLAYWRIGHT_LAUNCH_ARGS = [
     "--window-size=1700,900",
     "--disable-blink-features=AutomationControlled",
 ]
+PLAYWRIGHT_CONTEXT_OPTIONS = {
+    "user_agent": PLAYWRIGHT_USER_AGENT,
+    "viewport": PLAYWRIGHT_VIEWPORT,
+    "is_mobile": False,
+    "has_touch": False,
+    "device_scale_factor": 1,
+}
+RESET_STORAGE_SCRIPT = """
+(() => {
+  try { localStorage.clear(); } catch (e) {}
+  try { sessionStorage.clear(); } catch (e) {}
+  try {
+    if (window.caches && caches.keys) {
+      caches.keys().then(keys => keys.forEach(key => caches.delete(key)));
+    }
+  } catch (e) {}
+  try {
+    if (window.indexedDB && indexedDB.databases) {
+      indexedDB.databases().then(dbs => {
+        dbs.forEach(db => {
+          if (db && db.name) {
+            indexedDB.deleteDatabase(db.name);
+          }
+        });
+      });
+    }
+  } catch (e) {}
+})();
+"""
+HEAP_USAGE_JS = "() => (performance.memory ? performance.memory.usedJSHeapSize : 0)"
+# Written by app.browser_daemon while a warm Chrome is listening for CDP clients.
+DAEMON_STATE_PATH = Path(tempfile.gettempdir()) / "parser_serm" / "browser_daemon.json"
+
+
+def read_daemon_state() -> Optional[dict]:
+    try:
+        state = json.loads(DAEMON_STATE_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return state if isinstance(state, dict) and state.get("endpoint") else None
+
+
+def daemon_endpoint(*, headless: bool) -> Optional[str]:
+    """Return the CDP endpoint of a live warm browser with the same headless mode."""
+    state = read_daemon_state()
+    if state is None or bool(state.get("headless")) != bool(headless):
+        return None
+    endpoint = str(state["endpoint"])
+    try:
+        import urllib.request
+
+        with urllib.request.urlopen(f"{endpoint}/json/version", timeout=0.5) as response:
+            if response.status != 200:
+                return None
+    except Exception:
+        return None
+    return endpoint
 
 
 def is_chrome_missing_error(exc: BaseException) -> bool:
@@ -36,7 +100,16 @@ def chrome_not_found_message() -> str:
     return f"Chrome не найден. Скачайте и установите браузер: {CHROME_DOWNLOAD_URL}"
 
 
-def launch_chrome(playwright: Any, *, headless: bool, args: list[str]) -> Any:
+def launch_chrome(playwright: Any, *, headless: bool, args: list[str], use_daemon: bool = False) -> Any:
+    # With use_daemon (callers pass program.warm_browser) a warm daemon browser is reused
+    # over CDP; callers still get fresh contexts and browser.close() only disconnects,
+    # so the daemon keeps running for the next run.
+    endpoint = daemon_endpoint(headless=headless) if use_daemon else None
+    if endpoint:
+        try:
+            return playwright.chromium.connect_over_cdp(endpoint)
+        except Exception:
+            LOGGER.debug("Не удалось подключиться к прогретому браузеру %s", endpoint, exc_info=True)
     try:
         return playwright.chromium.launch(
             headless=headless,
@@ -48,3 +121,130 @@ def launch_chrome(playwright: Any, *, headless: bool, args: list[str]) -> Any:
             raise RuntimeError(chrome_not_found_message()) from exc
         raise
 
+
+async def launch_chrome_async(
+    playwright: Any,
+    *,
+    headless: bool,
+    args: list[str],
+    use_daemon: bool = False,
+) -> Any:
+    endpoint = daemon_endpoint(headless=headless) if use_daemon else None
+    if endpoint:
+        try:
+            return await playwright.chromium.connect_over_cdp(endpoint)
+        except Exception:
+            LOGGER.debug("Не удалось подключиться к прогретому браузеру %s", endpoint, exc_info=True)
+    try:
+        return await playwright.chromium.launch(
+            headless=headless,
+            args=args,
+            channel="chrome",
+        )
+    except Exception as exc:
+        if is_chrome_missing_error(exc):
+            raise RuntimeError(chrome_not_found_message()) from exc
+        raise
+
+
+def reset_browser_data(context) -> None:
+    LOGGER.info("Очищаю cookies, разрешения и хранилище для новой сессии")
+    try:
+        context.clear_cookies()
+    except Exception:
+        LOGGER.warning("Failed to clear cookies")
+    try:
+        context.clear_permissions()
+    except Exception:
+        LOGGER.warning("Failed to clear permissions")
+    context.add_init_script(RESET_STORAGE_SCRIPT)
+
+
+def new_isolated_context(browser: Any, **overrides: Any) -> Any:
+    context = browser.new_context(**{**PLAYWRIGHT_CONTEXT_OPTIONS, **overrides})
+    reset_browser_data(context)
+    return context
+
+
+class AsyncContextPool:
+    """Pre-warmed isolated contexts for the async engine.
+
+    A released context is reset cheaply (pages closed, cookies and permissions
+    cleared; page storage is wiped by ``RESET_STORAGE_SCRIPT`` on every load)
+    and handed to the next flow. It is closed and replaced after ``max_pages``
+    uses or once its JS heap grows past ``max_heap_mb``.
+    """
+
+    def __init__(
+        self,
+        browser: Any,
+        *,
+        size: int,
+        max_pages: int = 50,
+        max_heap_mb: float = 512.0,
+        options: Optional[dict] = None,
+    ) -> None:
+        self.browser = browser
+        self.size = max(1, int(size))
+        self.max_pages = max(1, int(max_pages))
+        self.max_heap_mb = max_heap_mb
+        self.options = {**PLAYWRIGHT_CONTEXT_OPTIONS, **(options or {})}
+        self._idle: list[Any] = []
+        self._uses: dict[int, int] = {}
+        self.created = 0
+        self.recycled = 0
+
+    async def _create(self) -> Any:
+        context = await self.browser.new_context(**self.options)
+        await context.add_init_script(RESET_STORAGE_SCRIPT)
+        self._uses[id(context)] = 0
+        self.created += 1
+        return context
+
+    async def start(self) -> None:
+        contexts = await asyncio.gather(*(self._create() for _ in range(self.size - len(self._idle))))
+        self._idle.extend(contexts)
+
+    async def acquire(self) -> Any:
+        context = self._idle.pop() if self._idle else await self._create()
+        self._uses[id(context)] = self._uses.get(id(context), 0) + 1
+        return context
+
+    async def _heap_mb(self, context) -> float:
+        for page in list(context.pages):
+            try:
+                return float(await page.evaluate(HEAP_USAGE_JS) or 0) / (1024 * 1024)
+            except Exception:
+                continue
+        return 0.0
+
+    async def _discard(self, context) -> None:
+        self._uses.pop(id(context), None)
+        try:
+            await context.close()
+        except Exception:
+            LOGGER.debug("Failed to close browser context", exc_info=True)
+
+    async def release(self, context) -> None:
+        heap_mb = await self._heap_mb(context)
+        worn_out = self._uses.get(id(context), 0) >= self.max_pages
+        if worn_out or (self.max_heap_mb and heap_mb > self.max_heap_mb) or len(self._idle) >= self.size:
+            self.recycled += 1
+            await self._discard(context)
+            return
+        try:
+            for page in list(context.pages):
+                await page.close()
+            await context.clear_cookies()
+            await context.clear_permissions()
+        except Exception:
+            LOGGER.debug("Context reset failed, recycling it", exc_info=True)
+            self.recycled += 1
+            await self._discard(context)
+            return
+        self._idle.append(context)
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for context in idle:
+            await self._discard(context)
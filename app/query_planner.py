@@ -0,0 +1,214 @@
+"""Expand one ``niche в city`` query into synonym and district variants.
+
+Variants run in waves of ``concurrency`` pages and share one dedupe index, so
+each wave reports how many organizations it found that no earlier variant
+had. Remaining variants are re-ranked by the new-org rate their kind has
+shown so far, and the plan stops once waves stop bringing new organizations.
+
+The dictionary ships with common niches and big-city districts and can be
+extended with ``config/query_expansion.json``::
+
+    {"synonyms": [["стоматология", "зубной врач"]], "districts": {"москв": ["Хамовники"]}}
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from app.settings_store import CONFIG_DIR
+from app.tiling import city_stem
+from app.utils import split_query
+
+
+LOGGER = logging.getLogger(__name__)
+
+QUERY_EXPANSION_PATH = CONFIG_DIR / "query_expansion.json"
+
+# Expected share of new organizations before anything is observed.
+KIND_PRIORS = {"base": 1.0, "synonym": 0.5, "district": 0.3}
+# How many observed organizations the prior is worth when blending with this run's rates.
+PRIOR_WEIGHT = 50.0
+
+DEFAULT_SYNONYMS: list[list[str]] = [
+    ["стоматология", "стоматологическая клиника", "стоматолог", "зубной врач"],
+    ["автосервис", "автомастерская", "ремонт автомобилей", "сто"],
+    ["автомойка", "мойка самообслуживания", "детейлинг"],
+    ["салон красоты", "студия красоты", "парикмахерская", "барбершоп"],
+    ["фитнес", "фитнес-клуб", "тренажерный зал", "спортзал"],
+    ["кафе", "кофейня", "ресторан", "столовая"],
+    ["юрист", "юридические услуги", "юридическая консультация", "адвокат"],
+    ["клининг", "клининговая компания", "уборка квартир"],
+    ["детский сад", "частный детский сад", "детский центр"],
+    ["ветклиника", "ветеринарная клиника", "ветеринар"],
+    ["медицинский центр", "клиника", "поликлиника"],
+]
+
+DEFAULT_DISTRICTS: dict[str, list[str]] = {
+    "москв": [
+        "Тверской", "Арбат", "Хамовники", "Пресненский", "Басманный", "Замоскворечье",
+        "Таганский", "Сокольники", "Измайлово", "Люблино", "Марьино", "Бутово",
+        "Строгино", "Митино", "Тушино", "Медведково",
+    ],
+    "санкт-петербург": [
+        "Центральный район", "Адмиралтейский район", "Василеостровский район",
+        "Петроградский район", "Московский район", "Невский район", "Фрунзенский район",
+        "Приморский район", "Выборгский район", "Калининский район", "Кировский район",
+        "Красногвардейский район", "Красносельский район",
+    ],
+    "новосибирск": [
+        "Центральный район", "Железнодорожный район", "Заельцовский район",
+        "Дзержинский район", "Калининский район", "Кировский район", "Ленинский район",
+        "Октябрьский район", "Первомайский район", "Советский район",
+    ],
+    "екатеринбург": [
+        "Верх-Исетский район", "Железнодорожный район", "Кировский район",
+        "Ленинский район", "Октябрьский район", "Орджоникидзевский район",
+        "Чкаловский район", "Академический район",
+    ],
+    "казан": [
+        "Вахитовский район", "Авиастроительный район", "Кировский район",
+        "Московский район", "Ново-Савиновский район", "Приволжский район",
+        "Советский район",
+    ],
+}
+DEFAULT_DISTRICTS["петербург"] = DEFAULT_DISTRICTS["спб"] = DEFAULT_DISTRICTS["санкт-петербург"]
+
+
+def _normalize(value: str) -> str:
+    return " ".join((value or "").lower().replace("ё", "е").split())
+
+
+@dataclass
+class ExpansionDictionary:
+    synonyms: list[list[str]] = field(default_factory=lambda: [list(group) for group in DEFAULT_SYNONYMS])
+    districts: dict[str, list[str]] = field(default_factory=lambda: dict(DEFAULT_DISTRICTS))
+
+    @classmethod
+    def load(cls, path: Optional[Path] = QUERY_EXPANSION_PATH) -> "ExpansionDictionary":
+        """Built-in dictionary plus the user's additions from ``path`` if it exists."""
+        dictionary = cls()
+        if path is None or not path.exists():
+            return dictionary
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except Exception:
+            LOGGER.warning("Не удалось прочитать словарь расширения запросов %s", path, exc_info=True)
+            return dictionary
+        if not isinstance(data, dict):
+            return dictionary
+        for group in data.get("synonyms") or []:
+            if isinstance(group, list):
+                dictionary.synonyms.append([str(term) for term in group if str(term).strip()])
+        for stem, names in (data.get("districts") or {}).items():
+            if isinstance(names, list):
+                dictionary.districts[_normalize(stem)] = [str(name) for name in names if str(name).strip()]
+        return dictionary
+
+    def synonyms_for(self, niche: str) -> list[str]:
+        cleaned = _normalize(niche)
+        result: list[str] = []
+        for group in self.synonyms:
+            if cleaned in (_normalize(term) for term in group):
+                result.extend(term for term in group if _normalize(term) != cleaned)
+        return list(dict.fromkeys(result))
+
+    def districts_for(self, city: str) -> list[str]:
+        stem = city_stem(city, self.districts)
+        return list(self.districts[stem]) if stem else []
+
+
+@dataclass
+class Variant:
+    query: str
+    kind: str
+    found: int = 0
+    new: int = 0
+
+
+def expand_query(query: str, dictionary: ExpansionDictionary) -> list[Variant]:
+    niche, city = split_query(query)
+    variants = [Variant(query, "base")]
+    for synonym in dictionary.synonyms_for(niche):
+        variants.append(Variant(f"{synonym} в {city}" if city else synonym, "synonym"))
+    if city:
+        for district in dictionary.districts_for(city):
+            variants.append(Variant(f"{niche} в {city}, {district}", "district"))
+    unique: dict[str, Variant] = {}
+    for variant in variants:
+        unique.setdefault(_normalize(variant.query), variant)
+    return list(unique.values())
+
+
+class QueryPlanner:
+    """Hands out query variants wave by wave, best expected yield first."""
+
+    def __init__(
+        self,
+        query: str,
+        *,
+        dictionary: Optional[ExpansionDictionary] = None,
+        index: Optional[set[str]] = None,
+        min_new_rate: float = 0.1,
+        patience: int = 2,
+    ) -> None:
+        self.query = query
+        self.index = index if index is not None else set()
+        self.min_new_rate = min_new_rate
+        self.patience = max(1, patience)
+        self.pending = expand_query(query, dictionary or ExpansionDictionary.load())
+        self.finished: list[Variant] = []
+        self.stopped_early = False
+        self._wave: list[Variant] = []
+        self._kind_stats: dict[str, list[int]] = {}
+        self._low_waves = 0
+
+    @property
+    def done(self) -> bool:
+        return self.stopped_early or not self.pending
+
+    def expected_rate(self, variant: Variant) -> float:
+        found, new = self._kind_stats.get(variant.kind, (0, 0))
+        prior = KIND_PRIORS.get(variant.kind, 0.1)
+        return (new + prior * PRIOR_WEIGHT) / (found + PRIOR_WEIGHT)
+
+    def next_wave(self, size: int) -> list[str]:
+        if self.done:
+            return []
+        # Stable sort keeps dictionary order among equally promising variants.
+        self.pending.sort(key=self.expected_rate, reverse=True)
+        self._wave = self.pending[: max(1, size)]
+        del self.pending[: len(self._wave)]
+        return [variant.query for variant in self._wave]
+
+    def record(self, results: dict[str, set[str]]) -> int:
+        """Attribute org keys of the last wave to its variants; returns how many were new."""
+        wave_found = wave_new = 0
+        for variant in self._wave:
+            keys = results.get(variant.query) or set()
+            variant.found = len(keys)
+            variant.new = len(keys - self.index)
+            self.index.update(keys)
+            stats = self._kind_stats.setdefault(variant.kind, [0, 0])
+            stats[0] += variant.found
+            stats[1] += variant.new
+            wave_found += variant.found
+            wave_new += variant.new
+            self.finished.append(variant)
+            LOGGER.info("Вариант «%s»: найдено %s, новых %s", variant.query, variant.found, variant.new)
+        self._wave = []
+        rate = wave_new / wave_found if wave_found else 0.0
+        self._low_waves = self._low_waves + 1 if rate < self.min_new_rate else 0
+        if self._low_waves >= self.patience and self.pending:
+            self.stopped_early = True
+            LOGGER.info(
+                "«%s»: новых организаций меньше %.0f%% уже %s волны подряд — пропускаю ещё %s вариантов",
+                self.query,
+                self.min_new_rate * 100,
+                self._low_waves,
+                len(self.pending),
+            )
+        return wave_new
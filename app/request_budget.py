@@ -0,0 +1,256 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+from urllib.parse import urlparse
+
+from app.settings_model import RateLimitSettings
+
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_STATE_PATH = Path(tempfile.gettempdir()) / "parser_serm" / "request_budget.json"
+DEFAULT_HOST = "*"
+# Debt older runs left in the shared state file is forgiven beyond this many seconds of waiting.
+MAX_CARRIED_DEBT_S = 60.0
+
+
+@dataclass(frozen=True)
+class HostRate:
+    per_min: float
+    burst: float
+
+    @property
+    def per_s(self) -> float:
+        return max(1e-6, self.per_min / 60.0)
+
+
+def _reserve(tokens: float, updated: float, now: float, rate: HostRate) -> tuple[float, float]:
+    # Virtual scheduling: the bucket may go negative, each caller waits for its own slot.
+    tokens = min(rate.burst, tokens + (now - updated) * rate.per_s) - 1.0
+    wait_s = -tokens / rate.per_s if tokens < 0 else 0.0
+    return tokens, wait_s
+
+
+class TokenBucket:
+    """Thread-safe token bucket for one host inside a single process."""
+
+    def __init__(self, rate: HostRate) -> None:
+        self.rate = rate
+        self._tokens = float(rate.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens, wait_s = _reserve(self._tokens, self._updated, now, self.rate)
+            self._updated = now
+            return wait_s
+
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as handle:
+        if os.name == "nt":
+            import msvcrt
+
+            while True:
+                try:
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.01)
+            try:
+                yield
+            finally:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+class FileTokenBucket:
+    """Token bucket whose state lives in a JSON file guarded by a file lock.
+
+    Every local process pointing at the same state file draws from the same
+    budget. Wall-clock time is used so that timestamps agree across processes.
+    """
+
+    def __init__(self, host: str, rate: HostRate, state_path: Path) -> None:
+        self.host = host
+        self.rate = rate
+        self.state_path = state_path
+        self.lock_path = state_path.with_suffix(state_path.suffix + ".lock")
+        self._thread_lock = threading.Lock()
+
+    def _load(self) -> dict:
+        try:
+            data = json.loads(self.state_path.read_text(encoding="utf-8"))
+            return data if isinstance(data, dict) else {}
+        except Exception:
+            return {}
+
+    def reserve(self) -> float:
+        with self._thread_lock, _file_lock(self.lock_path):
+            state = self._load()
+            entry = state.get(self.host) or {}
+            now = time.time()
+            tokens = float(entry.get("tokens", self.rate.burst))
+            # Reservations of stopped runs stay in the file; do not make a new run wait them out.
+            tokens = max(tokens, -MAX_CARRIED_DEBT_S * self.rate.per_s)
+            updated = min(now, float(entry.get("updated", now)))
+            tokens, wait_s = _reserve(tokens, updated, now, self.rate)
+            state[self.host] = {"tokens": tokens, "updated": now}
+            tmp_path = self.state_path.with_suffix(self.state_path.suffix + ".tmp")
+            tmp_path.write_text(json.dumps(state), encoding="utf-8")
+            os.replace(tmp_path, self.state_path)
+            return wait_s
+
+
+def host_of(url_or_host: str) -> str:
+    value = (url_or_host or "").strip().lower()
+    if "://" in value:
+        value = urlparse(value).hostname or ""
+    return value.split(":", 1)[0].lstrip(".")
+
+
+class RequestBudget:
+    """Per-host request budget that every scraper draws from before navigation and clicks."""
+
+    def __init__(
+        self,
+        *,
+        default: HostRate,
+        hosts: Optional[dict[str, HostRate]] = None,
+        state_path: Optional[Path] = None,
+    ) -> None:
+        self.default = default
+        self.hosts = {host_of(host): rate for host, rate in (hosts or {}).items() if host_of(host)}
+        self.state_path = state_path
+        self._buckets: dict[str, object] = {}
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited_s = 0.0
+
+    def _match(self, host: str) -> tuple[str, HostRate]:
+        # Longest configured suffix wins: "search.yandex.ru" falls back to "yandex.ru".
+        for pattern in sorted(self.hosts, key=len, reverse=True):
+            if host == pattern or host.endswith("." + pattern):
+                return pattern, self.hosts[pattern]
+        return DEFAULT_HOST, self.default
+
+    def _bucket(self, url_or_host: str):
+        key, rate = self._match(host_of(url_or_host))
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if self.state_path is not None:
+                    bucket = FileTokenBucket(key, rate, self.state_path)
+                else:
+                    bucket = TokenBucket(rate)
+                self._buckets[key] = bucket
+            return bucket
+
+    def reserve(self, url_or_host: str) -> float:
+        try:
+            wait_s = self._bucket(url_or_host).reserve()
+        except Exception:
+            LOGGER.debug("Не удалось взять токен из общего лимита", exc_info=True)
+            return 0.0
+        with self._lock:
+            self.acquired += 1
+            self.waited_s += wait_s
+        return wait_s
+
+    def acquire(self, url_or_host: str, stop_event=None, pause_event=None) -> float:
+        wait_s = self.reserve(url_or_host)
+        if wait_s > 0:
+            from app.utils import _wait_with_pause
+
+            _wait_with_pause(stop_event or threading.Event(), pause_event, wait_s)
+        return wait_s
+
+    async def acquire_async(self, url_or_host: str, stop_event=None, pause_event=None) -> float:
+        wait_s = self.reserve(url_or_host)
+        end_time = time.monotonic() + wait_s
+        while time.monotonic() < end_time:
+            if stop_event is not None and stop_event.is_set():
+                break
+            if pause_event is not None and pause_event.is_set():
+                await asyncio.sleep(0.1)
+                end_time += 0.1
+                continue
+            await asyncio.sleep(min(0.05, max(0.0, end_time - time.monotonic())))
+        return wait_s
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {"acquired": self.acquired, "waited_s": round(self.waited_s, 2)}
+
+    @classmethod
+    def from_settings(cls, settings: RateLimitSettings) -> "RequestBudget":
+        hosts = {
+            host: HostRate(
+                per_min=float(rate.get("per_min", settings.per_min)),
+                burst=float(rate.get("burst", settings.burst)),
+            )
+            for host, rate in settings.hosts.items()
+            if isinstance(rate, dict)
+        }
+        state_path = None
+        if settings.shared_between_processes:
+            state_path = Path(settings.state_path) if settings.state_path else DEFAULT_STATE_PATH
+        return cls(
+            default=HostRate(per_min=settings.per_min, burst=settings.burst),
+            hosts=hosts,
+            state_path=state_path,
+        )
+
+
+_budget: Optional[RequestBudget] = None
+
+
+def configure_request_budget(settings: Optional[RateLimitSettings]) -> Optional[RequestBudget]:
+    """Install the process-wide budget; a disabled or missing config turns it off."""
+    global _budget
+    if settings is None or not settings.enabled:
+        _budget = None
+    else:
+        _budget = RequestBudget.from_settings(settings)
+    return _budget
+
+
+def get_request_budget() -> Optional[RequestBudget]:
+    return _budget
+
+
+def acquire_request(url_or_host: str, stop_event=None, pause_event=None) -> float:
+    budget = _budget
+    if budget is None:
+        return 0.0
+    return budget.acquire(url_or_host, stop_event, pause_event)
+
+
+async def acquire_request_async(url_or_host: str, stop_event=None, pause_event=None) -> float:
+    budget = _budget
+    if budget is None:
+        return 0.0
+    return await budget.acquire_async(url_or_host, stop_event, pause_event)
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import logging
+import threading
+from pathlib import Path
+from typing import Iterable, Optional
+
+from app.settings_store import CONFIG_DIR
+
+
+LOGGER = logging.getLogger(__name__)
+
+REVIEW_INDEX_PATH = CONFIG_DIR / "reviews_seen.txt"
+
+
+class ReviewIndex:
+    """Persistent set of review keys (see ``app.utils.review_key``).
+
+    Keys are appended one per line, so an interrupted write loses at most the
+    last batch and the file can be merged with ``cat`` from several machines.
+    """
+
+    def __init__(self, path: Optional[Path] = REVIEW_INDEX_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._keys: set[str] = self._load()
+
+    def _load(self) -> set[str]:
+        if self.path is None:
+            return set()
+        try:
+            with open(self.path, "r", encoding="utf-8") as handle:
+                return {line.rstrip("\n") for line in handle if line.strip()}
+        except FileNotFoundError:
+            return set()
+        except Exception:
+            LOGGER.debug("Не удалось прочитать индекс отзывов", exc_info=True)
+            return set()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add_many(self, keys: Iterable[str]) -> int:
+        with self._lock:
+            new_keys = [key for key in dict.fromkeys(keys) if key and key not in self._keys]
+            if not new_keys:
+                return 0
+            self._keys.update(new_keys)
+            if self.path is not None:
+                try:
+                    self.path.parent.mkdir(parents=True, exist_ok=True)
+                    with open(self.path, "a", encoding="utf-8") as handle:
+                        handle.write("".join(f"{key}\n" for key in new_keys))
+                except Exception:
+                    LOGGER.warning("Не удалось сохранить индекс отзывов", exc_info=True)
+            return len(new_keys)
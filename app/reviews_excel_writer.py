@@ -1,13 +1,17 @@
 from __future__ import annotations
 
 import logging
+import threading
 from dataclasses import asdict
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Optional
 
 from openpyxl import Workbook
 
+from app.autosave import AutosavePolicy, BackgroundAutosave, save_workbook_atomic
+from app.review_index import ReviewIndex
 from app.reviews_parser import Review
+from app.utils import review_key
 
 
 LOGGER = logging.getLogger(__name__)
@@ -24,28 +28,50 @@ class ReviewsExcelWriter:
         "ВСЯ ИНФА",
     ]
 
-    def __init__(self, path: Path, flush_every: int = 10) -> None:
+    rating_titles = {
+        1: "1 звезда",
+        2: "2 звезды",
+        3: "3 звезды",
+        4: "4 звезды",
+        5: "5 звёзд",
+    }
+
+    def __init__(
+        self,
+        path: Path,
+        flush_every: int = 10,
+        flush_interval_s: float = 0.0,
+        index: Optional[ReviewIndex] = None,
+    ) -> None:
         self.path = path
         self.flush_every = flush_every
-        self.workbook = Workbook()
-        self.full_sheet = self.workbook.active
-        self.full_sheet.title = "FULL"
-        self.full_sheet.append(self.headers)
-        rating_titles = {
-            1: "1 звезда",
-            2: "2 звезды",
-            3: "3 звезды",
-            4: "4 звезды",
-            5: "5 звёзд",
-        }
-        self.rating_sheets = {
-            rating: self.workbook.create_sheet(title)
-            for rating, title in rating_titles.items()
+        self.flush_interval_s = flush_interval_s
+        # Reviews already saved by earlier runs; keys reach it only after the xlsx is written.
+        self.index = index
+        self._keys: set[str] = set()
+        # Keys of rows already in the workbook but not yet in a successfully saved file.
+        self._unindexed: list[str] = []
+        self.skipped = 0
+        # (values, profile url, rating sheet, key) not in the workbook yet; only the autosave
+        # thread (and close(), once it has stopped) moves them in and saves the workbook.
+        self._pending: list[tuple[list, str, Optional[int], str]] = []
+        self._pending_lock = threading.Lock()
+        self._appended = 0
+        self._written = 0
+        self._workbook = Workbook()
+        self._full_sheet = self._workbook.active
+        self._full_sheet.title = "FULL"
+        self._full_sheet.append(self.headers)
+        self._rating_sheets = {
+            rating: self._workbook.create_sheet(title) for rating, title in self.rating_titles.items()
         }
-        for sheet in self.rating_sheets.values():
+        for sheet in self._rating_sheets.values():
             sheet.append(self.headers)
-        self._counter = 0
-        self.flush()
+        # Next free row per sheet, so appends never scan ``max_row``.
+        self._next_row = {sheet.title: 2 for sheet in self._workbook.worksheets}
+        self._policy = AutosavePolicy(flush_every, flush_interval_s)
+        self._autosave = BackgroundAutosave(self._save_snapshot, name="reviews-autosave")
+        self._save_snapshot(0)
 
     def _full_info(self, data: dict) -> str:
         parts = [
@@ -57,39 +83,73 @@ class ReviewsExcelWriter:
         ]
         return " - ".join(str(part or "") for part in parts)
 
-    def _append_row(self, sheet, data: dict) -> None:
-        row = sheet.max_row + 1
-        name_cell = sheet.cell(row=row, column=1, value=data.get("user_name", ""))
-        profile_url = data.get("user_profile_url", "")
-        if profile_url:
-            name_cell.hyperlink = profile_url
-            name_cell.style = "Hyperlink"
-        sheet.cell(row=row, column=2, value=data.get("rating", ""))
-        sheet.cell(row=row, column=3, value=data.get("review_date", ""))
-        sheet.cell(row=row, column=4, value=data.get("review_text", ""))
-        sheet.cell(row=row, column=5, value=data.get("response_date", ""))
-        sheet.cell(row=row, column=6, value=data.get("response_text", ""))
-        sheet.cell(row=row, column=7, value=self._full_info(data))
-
-    def append(self, review: Review) -> None:
+    def _emit_row(self, sheet, values: list, profile_url: str) -> None:
+        row = self._next_row[sheet.title]
+        self._next_row[sheet.title] = row + 1
+        sheet.append(values)
+        if not profile_url:
+            return
+        name_cell = sheet.cell(row=row, column=1)
+        name_cell.hyperlink = profile_url
+        name_cell.style = "Hyperlink"
+
+    def _save_snapshot(self, count: int) -> None:
+        """Move the reviews appended before ``count`` into the workbook and save it."""
+        with self._pending_lock:
+            rows = self._pending[: count - self._written]
+            del self._pending[: len(rows)]
+        self._written += len(rows)
+        for values, profile_url, rating, key in rows:
+            self._emit_row(self._full_sheet, values, profile_url)
+            if rating is not None:
+                self._emit_row(self._rating_sheets[rating], values, profile_url)
+            self._unindexed.append(key)
+        save_workbook_atomic(self._workbook, self.path)
+        LOGGER.info("Сохранил файл: %s", self.path)
+        if self.index is not None and self._unindexed:
+            self.index.add_many(self._unindexed)
+        self._unindexed = []
+
+    def append(self, review: Review) -> bool:
+        """Queue a review for the workbook; returns False for a duplicate."""
+        key = review_key(review)
+        if key in self._keys or (self.index is not None and key in self.index):
+            self.skipped += 1
+            return False
+        self._keys.add(key)
         data = asdict(review)
-        self._append_row(self.full_sheet, data)
+        values = [
+            data.get("user_name", ""),
+            data.get("rating", ""),
+            data.get("review_date", ""),
+            data.get("review_text", ""),
+            data.get("response_date", ""),
+            data.get("response_text", ""),
+            self._full_info(data),
+        ]
         rating = data.get("rating", 0)
-        if isinstance(rating, int) and rating in self.rating_sheets:
-            self._append_row(self.rating_sheets[rating], data)
-        self._counter += 1
-        if self._counter % self.flush_every == 0:
+        rating_sheet = rating if isinstance(rating, int) and rating in self.rating_titles else None
+        with self._pending_lock:
+            self._pending.append((values, data.get("user_profile_url", "") or "", rating_sheet, key))
+            self._appended += 1
+        if self._policy.due():
             self.flush()
+        return True
 
     def append_many(self, reviews: Iterable[Review]) -> None:
         for review in reviews:
             self.append(review)
 
     def flush(self) -> None:
-        self.path.parent.mkdir(parents=True, exist_ok=True)
-        self.workbook.save(self.path)
-        LOGGER.info("Сохранил файл: %s", self.path)
+        """Queue a snapshot of everything appended so far; returns without waiting."""
+        self._autosave.request(self._appended)
 
     def close(self) -> None:
-        self.flush()
-        self.workbook.close()
+        self._autosave.close()
+        try:
+            self._save_snapshot(self._appended)
+        finally:
+            self._workbook.close()
+        LOGGER.debug("Автосохранение отзывов: %s", self._autosave.metrics())
+        if self.skipped:
+            LOGGER.info("Пропущено повторов отзывов: %s", self.skipped)
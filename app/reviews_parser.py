@@ -11,20 +11,72 @@ from typing import Callable, Generator, Optional
 from playwright.sync_api import Page, TimeoutError as PlaywrightTimeoutError
 from playwright.sync_api import sync_playwright
 
-from app.captcha_utils import CaptchaFlowHelper, is_captcha, wait_captcha_resolved, CaptchaHook
+from app.captcha_utils import CaptchaFlowHelper, CaptchaProbe, wait_captcha_resolved, CaptchaHook
+from app.page_archive import archive_page
+from app.request_budget import acquire_request
 from app.playwright_utils import (
     PLAYWRIGHT_LAUNCH_ARGS,
     PLAYWRIGHT_USER_AGENT,
     PLAYWRIGHT_VIEWPORT,
     launch_chrome,
 )
-from app.utils import sanitize_text
+from app.utils import extract_org_id, sanitize_text
 
 
 LOGGER = logging.getLogger(__name__)
 
 ORG_ID_RE = re.compile(r"/maps/org(?:/[^/]+)?/(\d+)")
 
+SCROLL_CONTAINER_JS = """
+({selector, scrollStep}) => {
+  const container = document.querySelector(selector);
+  if (!container) {
+    window.scrollBy(0, scrollStep);
+    return { moved: true, scrollTop: window.scrollY, maxTop: document.body.scrollHeight };
+  }
+  const prevTop = container.scrollTop;
+  const maxTop = container.scrollHeight - container.clientHeight;
+  const nextTop = Math.min(prevTop + scrollStep, maxTop);
+  container.scrollTop = nextTop;
+  container.dispatchEvent(new Event("scroll", { bubbles: true }));
+  return { moved: nextTop > prevTop, scrollTop: nextTop, maxTop };
+}
+"""
+EXPAND_REVIEWS_JS = """
+(selectors) => {
+  let clicked = 0;
+  for (const selector of selectors) {
+    document.querySelectorAll(selector).forEach(el => {
+      try { el.click(); clicked += 1; } catch (e) {}
+    });
+  }
+  return clicked;
+}
+"""
+REVIEWS_SNAPSHOT_JS = """
+({reviewSelector, userSelector, ratingFullSelector, dateSelector, textSelector,
+  responseDateSelector, responseTextSelector, reviewIdAttributes}) => {
+  const text = (root, sel) => {
+    const el = root.querySelector(sel);
+    return el ? (el.textContent || "").trim() : "";
+  };
+  return Array.from(document.querySelectorAll(reviewSelector)).map(node => {
+    const user = node.querySelector(userSelector);
+    const date = node.querySelector(dateSelector);
+    return {
+      userName: user ? (user.textContent || "").trim() : "",
+      userProfileUrl: user ? (user.getAttribute("href") || "") : "",
+      rating: node.querySelectorAll(ratingFullSelector).length,
+      reviewDate: date ? ((date.getAttribute("content") || "").trim() || (date.textContent || "").trim()) : "",
+      reviewText: text(node, textSelector),
+      responseDate: text(node, responseDateSelector),
+      responseText: text(node, responseTextSelector),
+      reviewId: reviewIdAttributes.map(name => node.getAttribute(name)).find(Boolean) || "",
+    };
+  });
+}
+"""
+
 
 @dataclass
 class Review:
@@ -35,6 +87,8 @@ class Review:
     review_text: str = ""
     response_date: str = ""
     response_text: str = ""
+    org_id: str = ""
+    review_id: str = ""
 
 
 class YandexReviewsParser:
@@ -50,6 +104,8 @@ class YandexReviewsParser:
     response_date_selector = "span.business-review-comment-content__date"
     response_text_selector = "div.business-review-comment-content__bubble"
     max_scroll_idle_time = 10
+    # Native review id attributes, tried in order; the text-hash key is used when none is set.
+    review_id_attributes = ("data-review-id", "data-id")
 
     def __init__(
         self,
@@ -61,15 +117,20 @@ class YandexReviewsParser:
         captcha_resume_event=None,
         captcha_hook: Optional[CaptchaHook] = None,
         log: Optional[Callable[[str], None]] = None,
+        captcha_check_interval_s: float = 2.0,
+        warm_browser: bool = False,
     ) -> None:
         self.url = self._normalize_url(url)
+        self.org_id = extract_org_id(self.url)
         self.headless = headless
+        self.warm_browser = warm_browser
         self.stop_event = stop_event or threading.Event()
         self.pause_event = pause_event or threading.Event()
         self.captcha_resume_event = captcha_resume_event or threading.Event()
         self.captcha_hook = captcha_hook
         self._log_cb = log
         self.total_reviews = 0
+        self.captcha_probe = CaptchaProbe(captcha_check_interval_s)
 
     @staticmethod
     def _normalize_url(raw: str) -> str:
@@ -113,6 +174,7 @@ class YandexReviewsParser:
                 p,
                 headless=self.headless,
                 args=PLAYWRIGHT_LAUNCH_ARGS,
+                use_daemon=self.warm_browser,
             )
             context = browser.new_context(
                 user_agent=PLAYWRIGHT_USER_AGENT,
@@ -124,6 +186,7 @@ class YandexReviewsParser:
             page = context.new_page()
             page.set_default_timeout(20000)
 
+            acquire_request(self.url, self.stop_event, self.pause_event)
             page.goto(self.url, wait_until="domcontentloaded")
             captcha_helper = CaptchaFlowHelper(
                 playwright=p,
@@ -170,7 +233,10 @@ class YandexReviewsParser:
                     yield review
                     if not self._wait_between_reviews(1.0):
                         return
+                # Every review is expanded by now, so the saved page has the full texts.
+                archive_page("reviews", page.content, url=self.url, org_id=self.org_id)
             finally:
+                LOGGER.info("Проверки капчи: %s", self.captcha_probe.metrics())
                 try:
                     captcha_helper.close()
                 except Exception:
@@ -196,7 +262,7 @@ class YandexReviewsParser:
     def _ensure_no_captcha(self, page: Page) -> Optional[Page]:
         if self.stop_event.is_set():
             return None
-        if is_captcha(page):
+        if self.captcha_probe.check(page):
             return wait_captcha_resolved(
                 page,
                 self._log,
@@ -216,6 +282,7 @@ class YandexReviewsParser:
         ]
         for selector in selectors:
             try:
+                acquire_request(page.url, self.stop_event, self.pause_event)
                 page.locator(selector).first.click(timeout=2000)
                 time.sleep(0.2)
             except PlaywrightTimeoutError:
@@ -251,21 +318,7 @@ class YandexReviewsParser:
     def _scroll_container(self, page: Page, step: int) -> bool:
         try:
             result = page.evaluate(
-                """
-                ({selector, scrollStep}) => {
-                  const container = document.querySelector(selector);
-                  if (!container) {
-                    window.scrollBy(0, scrollStep);
-                    return { moved: true, scrollTop: window.scrollY, maxTop: document.body.scrollHeight };
-                  }
-                  const prevTop = container.scrollTop;
-                  const maxTop = container.scrollHeight - container.clientHeight;
-                  const nextTop = Math.min(prevTop + scrollStep, maxTop);
-                  container.scrollTop = nextTop;
-                  container.dispatchEvent(new Event("scroll", { bubbles: true }));
-                  return { moved: nextTop > prevTop, scrollTop: nextTop, maxTop };
-                }
-                """,
+                SCROLL_CONTAINER_JS,
                 {"selector": self.scroll_container_selector, "scrollStep": step},
             )
             return bool(result.get("moved")) if isinstance(result, dict) else False
@@ -284,6 +337,15 @@ class YandexReviewsParser:
                 continue
 
     def _parse_review(self, review_loc) -> Review:
+        review_id = ""
+        for attribute in self.review_id_attributes:
+            try:
+                review_id = sanitize_text(review_loc.get_attribute(attribute))
+            except Exception:
+                review_id = ""
+            if review_id:
+                break
+
         user_name = ""
         user_profile_url = ""
         try:
@@ -342,6 +404,40 @@ class YandexReviewsParser:
             review_text=review_text,
             response_date=response_date,
             response_text=response_text,
+            org_id=self.org_id,
+            review_id=review_id,
+        )
+
+    @classmethod
+    def snapshot_args(cls) -> dict:
+        return {
+            "reviewSelector": cls.review_selector,
+            "userSelector": cls.user_selector,
+            "ratingFullSelector": cls.rating_full_selector,
+            "dateSelector": cls.review_date_selector,
+            "textSelector": cls.review_text_selector,
+            "responseDateSelector": cls.response_date_selector,
+            "responseTextSelector": cls.response_text_selector,
+            "reviewIdAttributes": list(cls.review_id_attributes),
+        }
+
+    @staticmethod
+    def review_from_snapshot(snapshot: dict, org_id: str = "") -> Review:
+        """Build a Review from one item returned by REVIEWS_SNAPSHOT_JS."""
+        try:
+            rating = int(snapshot.get("rating") or 0)
+        except (TypeError, ValueError):
+            rating = 0
+        return Review(
+            user_name=sanitize_text(snapshot.get("userName")),
+            user_profile_url=sanitize_text(snapshot.get("userProfileUrl")),
+            rating=rating,
+            review_date=sanitize_text(snapshot.get("reviewDate")),
+            review_text=sanitize_text(snapshot.get("reviewText")),
+            response_date=sanitize_text(snapshot.get("responseDate")),
+            response_text=sanitize_text(snapshot.get("responseText")),
+            org_id=org_id,
+            review_id=sanitize_text(snapshot.get("reviewId")),
         )
 
     def _wait_between_reviews(self, seconds: float) -> bool:
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from app.settings_store import CONFIG_DIR
+
+
+LOGGER = logging.getLogger(__name__)
+
+SELECTOR_HEALTH_PATH = CONFIG_DIR / "selector_health.json"
+
+
+class SelectorRegistry:
+    """Remembers which selector variant last matched for each page type.
+
+    The primary candidate is always probed first and the last-good variant
+    second, so one transient miss cannot pin a fallback for good. When a
+    different variant starts matching, the change is logged and counted as
+    selector drift — an early sign that Yandex changed markup.
+    """
+
+    def __init__(self, path: Optional[Path] = SELECTOR_HEALTH_PATH) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._state: dict[str, dict] = self._load()
+        self._probes: dict[str, int] = {}
+        self._lookups: dict[str, int] = {}
+
+    def _load(self) -> dict[str, dict]:
+        if self.path is None:
+            return {}
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception:
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return {key: value for key, value in data.items() if isinstance(value, dict)}
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Shard processes share the file, so each writer gets its own tmp file.
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_text(json.dumps(self._state, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(tmp_path, self.path)
+        except Exception:
+            LOGGER.debug("Не удалось сохранить состояние селекторов", exc_info=True)
+
+    def ordered(self, page_type: str, candidates: Iterable[str]) -> list[str]:
+        candidates = list(candidates)
+        with self._lock:
+            last_good = self._state.get(page_type, {}).get("selector")
+        if last_good in candidates[1:]:
+            candidates.remove(last_good)
+            candidates.insert(1, last_good)
+        return candidates
+
+    def record(self, page_type: str, selector: str, probes: int = 1) -> None:
+        with self._lock:
+            self._probes[page_type] = self._probes.get(page_type, 0) + probes
+            self._lookups[page_type] = self._lookups.get(page_type, 0) + 1
+            entry = self._state.setdefault(page_type, {"selector": None, "drift": 0})
+            previous = entry.get("selector")
+            if previous == selector:
+                return
+            if previous:
+                entry["drift"] = int(entry.get("drift", 0)) + 1
+                LOGGER.warning(
+                    "Сменилась разметка (%s): селектор %s → %s", page_type, previous, selector
+                )
+            entry["selector"] = selector
+            entry["changed_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+            self._save()
+
+    def find(self, page_type: str, candidates: Iterable[str], probe: Callable[[str], bool]) -> Optional[str]:
+        """Return the first candidate for which ``probe`` is true, in ``ordered`` order."""
+        probes = 0
+        for selector in self.ordered(page_type, candidates):
+            probes += 1
+            try:
+                matched = probe(selector)
+            except Exception:
+                LOGGER.debug("Selector probe failed for %s", selector, exc_info=True)
+                matched = False
+            if matched:
+                self.record(page_type, selector, probes)
+                return selector
+        return None
+
+    def metrics(self) -> dict[str, dict]:
+        with self._lock:
+            return {
+                page_type: {
+                    "selector": entry.get("selector"),
+                    "drift": int(entry.get("drift", 0)),
+                    "probes_per_lookup": round(
+                        self._probes.get(page_type, 0) / self._lookups[page_type], 2
+                    )
+                    if self._lookups.get(page_type)
+                    else None,
+                }
+                for page_type, entry in self._state.items()
+            }
+
+
+_registry: Optional[SelectorRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_selector_registry() -> SelectorRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = SelectorRegistry()
+        return _registry
@@ -0,0 +1,478 @@
+"""Browserless SERP fetch: pooled HTTPS connections plus a small HTML parser.
+
+The organization cards on the search page are server-rendered, so the
+same fields ``CARD_SNAPSHOT_JS`` reads in Chrome can be read from the HTML.
+A fetch costs one keep-alive request and a parse instead of a browser tab.
+Cookies harvested from browser sessions (``harvest_cookies``) are sent along
+with the browser's user agent, so Yandex sees the same client it already
+trusts.
+
+``fetch_serp_rows`` raises ``NeedsBrowser`` on a captcha, on a page without
+cards (JS-only answer) and on a carousel whose remaining cards need the
+arrow clicks; callers then run the Playwright path for that query.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from http.client import HTTPResponse, HTTPSConnection
+from http.cookies import SimpleCookie
+from typing import Callable, Iterable, Iterator, Optional
+from urllib.parse import urljoin, urlsplit
+
+from app.settings_store import CONFIG_DIR
+
+
+LOGGER = logging.getLogger(__name__)
+
+SERP_COOKIES_PATH = CONFIG_DIR / "serp_cookies.json"
+COOKIE_DOMAIN_SUFFIX = "yandex.ru"
+POOL_SIZE_PER_HOST = 8
+MAX_REDIRECTS = 5
+REQUEST_TIMEOUT_S = 20.0
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+}
+CAPTCHA_MARKERS = ("showcaptcha", "CheckboxCaptcha", "SmartCaptcha", "Подтвердите, что запросы отправляли вы")
+BADGE_BLUE_RE = re.compile(r"Информация об организации подтверждена владельцем", re.IGNORECASE)
+VERIFIED_A11Y_RE = re.compile(r"подтверждена владельцем", re.IGNORECASE)
+
+
+class NeedsBrowser(Exception):
+    """The page cannot be handled without a real browser (captcha, JS-only content)."""
+
+
+class NoSerpCards(NeedsBrowser):
+    """No organization cards in the HTML; past the first results page this means the results ended."""
+
+
+@dataclass
+class Node:
+    tag: str
+    attrs: dict[str, str] = field(default_factory=dict)
+    children: list["Node | str"] = field(default_factory=list)
+
+    @property
+    def classes(self) -> set[str]:
+        return set((self.attrs.get("class") or "").split())
+
+    def text(self) -> str:
+        parts: list[str] = []
+        stack: list[Node | str] = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                parts.append(item)
+            else:
+                stack.extend(reversed(item.children))
+        return "".join(parts)
+
+    def iter(self) -> Iterator["Node"]:
+        stack = [child for child in reversed(self.children) if isinstance(child, Node)]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(child for child in reversed(node.children) if isinstance(child, Node))
+
+    def select(self, selector: str) -> list["Node"]:
+        """Descendants matching a ``tag.class1.class2`` selector, optionally nested with spaces."""
+        nodes: list[Node] = [self]
+        for step in selector.split():
+            tag, _, cls = step.partition(".")
+            wanted = set(cls.split(".")) if cls else set()
+            matched: dict[int, Node] = {}
+            for root in nodes:
+                for node in root.iter():
+                    if (not tag or node.tag == tag) and wanted <= node.classes:
+                        matched.setdefault(id(node), node)
+            nodes = list(matched.values())
+        return nodes
+
+    def first(self, selector: str) -> Optional["Node"]:
+        found = self.select(selector)
+        return found[0] if found else None
+
+
+class _TreeBuilder(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.root = Node("#document")
+        self._stack: list[Node] = [self.root]
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag: str, attrs) -> None:
+        if self._skip_depth:
+            if tag in ("script", "style"):
+                self._skip_depth += 1
+            return
+        if tag in ("script", "style"):
+            self._skip_depth = 1
+            return
+        node = Node(tag, {name: value or "" for name, value in attrs})
+        self._stack[-1].children.append(node)
+        if tag not in VOID_TAGS:
+            self._stack.append(node)
+
+    def handle_startendtag(self, tag: str, attrs) -> None:
+        if not self._skip_depth:
+            self._stack[-1].children.append(Node(tag, {name: value or "" for name, value in attrs}))
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._skip_depth:
+            if tag in ("script", "style"):
+                self._skip_depth -= 1
+            return
+        # Browsers close unclosed children implicitly; stray end tags are ignored.
+        for depth in range(len(self._stack) - 1, 0, -1):
+            if self._stack[depth].tag == tag:
+                del self._stack[depth:]
+                return
+
+    def handle_data(self, data: str) -> None:
+        if not self._skip_depth and data:
+            self._stack[-1].children.append(data)
+
+
+def parse_html(html: str) -> Node:
+    builder = _TreeBuilder()
+    builder.feed(html)
+    builder.close()
+    return builder.root
+
+
+def card_snapshot(card: Node) -> dict:
+    """Python twin of ``parser_search.CARD_SNAPSHOT_JS``."""
+
+    def _text(selector: str) -> str:
+        node = card.first(selector)
+        return node.text().strip() if node else ""
+
+    title_link = card.first("a.OrgCard-Title")
+    title_text = title_link.first(".OrgCard-TitleText") if title_link else None
+    a11y_texts = [node.text() for node in card.select(".A11yHidden")]
+    main_text = ""
+    main_href = ""
+    main_button = card.first(".OrgsListActions-FirstMainButton")
+    if main_button is not None:
+        text_node = main_button.first(".Button-Text") or main_button
+        main_text = text_node.text().strip()
+        main_href = main_button.attrs.get("href", "")
+    if not main_href:
+        link = card.first(".OrgsListActions a.Button_link")
+        if link is not None:
+            text_node = link.first(".Button-Text") or link
+            if not main_text:
+                main_text = text_node.text().strip()
+            main_href = link.attrs.get("href", "")
+    return {
+        "name": title_text.text().strip() if title_text else "",
+        "titleHref": title_link.attrs.get("href", "") if title_link else "",
+        "labelContent": _text(".LabelRating .Label-Content"),
+        "ratingA11y": _text(".LabelRating .A11yHidden"),
+        "reviewsText": _text("a.OrgCard-ReviewsLink"),
+        "badgeBlue": any(BADGE_BLUE_RE.search(text) for text in a11y_texts),
+        "verifiedIcon": bool(card.first(".OrgCard-TitleVerified") or card.first(".Icon_type_verified")),
+        "verifiedA11y": any(VERIFIED_A11Y_RE.search(text) for text in a11y_texts),
+        "mainText": main_text,
+        "mainHref": main_href,
+    }
+
+
+def load_cookies() -> dict[str, str]:
+    try:
+        data = json.loads(SERP_COOKIES_PATH.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    now = time.time()
+    return {
+        str(name): str(entry.get("value", ""))
+        for name, entry in data.items()
+        if isinstance(entry, dict) and (not entry.get("expires") or float(entry["expires"]) > now)
+    }
+
+
+def harvest_cookies(cookies: Iterable[dict]) -> int:
+    """Keep Yandex cookies from a Playwright ``context.cookies()`` list for the HTTP engine."""
+    kept = {
+        str(cookie["name"]): {
+            "value": str(cookie.get("value", "")),
+            "expires": float(cookie["expires"]) if float(cookie.get("expires") or -1) > 0 else 0,
+        }
+        for cookie in cookies
+        if str(cookie.get("domain", "")).lstrip(".").endswith(COOKIE_DOMAIN_SUFFIX) and cookie.get("name")
+    }
+    if not kept:
+        return 0
+    try:
+        SERP_COOKIES_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = SERP_COOKIES_PATH.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(kept, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, SERP_COOKIES_PATH)
+    except Exception:
+        LOGGER.debug("Не удалось сохранить cookies для HTTP-режима", exc_info=True)
+        return 0
+    return len(kept)
+
+
+class HttpPool:
+    """Keep-alive HTTPS connections per host, shared by all threads of a run."""
+
+    def __init__(self, *, user_agent: str, size_per_host: int = POOL_SIZE_PER_HOST) -> None:
+        self.user_agent = user_agent
+        self.size_per_host = size_per_host
+        self.cookies = load_cookies()
+        self._pools: dict[str, queue.LifoQueue] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.reused = 0
+
+    def _pool(self, host: str) -> queue.LifoQueue:
+        with self._lock:
+            pool = self._pools.get(host)
+            if pool is None:
+                pool = self._pools[host] = queue.LifoQueue(maxsize=self.size_per_host)
+            return pool
+
+    def _checkout(self, host: str) -> tuple[HTTPSConnection, bool]:
+        try:
+            return self._pool(host).get_nowait(), True
+        except queue.Empty:
+            return HTTPSConnection(host, timeout=REQUEST_TIMEOUT_S), False
+
+    def _checkin(self, host: str, conn: HTTPSConnection) -> None:
+        try:
+            self._pool(host).put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _headers(self) -> dict[str, str]:
+        headers = {
+            "User-Agent": self.user_agent,
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "ru-RU,ru;q=0.9,en;q=0.8",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        }
+        with self._lock:
+            if self.cookies:
+                headers["Cookie"] = "; ".join(f"{name}={value}" for name, value in self.cookies.items())
+        return headers
+
+    def _remember_cookies(self, response: HTTPResponse) -> None:
+        for header in response.headers.get_all("Set-Cookie") or []:
+            parsed = SimpleCookie()
+            try:
+                parsed.load(header)
+            except Exception:
+                continue
+            with self._lock:
+                for name, morsel in parsed.items():
+                    self.cookies[name] = morsel.value
+
+    def _request(self, url: str) -> tuple[int, str, bytes, HTTPResponse]:
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        for attempt in range(2):
+            conn, reused = self._checkout(parts.netloc)
+            try:
+                conn.request("GET", path, headers=self._headers())
+                response = conn.getresponse()
+                body = response.read()
+            except Exception:
+                conn.close()
+                # A pooled connection may have been closed by the server; retry once on a fresh one.
+                if reused and attempt == 0:
+                    continue
+                raise
+            with self._lock:
+                self.requests += 1
+                self.reused += 1 if reused else 0
+            if response.will_close:
+                conn.close()
+            else:
+                self._checkin(parts.netloc, conn)
+            return response.status, response.headers.get("Location", ""), body, response
+        raise RuntimeError("unreachable")
+
+    def get(self, url: str) -> tuple[str, str]:
+        """Fetch ``url`` following redirects; returns (final_url, text)."""
+        for _ in range(MAX_REDIRECTS + 1):
+            status, location, body, response = self._request(url)
+            self._remember_cookies(response)
+            if status in (301, 302, 303, 307, 308) and location:
+                url = urljoin(url, location)
+                continue
+            encoding = (response.headers.get("Content-Encoding") or "").lower()
+            if encoding == "gzip":
+                body = gzip.decompress(body)
+            elif encoding == "deflate":
+                body = zlib.decompress(body)
+            if status >= 400:
+                raise NeedsBrowser(f"HTTP {status}")
+            charset = response.headers.get_content_charset() or "utf-8"
+            return url, body.decode(charset, errors="replace")
+        raise NeedsBrowser("слишком много перенаправлений")
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {"requests": self.requests, "reused": self.reused}
+
+    def close(self) -> None:
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except queue.Empty:
+                    break
+
+
+_pool: Optional[HttpPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_http_pool() -> HttpPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            from app.playwright_utils import PLAYWRIGHT_USER_AGENT
+
+            _pool = HttpPool(user_agent=PLAYWRIGHT_USER_AGENT)
+        return _pool
+
+
+def close_http_pool() -> None:
+    """Close the idle keep-alive connections at the end of a run; the pool stays usable."""
+    with _pool_lock:
+        pool = _pool
+    if pool is not None:
+        pool.close()
+
+
+def _looks_like_captcha(url: str, html: str) -> bool:
+    if "captcha" in url.lower():
+        return True
+    head = html[:200_000]
+    return any(marker in head for marker in CAPTCHA_MARKERS)
+
+
+def _carousel_has_more(root: Node) -> bool:
+    for node in root.select(".ArrowButton_direction_right"):
+        classes = node.classes
+        if "Scroller-Arrow" in classes or "ArrowButton" in classes:
+            disabled = "disabled" in node.attrs or node.attrs.get("aria-disabled") == "true"
+            if not disabled and not any("disabled" in cls.lower() for cls in classes):
+                return True
+    return False
+
+
+def fetch_serp_rows(
+    query: str,
+    lr: str,
+    *,
+    limit: Optional[int] = None,
+    row_filter: Optional[Callable[[dict], bool]] = None,
+    allow_hidden_phones: bool = False,
+    page: int = 0,
+    pool: Optional[HttpPool] = None,
+    stop_event=None,
+    pause_event=None,
+) -> list[dict]:
+    """Rows for one SERP query without a browser, deduped like ``parse_serp_cards``.
+
+    Phones come only from the card markup. A card that hides its phone behind
+    "Показать телефон" needs the click, so it raises ``NeedsBrowser`` unless
+    ``allow_hidden_phones`` accepts such rows with an empty phone.
+    """
+    from app.page_archive import archive_page
+    from app.parser_search import SERP_CARD_SELECTORS, build_serp_url
+    from app.request_budget import acquire_request
+    from app.selector_registry import get_selector_registry
+
+    pool = pool or get_http_pool()
+    url = build_serp_url(query, lr, page)
+    acquire_request(url, stop_event, pause_event)
+    try:
+        final_url, html = pool.get(url)
+    except NeedsBrowser:
+        raise
+    except Exception as exc:
+        raise NeedsBrowser(f"ошибка сети: {exc}") from exc
+    if _looks_like_captcha(final_url, html):
+        raise NeedsBrowser("капча")
+    root = parse_html(html)
+    selector = get_selector_registry().find("serp_cards_http", SERP_CARD_SELECTORS, lambda sel: bool(root.first(sel)))
+    if selector is None:
+        raise NoSerpCards("карточек нет в HTML")
+    cards = root.select(selector)
+    # Without a limit a carousel always needs the browser, so skip building rows for it.
+    has_more = _carousel_has_more(root)
+    if has_more and not limit:
+        raise NeedsBrowser(f"в HTML {len(cards)} карточек, остальные подгружает карусель")
+    rows, passed = serp_rows_from_cards(
+        cards,
+        limit=limit,
+        row_filter=row_filter,
+        allow_hidden_phones=allow_hidden_phones,
+    )
+    if has_more and passed < limit:
+        raise NeedsBrowser(f"в HTML {len(rows)} карточек, остальные подгружает карусель")
+    archive_page("serp", html, url=final_url, query=query)
+    return rows
+
+
+def serp_rows_from_cards(
+    cards: Iterable[Node],
+    *,
+    limit: Optional[int] = None,
+    row_filter: Optional[Callable[[dict], bool]] = None,
+    allow_hidden_phones: bool = False,
+) -> tuple[list[dict], int]:
+    """Deduped rows for parsed SERP cards and how many of them passed ``row_filter``."""
+    from app.parser_search import _build_serp_row, _serp_dedupe_key, _snapshot_fields
+
+    rows: list[dict] = []
+    passed = 0
+    seen_keys: set[str] = set()
+    for card in cards:
+        if limit and passed >= limit:
+            break
+        snapshot = card_snapshot(card)
+        fields = _snapshot_fields(snapshot)
+        if not fields["phones"] and "Показать телефон" in snapshot["mainText"] and not allow_hidden_phones:
+            raise NeedsBrowser("телефон скрыт за кнопкой")
+        dedupe_key = _serp_dedupe_key(str(fields["card_url"]), str(fields["name"]), str(fields["reviews"]))
+        if dedupe_key in seen_keys:
+            continue
+        seen_keys.add(dedupe_key)
+        row = _build_serp_row(
+            name=str(fields["name"]),
+            rating=str(fields["rating"]),
+            reviews=str(fields["reviews"]),
+            verified=bool(fields["verified"]),
+            phones=str(fields["phones"]),
+            website=str(fields["website"]),
+            card_url=str(fields["card_url"]),
+        )
+        rows.append(row)
+        try:
+            passed += 1 if row_filter is None or row_filter(row) else 0
+        except Exception:
+            LOGGER.debug("SERP HTTP: row_filter failed", exc_info=True)
+    return rows, passed
@@ -58,17 +58,49 @@ class ProgramSettings:
     open_result: bool = True
     log_level: str = "info"
     autosave_settings: bool = True
+    adaptive_rate: bool = True
+    warm_browser: bool = False
+    excel_save_interval_s: float = 0.0
+    reviews_incremental: bool = False
+    serp_http: bool = False
+    archive_pages: bool = False
+    # SERP result pages (p=0..N-1) per query in the async engine; 1 keeps the first page only.
+    serp_pages: int = 1
 
     @classmethod
     def from_dict(cls, data: Any) -> "ProgramSettings":
         defaults = cls()
         if not isinstance(data, dict):
             return defaults
+
+        def _non_negative(value: Any, fallback: float) -> float:
+            try:
+                number = float(str(value).replace(",", "."))
+            except Exception:
+                return fallback
+            return number if number >= 0 else fallback
+
+        def _positive_int(value: Any, fallback: int) -> int:
+            try:
+                number = int(float(str(value).replace(",", ".")))
+            except Exception:
+                return fallback
+            return number if number > 0 else fallback
+
         return cls(
             headless=bool(data.get("headless", defaults.headless)),
             open_result=bool(data.get("open_result", defaults.open_result)),
             log_level=str(data.get("log_level", defaults.log_level) or defaults.log_level),
             autosave_settings=bool(data.get("autosave_settings", defaults.autosave_settings)),
+            adaptive_rate=bool(data.get("adaptive_rate", defaults.adaptive_rate)),
+            warm_browser=bool(data.get("warm_browser", defaults.warm_browser)),
+            excel_save_interval_s=_non_negative(
+                data.get("excel_save_interval_s", defaults.excel_save_interval_s), defaults.excel_save_interval_s
+            ),
+            reviews_incremental=bool(data.get("reviews_incremental", defaults.reviews_incremental)),
+            serp_http=bool(data.get("serp_http", defaults.serp_http)),
+            archive_pages=bool(data.get("archive_pages", defaults.archive_pages)),
+            serp_pages=_positive_int(data.get("serp_pages", defaults.serp_pages), defaults.serp_pages),
         )
 
 
@@ -92,11 +124,51 @@ class NotificationsSettings:
         )
 
 
+@dataclass
+class RateLimitSettings:
+    enabled: bool = False
+    per_min: float = 40.0
+    burst: float = 5.0
+    shared_between_processes: bool = True
+    state_path: str = ""
+    hosts: dict[str, dict] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: Any) -> "RateLimitSettings":
+        defaults = cls()
+        if not isinstance(data, dict):
+            return defaults
+
+        def _positive(value: Any, fallback: float) -> float:
+            try:
+                number = float(str(value).replace(",", "."))
+            except Exception:
+                return fallback
+            return number if number > 0 else fallback
+
+        hosts = data.get("hosts", {})
+        return cls(
+            enabled=bool(data.get("enabled", defaults.enabled)),
+            per_min=_positive(data.get("per_min", defaults.per_min), defaults.per_min),
+            burst=_positive(data.get("burst", defaults.burst), defaults.burst),
+            shared_between_processes=bool(
+                data.get("shared_between_processes", defaults.shared_between_processes)
+            ),
+            state_path=str(data.get("state_path", defaults.state_path) or ""),
+            hosts={
+                str(host): dict(rate)
+                for host, rate in (hosts.items() if isinstance(hosts, dict) else [])
+                if isinstance(rate, dict)
+            },
+        )
+
+
 @dataclass
 class Settings:
     potential_filters: PotentialFiltersSettings = field(default_factory=PotentialFiltersSettings)
     program: ProgramSettings = field(default_factory=ProgramSettings)
     notifications: NotificationsSettings = field(default_factory=NotificationsSettings)
+    rate_limit: RateLimitSettings = field(default_factory=RateLimitSettings)
 
     @classmethod
     def from_dict(cls, data: Any) -> "Settings":
@@ -106,6 +178,7 @@ class Settings:
             potential_filters=PotentialFiltersSettings.from_dict(data.get("potential_filters", {})),
             program=ProgramSettings.from_dict(data.get("program", {})),
             notifications=NotificationsSettings.from_dict(data.get("notifications", {})),
+            rate_limit=RateLimitSettings.from_dict(data.get("rate_limit", {})),
         )
 
     def to_dict(self) -> dict:
@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Optional
+
+from app.captcha_state import CaptchaBoard, log_captcha_transitions
+from app.settings_model import Settings
+from app.utils import organization_key
+
+
+LOGGER = logging.getLogger(__name__)
+
+SHARD_KINDS = ("maps", "serp", "reviews")
+# How long "check now" stays raised for the workers; they react to it being set, so it
+# must outlast one poll of every parked page before the parent clears it again.
+RESUME_GRACE_S = 1.0
+
+
+def split_shards(items: list[str], workers: int) -> list[list[str]]:
+    """Round-robin split so every shard gets a similar mix of items."""
+    workers = max(1, min(int(workers), len(items))) if items else 0
+    shards: list[list[str]] = [[] for _ in range(workers)]
+    for index, item in enumerate(items):
+        shards[index % workers].append(item)
+    return shards
+
+
+def _shard_worker(
+    worker_id: int,
+    kind: str,
+    items: list[str],
+    options: dict,
+    results,
+    stop_event,
+    pause_event,
+    resume_event,
+) -> None:
+    # Runs in a child process: owns its own Playwright and Chrome instance.
+    from app.async_engine import run_maps_queries, run_reviews_urls, run_serp_queries
+    from app.parser_search import _row_to_organization, potential_row_filter
+    from app.page_archive import configure_page_archive
+    from app.request_budget import configure_request_budget
+    from app.settings_model import PotentialFiltersSettings, RateLimitSettings, Settings
+
+    def _log(message: str) -> None:
+        results.put(("log", f"[воркер {worker_id}] {message}"))
+
+    # Captcha transitions are forwarded so the parent can show every parked worker.
+    board = CaptchaBoard()
+    board.add_listener(
+        lambda worker, state, info: results.put(
+            ("captcha", (f"{worker_id}:{worker}", state, info.get("url", "")))
+        )
+    )
+    engine_kwargs = {
+        "headless": options.get("headless", False),
+        "concurrency": options.get("concurrency", 1),
+        "stop_event": stop_event,
+        "pause_event": pause_event,
+        "captcha_board": board,
+        "captcha_resume_event": resume_event,
+        "serp_http": bool(options.get("serp_http")),
+        "serp_pages": int(options.get("serp_pages") or 1),
+        "warm_browser": bool(options.get("warm_browser")),
+        "log": _log,
+    }
+    limit = options.get("limit")
+    errors: dict[str, str] = {}
+    # Workers share the parent's state file, so the budget holds across processes.
+    configure_request_budget(RateLimitSettings.from_dict(options.get("rate_limit")))
+    configure_page_archive(bool(options.get("archive_pages")))
+    try:
+        if kind == "maps":
+            run_maps_queries(
+                items,
+                limit=limit,
+                org_cb=lambda org: results.put(("org", org)),
+                errors=errors,
+                **engine_kwargs,
+            )
+        elif kind == "serp":
+            run_serp_queries(
+                items,
+                limit=limit,
+                row_cb=lambda row: results.put(("org", _row_to_organization(row))),
+                row_filter=potential_row_filter(
+                    Settings(potential_filters=PotentialFiltersSettings.from_dict(options.get("potential_filters")))
+                ),
+                errors=errors,
+                **engine_kwargs,
+            )
+        elif kind == "reviews":
+            run_reviews_urls(
+                items,
+                review_cb=lambda review: results.put(("review", review)),
+                errors=errors,
+                **engine_kwargs,
+            )
+    except Exception as exc:
+        results.put(("error", f"[воркер {worker_id}] {exc}"))
+        # Which items finished is unknown after a crash, so the whole shard counts as failed.
+        errors.update({item: str(exc) for item in items if item not in errors})
+    finally:
+        for item, error in errors.items():
+            results.put(("failed", (item, error)))
+        results.put(("done", worker_id))
+
+
+class ShardedRunner:
+    """Split a query or org-id list across worker processes and merge into one output.
+
+    Each worker drives its own browser through the async engine. The parent
+    mirrors the caller's stop/pause events into process-shared events, dedupes
+    organizations by org id and is the only writer of the output file.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        items: list[str],
+        *,
+        output_path: Path,
+        workers: int,
+        settings: Optional[Settings] = None,
+        concurrency: int = 1,
+        limit: Optional[int] = None,
+        stop_event=None,
+        pause_event=None,
+        captcha_resume_event=None,
+        captcha_board: Optional[CaptchaBoard] = None,
+        log: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        if kind not in SHARD_KINDS:
+            raise ValueError(f"Unknown shard kind: {kind}")
+        self.kind = kind
+        self.items = list(items)
+        self.output_path = output_path
+        self.workers = workers
+        self.settings = settings or Settings()
+        self.concurrency = concurrency
+        self.limit = limit
+        self.stop_event = stop_event or threading.Event()
+        self.pause_event = pause_event or threading.Event()
+        self.captcha_resume_event = captcha_resume_event
+        self._log_cb = log
+        self.captcha_board = captcha_board or CaptchaBoard()
+        if captcha_board is None:
+            self.captcha_board.add_listener(log_captcha_transitions(self._log))
+        self.seen_keys: set[str] = set()
+        self.written = 0
+        self.errors: list[str] = []
+        # Items whose flow failed, with the error; the rest of the batch still completes.
+        self.failed_items: dict[str, str] = {}
+
+    def _log(self, message: str) -> None:
+        if self._log_cb:
+            try:
+                self._log_cb(message)
+                return
+            except Exception:
+                pass
+        LOGGER.info(message)
+
+    def _open_writer(self):
+        if self.kind == "reviews":
+            from app.review_index import ReviewIndex
+            from app.reviews_excel_writer import ReviewsExcelWriter
+
+            return ReviewsExcelWriter(
+                self.output_path,
+                flush_interval_s=self.settings.program.excel_save_interval_s,
+                index=ReviewIndex() if self.settings.program.reviews_incremental else None,
+            )
+        from app.excel_writer import ExcelWriter
+
+        return ExcelWriter(self.output_path, flush_interval_s=self.settings.program.excel_save_interval_s)
+
+    def _handle_org(self, writer, org) -> None:
+        from app.filters import passes_potential_filters
+
+        key = organization_key(org)
+        if key in self.seen_keys:
+            return
+        self.seen_keys.add(key)
+        writer.append(org, include_in_potential=passes_potential_filters(org, self.settings))
+        self.written += 1
+
+    def run(self) -> int:
+        shards = split_shards(self.items, self.workers)
+        if not shards:
+            return 0
+        ctx = multiprocessing.get_context("spawn")
+        shared_stop = ctx.Event()
+        shared_pause = ctx.Event()
+        shared_resume = ctx.Event()
+        results = ctx.Queue()
+        options = {
+            "headless": self.settings.program.headless,
+            "concurrency": self.concurrency,
+            "limit": self.limit,
+            "rate_limit": asdict(self.settings.rate_limit),
+            "potential_filters": asdict(self.settings.potential_filters),
+            "serp_http": self.kind == "serp" and self.settings.program.serp_http,
+            "archive_pages": self.settings.program.archive_pages,
+            "serp_pages": self.settings.program.serp_pages,
+            "warm_browser": self.settings.program.warm_browser,
+        }
+        processes = [
+            ctx.Process(
+                target=_shard_worker,
+                args=(
+                    index + 1,
+                    self.kind,
+                    shard,
+                    options,
+                    results,
+                    shared_stop,
+                    shared_pause,
+                    shared_resume,
+                ),
+                daemon=True,
+            )
+            for index, shard in enumerate(shards)
+        ]
+        self._log(f"Запускаю {len(processes)} воркеров для {len(self.items)} заданий")
+        for process in processes:
+            process.start()
+
+        writer = self._open_writer()
+        finished = 0
+        resume_raised_at: Optional[float] = None
+        try:
+            while finished < len(processes):
+                if self.stop_event.is_set():
+                    shared_stop.set()
+                if self.pause_event.is_set():
+                    shared_pause.set()
+                else:
+                    shared_pause.clear()
+                if self.captcha_resume_event is not None and self.captcha_resume_event.is_set():
+                    self.captcha_resume_event.clear()
+                    shared_resume.set()
+                    resume_raised_at = time.monotonic()
+                elif resume_raised_at is not None and time.monotonic() - resume_raised_at >= RESUME_GRACE_S:
+                    shared_resume.clear()
+                    resume_raised_at = None
+                try:
+                    kind, payload = results.get(timeout=0.2)
+                except queue.Empty:
+                    if not any(process.is_alive() for process in processes):
+                        self.errors.append("воркеры завершились без отчёта о готовности")
+                        self._log("⚠️ Воркеры завершились без отчёта о готовности.")
+                        break
+                    continue
+                if kind == "done":
+                    finished += 1
+                elif kind == "org":
+                    self._handle_org(writer, payload)
+                elif kind == "review":
+                    if writer.append(payload):
+                        self.written += 1
+                elif kind == "captcha":
+                    worker, state, url = payload
+                    self.captcha_board.set_state(worker, state, url)
+                elif kind == "log":
+                    self._log(str(payload))
+                elif kind == "failed":
+                    item, error = payload
+                    self.failed_items[item] = error
+                elif kind == "error":
+                    self.errors.append(str(payload))
+                    self._log(f"❌ Ошибка: {payload}")
+        finally:
+            writer.close()
+            shared_stop.set()
+            for process in processes:
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.terminate()
+        return self.written
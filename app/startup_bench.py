@@ -0,0 +1,101 @@
+"""Cold-start benchmark: `python -m app.startup_bench [--budget-ms N]`.
+
+Imports the entry modules in fresh interpreters with `-X importtime` and
+reports the median total plus the heaviest top-level imports. A non-zero exit
+code means the median went over the budget, so the check can run in CI or
+before a release build.
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+DEFAULT_TARGETS = ("main", "app.gui")
+# Modules that must not be imported just by opening the GUI or parsing CLI args.
+LAZY_MODULES = ("playwright", "qrcode", "PIL", "openpyxl", "app.excel_writer", "app.filters")
+
+
+def _measure(target: str) -> tuple[float, dict[str, float], set[str]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else target)
+    top_level: dict[str, float] = {}
+    loaded: set[str] = set()
+    total_ms = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, raw_name = line.split(":", 1)[1].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        module = raw_name.strip()
+        cost_ms = int(cumulative) / 1000
+        loaded.add(module)
+        # importtime indents nested imports by two spaces per level.
+        depth = (len(raw_name) - len(raw_name.lstrip()) - 1) // 2
+        if depth == 0:
+            total_ms += cost_ms
+        if depth <= 1:
+            top_level[module] = top_level.get(module, 0.0) + cost_ms
+    return total_ms, top_level, loaded
+
+
+def run_benchmark(targets: tuple[str, ...], runs: int) -> dict[str, dict]:
+    report: dict[str, dict] = {}
+    for target in targets:
+        totals: list[float] = []
+        modules: dict[str, float] = {}
+        loaded: set[str] = set()
+        for _ in range(max(1, runs)):
+            total_ms, modules, loaded = _measure(target)
+            totals.append(total_ms)
+        report[target] = {
+            "median_ms": statistics.median(totals),
+            "runs_ms": totals,
+            "top": sorted(modules.items(), key=lambda item: item[1], reverse=True)[:10],
+            "eager": sorted(
+                name for name in loaded if name in LAZY_MODULES or name.split(".")[0] in LAZY_MODULES
+            ),
+        }
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure cold-start import time")
+    parser.add_argument("--runs", type=int, default=5, help="Interpreter launches per target")
+    parser.add_argument("--budget-ms", type=float, default=0.0, help="Fail if a median is above this")
+    parser.add_argument("targets", nargs="*", default=list(DEFAULT_TARGETS))
+    args = parser.parse_args(argv)
+
+    try:
+        report = run_benchmark(tuple(args.targets), args.runs)
+    except RuntimeError as exc:
+        print(f"❌ Не удалось импортировать: {exc}")
+        return 2
+
+    failed = False
+    for target, data in report.items():
+        print(f"{target}: медиана {data['median_ms']:.1f} мс ({len(data['runs_ms'])} запусков)")
+        for module, cost in data["top"]:
+            print(f"    {cost:8.1f} мс  {module}")
+        if data["eager"]:
+            print(f"    ⚠️ Загружаются при старте: {', '.join(data['eager'])}")
+        if args.budget_ms and data["median_ms"] > args.budget_ms:
+            print(f"    ❌ Превышен бюджет {args.budget_ms:.0f} мс")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
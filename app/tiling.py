@@ -0,0 +1,190 @@
+"""Split a city into map viewports so one query runs as many Maps lists.
+
+Yandex caps the result list of a single viewport, so a big city only ever
+shows its first few hundred organizations. Each tile becomes a work item of
+the form ``"<query> @<lon>,<lat>,<z>"`` that the Maps scrapers open with
+``ll``/``z`` URL params; the existing batch, async and sharded runners then
+schedule tiles like any other query and dedupe the merged output by org id.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import re
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from app.utils import split_query
+
+
+LOGGER = logging.getLogger(__name__)
+
+TILE_ITEM_RE = re.compile(r"^(?P<query>.*?)\s@(?P<lon>-?\d+(?:\.\d+)?),(?P<lat>-?\d+(?:\.\d+)?),(?P<z>\d{1,2})$")
+# Width of the map part of the Maps page, used to pick a zoom that shows one tile.
+VIEWPORT_WIDTH_PX = 1000
+MIN_ZOOM = 10
+MAX_ZOOM = 17
+
+
+@dataclass(frozen=True)
+class BBox:
+    west: float
+    south: float
+    east: float
+    north: float
+
+    @classmethod
+    def parse(cls, raw: str) -> "BBox":
+        """Parse ``"west,south,east,north"`` in degrees."""
+        parts = [float(part) for part in re.split(r"[,;\s]+", (raw or "").strip()) if part]
+        if len(parts) != 4:
+            raise ValueError(f"bbox must be west,south,east,north: {raw!r}")
+        west, south, east, north = parts
+        if west >= east or south >= north:
+            raise ValueError(f"empty bbox: {raw!r}")
+        return cls(west, south, east, north)
+
+    @property
+    def center(self) -> tuple[float, float]:
+        return (self.west + self.east) / 2, (self.south + self.north) / 2
+
+
+# Approximate city extents. Keys are lowercase word stems: every word of the city
+# name must be its stem plus one of ``CASE_ENDINGS`` ("в Москве", "в Нижнем Новгороде").
+CITY_BBOXES: dict[str, BBox] = {
+    "москв": BBox(37.35, 55.55, 37.90, 55.92),
+    "санкт-петербург": BBox(30.10, 59.80, 30.55, 60.09),
+    "петербург": BBox(30.10, 59.80, 30.55, 60.09),
+    "спб": BBox(30.10, 59.80, 30.55, 60.09),
+    "новосибирск": BBox(82.75, 54.90, 83.15, 55.12),
+    "екатеринбург": BBox(60.45, 56.73, 60.75, 56.93),
+    "казан": BBox(48.95, 55.70, 49.25, 55.88),
+    "нижн новгород": BBox(43.80, 56.20, 44.10, 56.38),
+    "челябинск": BBox(61.25, 55.05, 61.55, 55.28),
+    "самар": BBox(50.05, 53.12, 50.35, 53.30),
+    "омск": BBox(73.20, 54.88, 73.50, 55.08),
+    "ростов": BBox(39.55, 47.18, 39.85, 47.30),
+    "ростов-на-дону": BBox(39.55, 47.18, 39.85, 47.30),
+    "уф": BBox(55.90, 54.68, 56.15, 54.85),
+    "красноярск": BBox(92.75, 55.97, 93.10, 56.08),
+    "краснодар": BBox(38.90, 44.98, 39.15, 45.12),
+    "воронеж": BBox(39.10, 51.60, 39.30, 51.75),
+    "перм": BBox(56.10, 57.93, 56.35, 58.07),
+}
+
+
+CASE_ENDINGS = frozenset(
+    {"", "а", "я", "е", "и", "у", "ю", "ы", "ь", "ом", "ем", "ой", "ей", "ью", "ий", "ого", "его", "ому", "ему", "им"}
+)
+_CITY_WORD_RE = re.compile(r"[\s-]+")
+
+
+@dataclass(frozen=True)
+class Tile:
+    query: str
+    lon: float
+    lat: float
+    zoom: int
+
+    @property
+    def item(self) -> str:
+        return f"{self.query} @{self.lon:.5f},{self.lat:.5f},{self.zoom}"
+
+    def url_params(self) -> dict[str, str]:
+        return {"ll": f"{self.lon:.5f},{self.lat:.5f}", "z": str(self.zoom)}
+
+
+def parse_tile_item(item: str) -> tuple[str, Optional[dict[str, str]]]:
+    """Split a work item into the search text and the viewport URL params (None for plain queries)."""
+    match = TILE_ITEM_RE.match((item or "").strip())
+    if not match:
+        return item, None
+    tile = Tile(match["query"], float(match["lon"]), float(match["lat"]), int(match["z"]))
+    return tile.query, tile.url_params()
+
+
+def search_text(query: str) -> str:
+    """Text to search inside a pinned viewport: the niche without "в <город>".
+
+    The city in the text makes Yandex recenter the map on the whole city, so
+    only a district qualifier ("..., Хамовники") is kept.
+    """
+    niche, city = split_query(query)
+    _, _, district = city.partition(",")
+    return f"{niche} {district.strip()}".strip() if district.strip() else niche
+
+
+def _city_words(value: str) -> list[str]:
+    return [word for word in _CITY_WORD_RE.split(value.strip().lower().replace("ё", "е")) if word]
+
+
+def city_stem(city: str, stems: Iterable[str]) -> Optional[str]:
+    """Stem key whose words match the whole city name in some case form.
+
+    "Москва" and "Москве" both match "москв", while "Нижний Тагил" does not
+    match "нижн новгород" and "Ростов Великий" does not match "ростов".
+    Anything after a comma (a district) is ignored.
+    """
+    words = _city_words((city or "").split(",", 1)[0])
+    if not words:
+        return None
+    for stem in sorted(stems, key=len, reverse=True):
+        stem_words = _city_words(stem)
+        if len(stem_words) == len(words) and all(
+            word.startswith(part) and word[len(part):] in CASE_ENDINGS for part, word in zip(stem_words, words)
+        ):
+            return stem
+    return None
+
+
+def city_bbox(city: str) -> Optional[BBox]:
+    stem = city_stem(city, CITY_BBOXES)
+    return CITY_BBOXES[stem] if stem else None
+
+
+def zoom_for_span(lon_span: float) -> int:
+    # At zoom z one 256px tile covers 360 / 2**z degrees of longitude.
+    raw = math.log2(VIEWPORT_WIDTH_PX * 360.0 / (256.0 * max(lon_span, 1e-6)))
+    return max(MIN_ZOOM, min(MAX_ZOOM, int(math.floor(raw))))
+
+
+def plan_tiles(query: str, bbox: BBox, grid: int) -> list[Tile]:
+    """Cover ``bbox`` with a ``grid`` x ``grid`` set of viewports, center first.
+
+    Centers are denser, so the most productive tiles are scheduled first and a
+    limited run still gets the bulk of the city.
+    """
+    grid = max(1, int(grid))
+    lon_step = (bbox.east - bbox.west) / grid
+    lat_step = (bbox.north - bbox.south) / grid
+    zoom = zoom_for_span(lon_step)
+    center_lon, center_lat = bbox.center
+    tiles = [
+        Tile(
+            query,
+            bbox.west + lon_step * (col + 0.5),
+            bbox.south + lat_step * (row + 0.5),
+            zoom,
+        )
+        for row in range(grid)
+        for col in range(grid)
+    ]
+    tiles.sort(key=lambda tile: (tile.lon - center_lon) ** 2 + (tile.lat - center_lat) ** 2)
+    return tiles
+
+
+def expand_tiled_queries(queries: Iterable[str], grid: int, bbox: Optional[BBox] = None) -> list[str]:
+    """Replace every query by its tile items; queries without a known city stay as they are."""
+    items: list[str] = []
+    for query in queries:
+        area = bbox or city_bbox(split_query(query)[1])
+        if area is None or grid <= 1:
+            if grid > 1:
+                LOGGER.warning("Не знаю границ города для «%s» — запускаю без разбиения на квадраты", query)
+            items.append(query)
+            continue
+        tiles = plan_tiles(query, area, grid)
+        LOGGER.info("«%s»: %s квадратов карты (zoom %s)", query, len(tiles), tiles[0].zoom)
+        items.extend(tile.item for tile in tiles)
+    return items
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import hashlib
 import logging
 import os
 import random
 import re
+import threading
 import time
 from datetime import datetime
 from pathlib import Path
@@ -13,6 +15,7 @@ from typing import Optional
 RATING_RE = re.compile(r"\d+[\.,]\d+")
 COUNT_RE = re.compile(r"\d+")
 PHONE_RE = re.compile(r"(?:\+?7|8)\D*\d(?:\D*\d){9}")
+ORG_ID_URL_RE = re.compile(r"/(?:maps/org(?:/[^/]+)?|profile)/(\d+)")
 
 _LOGGER_NAME = "parser_serm"
 _logger = logging.getLogger(_LOGGER_NAME)
@@ -143,6 +146,40 @@ def extract_phones(text: str) -> list[str]:
     return phones
 
 
+def extract_org_id(value: str) -> str:
+    """Return the numeric Yandex org id from a Maps/profile URL or a bare id."""
+    cleaned = (value or "").strip()
+    if cleaned.isdigit():
+        return cleaned
+    match = ORG_ID_URL_RE.search(cleaned)
+    return match.group(1) if match else ""
+
+
+def organization_key(org) -> str:
+    """Dedupe key for an organization: org id when known, otherwise name and phone."""
+    org_id = extract_org_id(getattr(org, "card_url", "") or "")
+    if org_id:
+        return org_id
+    return f"{getattr(org, 'name', '')}|{getattr(org, 'phone', '')}"
+
+
+def review_key(review) -> str:
+    """Stable dedupe key for a review, scoped by org id.
+
+    A native id from the DOM wins; otherwise the author (profile URL, or name
+    when the profile is hidden), the review date and a hash of the text.
+    """
+    org_id = getattr(review, "org_id", "") or ""
+    native_id = getattr(review, "review_id", "") or ""
+    if native_id:
+        return f"{org_id}:id:{native_id}"
+    profile_url = (getattr(review, "user_profile_url", "") or "").split("?", 1)[0].rstrip("/")
+    author = profile_url or " ".join((getattr(review, "user_name", "") or "").split())
+    text = " ".join((getattr(review, "review_text", "") or "").split()).lower()
+    text_hash = hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+    return f"{org_id}:{author}|{getattr(review, 'review_date', '') or ''}|{text_hash}"
+
+
 def split_query(query: str) -> tuple[str, str]:
     cleaned = (query or "").strip()
     if " в " in cleaned:
@@ -247,3 +284,143 @@ class RateLimiter:
 
     def reset_backoff(self) -> None:
         self._backoff_s = self.backoff_base_s
+
+    def set_delay_range(self, min_delay_s: float, max_delay_s: float) -> None:
+        self.min_delay_s = max(0.0, min_delay_s)
+        self.max_delay_s = max(self.min_delay_s, max_delay_s)
+
+    def record_latency(self, seconds: float) -> None:
+        """Feed a page/card load time; the fixed limiter ignores it."""
+
+    def record_captcha(self) -> None:
+        """Note that a captcha was hit; the fixed limiter ignores it."""
+
+    def metrics(self) -> dict:
+        delay_s = (max(0.0, self.min_delay_s) + max(0.0, self.max_delay_s)) / 2
+        return {
+            "delay_s": round(delay_s, 3),
+            "rate_per_min": round(60.0 / delay_s, 1) if delay_s > 0 else None,
+            "backoff_s": round(self._backoff_s, 3),
+        }
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """RateLimiter whose action delay follows latency and captcha signals.
+
+    The delay shrinks multiplicatively while card loads stay under
+    ``target_latency_s`` and no captcha was seen for ``calm_actions`` actions,
+    and grows when latency rises or a captcha appears. It always stays within
+    ``[floor_s, ceiling_s]``, which default to the configured min/max delay;
+    the initial value is the middle of that range. Without a max delay the
+    range is empty and, like the fixed limiter, it adds no delay at all.
+    """
+
+    def __init__(
+        self,
+        *,
+        min_delay_s: float = 0.0,
+        max_delay_s: float = 0.0,
+        backoff_base_s: float = 2.0,
+        backoff_max_s: float = 60.0,
+        floor_s: Optional[float] = None,
+        ceiling_s: Optional[float] = None,
+        target_latency_s: float = 1.5,
+        latency_alpha: float = 0.3,
+        speedup: float = 0.9,
+        slowdown: float = 1.3,
+        captcha_penalty: float = 2.0,
+        calm_actions: int = 5,
+    ) -> None:
+        super().__init__(
+            min_delay_s=min_delay_s,
+            max_delay_s=max_delay_s,
+            backoff_base_s=backoff_base_s,
+            backoff_max_s=backoff_max_s,
+        )
+        self._fixed_floor = floor_s is not None
+        self._fixed_ceiling = ceiling_s is not None
+        self.floor_s = max(0.0, floor_s if floor_s is not None else min_delay_s)
+        if ceiling_s is None:
+            ceiling_s = max(0.0, max_delay_s)
+        self.ceiling_s = max(self.floor_s, ceiling_s)
+        self.target_latency_s = target_latency_s
+        self.latency_alpha = latency_alpha
+        self.speedup = speedup
+        self.slowdown = slowdown
+        self.captcha_penalty = captcha_penalty
+        self.calm_actions = calm_actions
+        initial = (max(0.0, min_delay_s) + max(0.0, max_delay_s)) / 2
+        self.delay_s = min(self.ceiling_s, max(self.floor_s, initial))
+        self.latency_s: Optional[float] = None
+        self.captchas = 0
+        self.actions = 0
+        self._calm = 0
+        self._lock = threading.Lock()
+
+    def _clamp(self, value: float) -> float:
+        return min(self.ceiling_s, max(self.floor_s, value))
+
+    def set_delay_range(self, min_delay_s: float, max_delay_s: float) -> None:
+        """Apply changed delay settings: they bound the adaptive delay unless floor/ceiling were given."""
+        super().set_delay_range(min_delay_s, max_delay_s)
+        with self._lock:
+            if not self._fixed_floor:
+                self.floor_s = self.min_delay_s
+            if not self._fixed_ceiling:
+                self.ceiling_s = self.max_delay_s
+            self.ceiling_s = max(self.floor_s, self.ceiling_s)
+            self.delay_s = self._clamp(self.delay_s)
+
+    def record_latency(self, seconds: float) -> None:
+        with self._lock:
+            if self.latency_s is None:
+                self.latency_s = seconds
+            else:
+                self.latency_s += self.latency_alpha * (seconds - self.latency_s)
+            if self.latency_s > self.target_latency_s:
+                self.delay_s = self._clamp(max(self.delay_s, 0.05) * self.slowdown)
+                self._calm = 0
+
+    def record_captcha(self) -> None:
+        with self._lock:
+            self.captchas += 1
+            self.delay_s = self._clamp(max(self.delay_s, 0.5) * self.captcha_penalty)
+            self._calm = 0
+
+    def _relax(self) -> None:
+        with self._lock:
+            self.actions += 1
+            self._calm += 1
+            latency_ok = self.latency_s is None or self.latency_s <= self.target_latency_s
+            if latency_ok and self._calm >= self.calm_actions:
+                self.delay_s = self._clamp(self.delay_s * self.speedup)
+                self._calm = 0
+                self.reset_backoff()
+
+    def wait_action(self, stop_event, pause_event) -> None:
+        self._relax()
+        delay = self.delay_s * random.uniform(0.75, 1.25)
+        if delay > 0:
+            _wait_with_pause(stop_event, pause_event, delay)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "delay_s": round(self.delay_s, 3),
+                "rate_per_min": round(60.0 / self.delay_s, 1) if self.delay_s > 0 else None,
+                "backoff_s": round(self._backoff_s, 3),
+                "latency_s": round(self.latency_s, 3) if self.latency_s is not None else None,
+                "captchas": self.captchas,
+                "actions": self.actions,
+            }
+
+
+def build_rate_limiter(
+    adaptive: bool,
+    *,
+    min_delay_s: float = 0.0,
+    max_delay_s: float = 0.0,
+) -> RateLimiter:
+    if adaptive:
+        return AdaptiveRateLimiter(min_delay_s=min_delay_s, max_delay_s=max_delay_s)
+    return RateLimiter(min_delay_s=min_delay_s, max_delay_s=max_delay_s)
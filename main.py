@@ -1,4 +1,5 @@
 import argparse
+import hashlib
 import importlib.util
 import logging
 import os
@@ -9,12 +10,11 @@ import sys
 import threading
 from pathlib import Path
 
-from app.playwright_utils import chrome_not_found_message, is_chrome_missing_error
-
 SCRIPT_DIR = Path(__file__).resolve().parent
 RESULTS_DIR = SCRIPT_DIR / "results"
 REQUIREMENTS_FILE = SCRIPT_DIR / "requirements.txt"
 PLAYWRIGHT_MARKER = SCRIPT_DIR / ".playwright_installed"
+DEPS_MARKER = SCRIPT_DIR / ".deps_checked"
 
 
 def parse_bool(value: str) -> bool:
@@ -39,8 +39,77 @@ def build_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--mode",
         default="slow",
-        choices=["slow", "fast"],
-        help="Parser mode: slow (maps scraper) or fast (search parser)",
+        choices=["slow", "fast", "hybrid"],
+        help=(
+            "Parser mode: slow (maps scraper), fast (search parser) or hybrid "
+            "(search parser, then maps cards for rows passing the filters to fill the "
+            "checkmark, award and social links; single --query only)"
+        ),
+    )
+    parser.add_argument(
+        "--queries-file",
+        default="",
+        help="Batch mode: file with one query per line, all results go to one output",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Batch mode: number of pages scraped concurrently",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Batch mode: split the batch across this many worker processes",
+    )
+    parser.add_argument(
+        "--tiles",
+        type=int,
+        default=1,
+        help="Split each Maps query into an N x N grid of map viewports of its city",
+    )
+    parser.add_argument(
+        "--bbox",
+        default="",
+        help="Area for --tiles as west,south,east,north when the city is not known",
+    )
+    parser.add_argument(
+        "--expand",
+        action="store_true",
+        help="Also run synonym and district variants of each query, stopping when they stop adding new orgs",
+    )
+    parser.add_argument(
+        "--expand-min-new",
+        type=float,
+        default=0.1,
+        help="Expansion: stop after two waves whose share of new orgs is below this",
+    )
+    parser.add_argument(
+        "--serp-http",
+        action="store_true",
+        help="Fast mode: fetch SERP over HTTP without Chrome where the HTML has all cards",
+    )
+    parser.add_argument(
+        "--serp-pages",
+        type=int,
+        default=0,
+        help="Fast batch mode: SERP result pages per query, loaded on parallel tabs (default: from settings)",
+    )
+    parser.add_argument(
+        "--archive-pages",
+        action="store_true",
+        help="Save raw pages for offline re-extraction (python -m app.page_archive reextract)",
+    )
+    parser.add_argument(
+        "--org-ids-file",
+        default="",
+        help="Reviews batch: file with one org id or Maps URL per line",
+    )
+    parser.add_argument(
+        "--browser-daemon",
+        action="store_true",
+        help=argparse.SUPPRESS,
     )
     parser.add_argument("--out", default="result.xlsx", help="Output Excel file")
     parser.add_argument("--log", default="", help="Optional log file path")
@@ -71,6 +140,15 @@ def prompt_query() -> str:
     return f"{niche} в {city}".strip()
 
 
+def read_queries(path: Path) -> list[str]:
+    queries: list[str] = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        query = line.strip()
+        if query and not query.startswith("#") and query not in queries:
+            queries.append(query)
+    return queries
+
+
 def _parse_required_modules(requirements_path: Path) -> list[str]:
     if not requirements_path.exists():
         return []
@@ -195,11 +273,39 @@ def _close_chrome_processes() -> None:
         subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
 
+def _requirements_hash(requirements_path: Path) -> str:
+    digest = hashlib.sha256()
+    digest.update(sys.executable.encode("utf-8", "replace"))
+    digest.update(sys.version.encode("utf-8", "replace"))
+    if requirements_path.exists():
+        digest.update(requirements_path.read_bytes())
+    return digest.hexdigest()
+
+
+def dependencies_cached() -> bool:
+    if getattr(sys, "frozen", False):
+        return True
+    try:
+        return DEPS_MARKER.read_text(encoding="utf-8").strip() == _requirements_hash(REQUIREMENTS_FILE)
+    except OSError:
+        return False
+
+
+def _mark_dependencies_checked() -> None:
+    try:
+        DEPS_MARKER.write_text(_requirements_hash(REQUIREMENTS_FILE), encoding="utf-8")
+    except OSError:
+        logging.debug("Не удалось сохранить отметку о проверке зависимостей", exc_info=True)
+
+
 def ensure_dependencies() -> None:
     # В "замороженной" сборке (cx_Freeze) зависимости уже упакованы.
     # Пытаться делать pip install / playwright install из .exe нельзя.
     if getattr(sys, "frozen", False):
         return
+    # Проверка find_spec по всем пакетам нужна только после смены requirements.txt.
+    if dependencies_cached():
+        return
     modules = _parse_required_modules(REQUIREMENTS_FILE)
     if not modules:
         return
@@ -212,17 +318,27 @@ def ensure_dependencies() -> None:
         raise RuntimeError(f"Не удалось установить зависимости: {', '.join(remaining)}")
     if "playwright" in modules:
         _ensure_playwright_browser_installed()
+    _mark_dependencies_checked()
 
 
 def run_cli(args: argparse.Namespace) -> None:
     from app.excel_writer import ExcelWriter
     from app.filters import passes_potential_filters
     from app.notifications import notify_sound
+    from app.page_archive import configure_page_archive
     from app.parser_search import run_fast_parser
+    from app.request_budget import configure_request_budget
     from app.settings_store import load_settings
-    from app.utils import build_result_paths, configure_logging, split_query
+    from app.utils import build_rate_limiter, build_result_paths, configure_logging, split_query
     from app.pacser_maps import YandexMapsScraper
 
+    if args.org_ids_file:
+        run_reviews_batch(args)
+        return
+
+    queries = read_queries(Path(args.queries_file)) if args.queries_file else []
+    if queries:
+        args.query = queries[0]
     if not args.query:
         args.query = prompt_query()
 
@@ -238,11 +354,54 @@ def run_cli(args: argparse.Namespace) -> None:
         Path(args.log) if args.log else None,
         results_folder / "log.txt",
     )
+    configure_request_budget(settings.rate_limit)
     headless_override = parse_optional_bool(args.headless)
     if headless_override is not None:
         settings.program.headless = headless_override
+    if args.serp_http:
+        settings.program.serp_http = True
+    if args.serp_pages > 0:
+        settings.program.serp_pages = args.serp_pages
+    if args.archive_pages:
+        settings.program.archive_pages = True
+    configure_page_archive(settings.program.archive_pages)
+    if settings.program.warm_browser:
+        from app.browser_daemon import ensure_browser_daemon
+
+        ensure_browser_daemon(headless=settings.program.headless)
+
+    if args.tiles > 1 and args.mode == "fast":
+        logging.warning("Разбиение на квадраты работает только для карт — в быстром режиме пропускаю")
+        args.tiles = 1
+    if args.tiles > 1 and args.bbox:
+        from app.tiling import BBox
 
-    if args.mode == "fast":
+        try:
+            BBox.parse(args.bbox)
+        except ValueError as exc:
+            logging.error("❌ Неверный --bbox: %s", exc)
+            return
+
+    if args.expand:
+        count = run_expanded(args, queries or [args.query], settings, output_path)
+        logging.info("Расширенный поиск завершён: организаций %s", count)
+        if settings.program.open_result:
+            open_file(results_folder)
+        notify_sound("finish", settings)
+        return
+
+    if args.tiles > 1:
+        queries = tile_queries(args, queries or [args.query])
+
+    if queries:
+        count = run_batch(args, queries, settings, output_path)
+        logging.info("Пакетный режим завершён: запросов %s, организаций %s", len(queries), count)
+        if settings.program.open_result:
+            open_file(results_folder)
+        notify_sound("finish", settings)
+        return
+
+    if args.mode in ("fast", "hybrid"):
         stop_event = threading.Event()
         pause_event = threading.Event()
         captcha_event = threading.Event()
@@ -258,13 +417,15 @@ def run_cli(args: argparse.Namespace) -> None:
             captcha_resume_event=captcha_event,
             log=logging.info,
             settings=settings,
+            limit=args.limit if args.limit > 0 else None,
+            enrich_gaps=args.mode == "hybrid",
         )
         if settings.program.open_result:
             open_file(results_folder)
         notify_sound("finish", settings)
         return
 
-    writer = ExcelWriter(output_path)
+    writer = ExcelWriter(output_path, flush_interval_s=settings.program.excel_save_interval_s)
     stop_event = threading.Event()
     pause_event = threading.Event()
     captcha_event = threading.Event()
@@ -282,6 +443,8 @@ def run_cli(args: argparse.Namespace) -> None:
         captcha_resume_event=captcha_event,
         captcha_hook=_captcha_hook,
         log=logging.info,
+        rate_limiter=build_rate_limiter(settings.program.adaptive_rate),
+        warm_browser=settings.program.warm_browser,
     )
 
     try:
@@ -295,6 +458,168 @@ def run_cli(args: argparse.Namespace) -> None:
         notify_sound("finish", settings)
 
 
+def tile_queries(args: argparse.Namespace, queries: list[str]) -> list[str]:
+    from app.tiling import BBox, expand_tiled_queries
+
+    if args.tiles <= 1:
+        return queries
+    bbox = BBox.parse(args.bbox) if args.bbox else None
+    return expand_tiled_queries(queries, args.tiles, bbox)
+
+
+def _batch_writer(settings, output_path: Path):
+    """One output for a whole batch; organizations are deduped by org key before writing."""
+    from app.excel_writer import ExcelWriter
+    from app.filters import passes_potential_filters
+    from app.utils import organization_key
+
+    writer = ExcelWriter(output_path, flush_interval_s=settings.program.excel_save_interval_s)
+    seen: set[str] = set()
+
+    def _write(org) -> None:
+        key = organization_key(org)
+        if key in seen:
+            return
+        seen.add(key)
+        writer.append(org, include_in_potential=passes_potential_filters(org, settings))
+
+    return writer, seen, _write
+
+
+def _run_async_batch(args: argparse.Namespace, queries: list[str], settings, write) -> dict[str, list]:
+    """Run queries on concurrent pages of one browser; returns organizations per query."""
+    from app.async_engine import run_maps_queries, run_serp_queries
+    from app.captcha_state import CaptchaBoard, log_captcha_transitions
+    from app.parser_search import _row_to_organization, potential_row_filter
+
+    limit = args.limit if args.limit > 0 else None
+    captcha_board = CaptchaBoard()
+    captcha_board.add_listener(log_captcha_transitions(logging.info))
+    engine_kwargs = {
+        "headless": settings.program.headless,
+        "concurrency": args.concurrency,
+        "captcha_board": captcha_board,
+        "warm_browser": settings.program.warm_browser,
+        "log": logging.info,
+    }
+    if args.mode == "fast":
+        engine_kwargs["serp_http"] = settings.program.serp_http
+        engine_kwargs["serp_pages"] = settings.program.serp_pages
+        rows = run_serp_queries(
+            queries,
+            limit=limit,
+            row_cb=lambda row: write(_row_to_organization(row)),
+            row_filter=potential_row_filter(settings),
+            **engine_kwargs,
+        )
+        return {query: [_row_to_organization(row) for row in found] for query, found in rows.items()}
+    return run_maps_queries(queries, limit=limit, org_cb=write, **engine_kwargs)
+
+
+def run_batch(args: argparse.Namespace, queries: list[str], settings, output_path: Path) -> int:
+    limit = args.limit if args.limit > 0 else None
+    if args.workers > 1:
+        from app.sharding import ShardedRunner
+
+        runner = ShardedRunner(
+            "serp" if args.mode == "fast" else "maps",
+            queries,
+            output_path=output_path,
+            workers=args.workers,
+            settings=settings,
+            concurrency=args.concurrency,
+            limit=limit,
+            log=logging.info,
+        )
+        return runner.run()
+
+    writer, seen, write = _batch_writer(settings, output_path)
+    try:
+        _run_async_batch(args, queries, settings, write)
+    finally:
+        writer.close()
+    return len(seen)
+
+
+def run_expanded(args: argparse.Namespace, queries: list[str], settings, output_path: Path) -> int:
+    """Run each query with its planned variants in waves of ``--concurrency`` pages."""
+    from app.query_planner import ExpansionDictionary, QueryPlanner
+    from app.tiling import parse_tile_item
+    from app.utils import organization_key
+
+    dictionary = ExpansionDictionary.load()
+    writer, seen, write = _batch_writer(settings, output_path)
+    index: set[str] = set()
+    try:
+        for query in queries:
+            planner = QueryPlanner(
+                query,
+                dictionary=dictionary,
+                index=index,
+                min_new_rate=args.expand_min_new,
+            )
+            while not planner.done:
+                wave = planner.next_wave(max(1, args.concurrency))
+                results = _run_async_batch(args, tile_queries(args, wave), settings, write)
+                found: dict[str, set[str]] = {}
+                for item, orgs in results.items():
+                    variant = parse_tile_item(item)[0]
+                    found.setdefault(variant, set()).update(organization_key(org) for org in orgs)
+                planner.record(found)
+            logging.info(
+                "«%s»: выполнено вариантов %s из %s",
+                query,
+                len(planner.finished),
+                len(planner.finished) + len(planner.pending),
+            )
+    finally:
+        writer.close()
+    return len(seen)
+
+
+def run_reviews_batch(args: argparse.Namespace) -> int:
+    from datetime import datetime
+
+    from app.page_archive import configure_page_archive
+    from app.request_budget import configure_request_budget
+    from app.settings_store import load_settings
+    from app.sharding import ShardedRunner
+    from app.utils import configure_logging
+
+    settings = load_settings()
+    org_ids = read_queries(Path(args.org_ids_file))
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    output_path = RESULTS_DIR / "reviews" / f"reviews_{timestamp}.xlsx"
+    configure_logging(
+        settings.program.log_level,
+        Path(args.log) if args.log else None,
+        output_path.parent / "log_reviews.txt",
+    )
+    configure_request_budget(settings.rate_limit)
+    headless_override = parse_optional_bool(args.headless)
+    if headless_override is not None:
+        settings.program.headless = headless_override
+    if args.archive_pages:
+        settings.program.archive_pages = True
+    configure_page_archive(settings.program.archive_pages)
+    if settings.program.warm_browser:
+        from app.browser_daemon import ensure_browser_daemon
+
+        ensure_browser_daemon(headless=settings.program.headless)
+    runner = ShardedRunner(
+        "reviews",
+        org_ids,
+        output_path=output_path,
+        workers=max(1, args.workers),
+        settings=settings,
+        concurrency=args.concurrency,
+        log=logging.info,
+    )
+    count = runner.run()
+    logging.info("Отзывы сохранены: %s (%s)", output_path, count)
+    return count
+
+
 def run_gui() -> None:
     from app.gui import main as gui_main
 
@@ -304,11 +629,21 @@ def run_gui() -> None:
 def main() -> None:
     parser = build_parser()
     args = parser.parse_args()
+    if args.browser_daemon:
+        from app.browser_daemon import serve
+
+        serve(headless=bool(parse_optional_bool(args.headless)))
+        return
     if args.cli:
+        if args.mode == "hybrid" and (args.queries_file or args.tiles > 1 or args.expand):
+            parser.error("--mode hybrid runs a single --query and cannot be combined with "
+                         "--queries-file, --tiles or --expand")
         ensure_dependencies()
         try:
             run_cli(args)
         except Exception as exc:
+            from app.playwright_utils import chrome_not_found_message, is_chrome_missing_error
+
             if is_chrome_missing_error(exc):
                 print(chrome_not_found_message(), flush=True)
                 return